@@ -0,0 +1,141 @@
+import atexit
+import csv
+import json
+import os
+import threading
+import time
+from utils import get_timestamp, reserve_ids
+from csv_index import table_lock
+from storage import insert, BACKEND, ACCESS_LOG_CSV
+
+database_folder = "database"
+SEGMENT_FOLDER = os.path.join(database_folder, "access_log_segments")
+MANIFEST_FILE = os.path.join(SEGMENT_FOLDER, "manifest.json")
+ACCESS_LOG_HEADER = ["logID", "userID", "artifactID", "accessType", "timeStamp"]
+
+# Group commit thresholds: flush once this many rows are queued or the oldest has waited this many
+# seconds. Flushes run on the thread recording the entry, the storage modules are not thread-safe,
+# so the interval is only checked when the next entry comes in; the service also flushes on a timer.
+# Whatever is still queued is written at logout and on exit.
+FLUSH_SIZE = 32
+FLUSH_INTERVAL = 5.0
+
+_pending = []  # (log_csv, [userID, artifactID, accessType, timeStamp])
+_pending_lock = threading.Lock()
+_first_queued = None  # time.monotonic() of the oldest queued entry
+
+
+# Observer Pattern
+def recordAccess(user_id, artifact_id, access_type, ACCESS_LOG_CSV):
+    """Queue an access log entry; it is written with the next group commit."""
+    global _first_queued
+    if not artifact_id:  # Skip logging if artifact_id is empty or None
+        return
+
+    with _pending_lock:
+        _pending.append((ACCESS_LOG_CSV, [user_id, artifact_id, access_type, get_timestamp()]))
+        queued = len(_pending)
+        if queued == 1:
+            _first_queued = time.monotonic()
+        waited = time.monotonic() - _first_queued
+
+    if queued >= FLUSH_SIZE or waited >= FLUSH_INTERVAL:
+        flush_access_log()
+
+@atexit.register
+def flush_access_log():
+    """Write every queued entry, one append per log file."""
+    global _first_queued
+    with _pending_lock:
+        pending = _pending[:]
+        _pending.clear()
+        _first_queued = None
+
+    batches = {}
+    for log_csv, entry in pending:
+        batches.setdefault(log_csv, []).append(entry)
+
+    for log_csv, entries in batches.items():
+        if BACKEND != "csv":  # segments only apply to log files, the database table is indexed instead
+            log_ids = reserve_ids(log_csv, "logID", len(entries))
+            insert(log_csv, [[log_id] + entry for log_id, entry in zip(log_ids, entries)])
+            continue
+
+        with table_lock(log_csv):  # one session at a time rotates, appends and updates the manifest
+            log_ids = reserve_ids(log_csv, "logID", len(entries))  # before rotation, so a new sequence is seeded from existing rows
+            manifest = rotate_segment(log_csv)
+            insert(log_csv, [[log_id] + entry for log_id, entry in zip(log_ids, entries)])
+
+            active = manifest["active"]
+            active["first"] = active["first"] or entries[0][-1]
+            active["last"] = entries[-1][-1]
+            active["rows"] += len(entries)
+            save_manifest(log_csv, manifest)
+
+def _manifest_path(log_csv):
+    if log_csv == ACCESS_LOG_CSV:
+        return MANIFEST_FILE
+    return os.path.join(SEGMENT_FOLDER, os.path.basename(log_csv) + ".manifest.json")
+
+def _scan_active(log_csv):
+    """One-time scan of a log file written before the manifest existed."""
+    active = {"first": None, "last": None, "rows": 0}
+    try:
+        with open(log_csv, "r", newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                active["first"] = active["first"] or row["timeStamp"]
+                active["last"] = row["timeStamp"]
+                active["rows"] += 1
+    except FileNotFoundError:
+        pass
+    return active
+
+def load_manifest(log_csv=ACCESS_LOG_CSV):
+    """Return {"segments": [...], "active": {...}} describing the archived and current log files."""
+    try:
+        with open(_manifest_path(log_csv), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {"segments": [], "active": _scan_active(log_csv)}
+
+def save_manifest(log_csv, manifest):
+    os.makedirs(SEGMENT_FOLDER, exist_ok=True)
+    path = _manifest_path(log_csv)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def rotate_segment(log_csv=ACCESS_LOG_CSV):
+    """Move the active log file into a dated segment once it holds entries from an earlier day.
+
+    Must be called with the log's table_lock held. Returns the manifest as it stands
+    after any rotation.
+    """
+    manifest = load_manifest(log_csv)
+    active = manifest["active"]
+    today = get_timestamp()[:10]
+
+    if active["rows"] and active["last"][:10] < today:
+        os.makedirs(SEGMENT_FOLDER, exist_ok=True)
+        name, ext = os.path.splitext(os.path.basename(log_csv))
+        segment = os.path.join(SEGMENT_FOLDER, f"{name}_{active['first'][:10]}{ext}")
+        suffix = 1
+        while os.path.exists(segment):
+            suffix += 1
+            segment = os.path.join(SEGMENT_FOLDER, f"{name}_{active['first'][:10]}_{suffix}{ext}")
+
+        os.replace(log_csv, segment)
+        manifest["segments"].append({"file": os.path.basename(segment), **active})
+        manifest["active"] = {"first": None, "last": None, "rows": 0}
+        save_manifest(log_csv, manifest)
+
+    if not os.path.exists(log_csv):
+        with open(log_csv, "w", newline="", encoding="utf-8") as file:
+            csv.writer(file).writerow(ACCESS_LOG_HEADER)
+    return manifest
+
+def list_segments(log_csv=ACCESS_LOG_CSV):
+    """Return the paths of all log files, oldest segment first and the active file last."""
+    manifest = load_manifest(log_csv)
+    paths = [os.path.join(SEGMENT_FOLDER, segment["file"]) for segment in manifest["segments"]]
+    return paths + [log_csv]
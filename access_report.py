@@ -0,0 +1,252 @@
+import datetime
+import json
+import os
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from locks import exclusive_lock
+from csv_index import tail_rows
+from access_log import flush_access_log, list_segments
+from encryption import open_row, artifact_key
+from storage import between, rows_after, get_row, BACKEND, ACCESS_LOG_CSV, ARTIFACTS_CSV, USERS_CSV
+from instrumentation import timed
+from report_view import ask_report, print_report, REPORTS, REPORT_DAYS
+
+database_folder = "database"
+
+# Sparse index and daily rollups of the access log, brought up to date from the rows appended since the last refresh
+STATE_FILE = os.path.join(database_folder, ".cache", f"access_report.{BACKEND}.json")
+SPARSE_STRIDE = 256  # log rows per sparse index block
+REPORT_LIMIT = 10  # rows shown in the top lists
+HISTORY_LIMIT = 50  # most recent entries shown in the user and artifact histories
+
+# In the CSV backend each log file, the active one and every segment, is tracked by inode so
+# rotation, which moves the active file into a segment, neither loses nor recounts rows:
+# files: inode -> {"end": bytes read, "blocks": [[offset, lowest timeStamp, highest timeStamp, rows]]}
+# position: the storage.rows_after position of the other backends
+# days: "YYYY-MM-DD" -> {"artifacts": {artifactID: {accessType: n}}, "users": {userID: {accessType: n}}, "types": {accessType: n}}
+_state = {"signature": None, "state": None}
+_bounds = {}  # (inode, end) -> (running highest, running lowest from the end) of the block timestamps
+
+
+def _empty_state():
+    return {"files": {}, "position": None, "days": {}}
+
+def _load_state():
+    try:
+        stat = os.stat(STATE_FILE)
+    except FileNotFoundError:
+        return _empty_state()
+    signature = [stat.st_mtime_ns, stat.st_size]
+    if _state["signature"] != signature:
+        try:
+            with open(STATE_FILE, "r", encoding="utf-8") as file:
+                _state["state"] = json.load(file)
+        except ValueError:
+            _state["state"] = _empty_state()  # unreadable, rebuilt by this refresh
+        _state["signature"] = signature
+    return _state["state"]
+
+def _save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(STATE_FILE + ".tmp", STATE_FILE)
+    stat = os.stat(STATE_FILE)
+    _state.update(signature=[stat.st_mtime_ns, stat.st_size], state=state)
+
+def _add_to_rollups(days, row):
+    day = days.setdefault(row["timeStamp"][:10], {"artifacts": {}, "users": {}, "types": {}})
+    access_type = row["accessType"]
+    for group, key in (("artifacts", row["artifactID"]), ("users", row["userID"])):
+        counts = day[group].setdefault(key, {})
+        counts[access_type] = counts.get(access_type, 0) + 1
+    day["types"][access_type] = day["types"].get(access_type, 0) + 1
+
+def _log_files():
+    """Return {inode: path} for the segments and the active log file."""
+    files = {}
+    for path in list_segments(ACCESS_LOG_CSV):
+        try:
+            files[str(os.stat(path).st_ino)] = path
+        except FileNotFoundError:
+            pass
+    return files
+
+def _refresh_files(state):
+    files = _log_files()
+    for inode, entry in state["files"].items():
+        if inode not in files or os.path.getsize(files[inode]) < entry["end"]:
+            state.update(_empty_state())  # a log file was removed or rewritten, count everything again
+            break
+
+    changed = False
+    for inode, path in files.items():
+        entry = state["files"].get(inode, {"end": 0, "blocks": []})
+        if entry["end"] and entry["end"] == os.path.getsize(path):
+            continue
+        file_inode, end, rows = tail_rows(path, entry["end"])
+        if str(file_inode) != inode:
+            continue  # rotated since it was listed, read under its segment name next time
+        blocks = entry["blocks"]
+        for offset, row in rows:
+            timestamp = row["timeStamp"]
+            if not blocks or blocks[-1][3] >= SPARSE_STRIDE:
+                blocks.append([offset, timestamp, timestamp, 0])
+            block = blocks[-1]
+            block[1] = min(block[1], timestamp)
+            block[2] = max(block[2], timestamp)
+            block[3] += 1
+            _add_to_rollups(state["days"], row)
+        entry["end"] = end
+        state["files"][inode] = entry
+        changed = True
+    return changed
+
+def _refresh_table(state):
+    rows, position, reset = rows_after(ACCESS_LOG_CSV, state["position"])
+    if reset:
+        state.update(_empty_state())
+    for row in rows:
+        _add_to_rollups(state["days"], row)
+    changed = position != state["position"]
+    state["position"] = position
+    return changed
+
+@timed("access_report.refresh")
+def refresh():
+    """Fold the log rows appended since the last refresh into the sparse index and the daily rollups; returns the state."""
+    with exclusive_lock("access_report"):
+        state = _load_state()
+        changed = _refresh_files(state) if BACKEND == "csv" else _refresh_table(state)
+        if changed:
+            _save_state(state)
+    return state
+
+def _byte_range(inode, entry, start, end):
+    """Binary-search the blocks that may hold timestamps between start and end; returns (first, last) byte or None.
+
+    Sessions flush their queued entries a few seconds apart, so timestamps are only nearly
+    sorted. The running highest and running lowest-from-the-end are sorted regardless.
+    """
+    blocks = entry["blocks"]
+    bounds = _bounds.get((inode, entry["end"]))
+    if bounds is None:
+        highest = list(accumulate((block[2] for block in blocks), max))
+        lowest = list(accumulate((block[1] for block in reversed(blocks)), min))[::-1]
+        bounds = _bounds[(inode, entry["end"])] = (highest, lowest)
+    first = bisect_left(bounds[0], start)  # every row before this block is older than start
+    last = bisect_right(bounds[1], end)  # every row from this block on is newer than end
+    if first >= last:
+        return None
+    return blocks[first][0], blocks[last][0] if last < len(blocks) else entry["end"]
+
+def _normalize(moment, end=False):
+    """Accept a date, meaning the start of the day (or its end when end=True), or a full timestamp."""
+    moment = moment.strip()
+    if len(moment) == 10:
+        moment += " 23:59:59" if end else " 00:00:00"
+    datetime.datetime.strptime(moment, "%Y-%m-%d %H:%M:%S")  # ValueError on anything else
+    return moment
+
+def _query_files(start, end):
+    state = refresh()
+    rows = []
+    for inode, path in _log_files().items():
+        entry = state["files"].get(inode)
+        span = entry and _byte_range(inode, entry, start, end)
+        if not span:
+            continue
+        file_inode, _, found = tail_rows(path, *span)
+        if str(file_inode) != inode:
+            return _query_files(start, end)  # rotated while reading, list the files again
+        rows.extend(row for _, row in found if start <= row["timeStamp"] <= end)
+    return rows
+
+@timed("access_report.query")
+def query(start, end, user_id=None, artifact_id=None, access_type=None):
+    """Return the log rows with start <= timeStamp <= end, oldest first, optionally of one user, artifact or access type.
+
+    start and end are "YYYY-MM-DD" dates (whole days) or "YYYY-MM-DD HH:MM:SS" timestamps.
+    """
+    start, end = _normalize(start), _normalize(end, end=True)
+    rows = _query_files(start, end) if BACKEND == "csv" else between(ACCESS_LOG_CSV, "timeStamp", start, end)
+    filters = {"userID": user_id, "artifactID": artifact_id, "accessType": access_type}
+    filters = {column: value for column, value in filters.items() if value is not None}
+    rows = [row for row in rows if all(row[column] == value for column, value in filters.items())]
+    return sorted(rows, key=lambda row: row["timeStamp"])
+
+def rollup(start_day, end_day):
+    """Sum the daily rollups from start_day to end_day ("YYYY-MM-DD", inclusive) into {"artifacts", "users", "types"}."""
+    total = {"artifacts": {}, "users": {}, "types": {}}
+    for day, counts in refresh()["days"].items():
+        if not start_day <= day <= end_day:
+            continue
+        for group in ["artifacts", "users"]:
+            for key, types in counts[group].items():
+                summed = total[group].setdefault(key, {})
+                for access_type, count in types.items():
+                    summed[access_type] = summed.get(access_type, 0) + count
+        for access_type, count in counts["types"].items():
+            total["types"][access_type] = total["types"].get(access_type, 0) + count
+    return total
+
+def daily_counts(start_day, end_day):
+    """Return [(day, {accessType: n})] for every day with entries between two dates, oldest first."""
+    days = refresh()["days"]
+    return [(day, days[day]["types"]) for day in sorted(days) if start_day <= day <= end_day]
+
+def top(group, start_day, end_day, access_type=None, limit=REPORT_LIMIT):
+    """Return [(ID, n)] of the most active "artifacts" or "users" between two dates, of one access type or all."""
+    counts = []
+    for key, types in rollup(start_day, end_day)[group].items():
+        count = types.get(access_type, 0) if access_type else sum(types.values())
+        if count:
+            counts.append((key, count))
+    return sorted(counts, key=lambda item: (-item[1], item[0]))[:limit]
+
+def _artifact_title(artifact_id):
+    artifact = get_row(ARTIFACTS_CSV, "artifactID", artifact_id)
+    if not artifact:
+        return "(deleted)"
+    return open_row(artifact_key(artifact), "artifacts", artifact, ["title"])["title"]
+
+def _username(user_id):
+    user = get_row(USERS_CSV, "userID", user_id)
+    return user["username"] if user else "(removed)"
+
+def build_report(kind, days=REPORT_DAYS, subject=None):
+    """Return one of the REPORTS over the last days as {"start", "end", "rows", "older"}; raises ValueError for an unknown kind.
+
+    rows are dicts: {"artifactID", "views", "title"} for "mv", {"userID", "entries", "username"}
+    for "au", {"day", "counts"} for "da", and the newest HISTORY_LIMIT log rows for "uh" and
+    "ah", where subject is the user or artifact ID and older counts the entries left out.
+    """
+    if kind not in REPORTS:
+        raise ValueError(f"Unknown report, expected one of: {', '.join(REPORTS)}")
+    today = datetime.date.today()
+    start_day = (today - datetime.timedelta(days=days - 1)).isoformat()
+    end_day = today.isoformat()
+    older = 0
+
+    if kind == "mv":
+        rows = [
+            {"artifactID": artifact_id, "views": count, "title": _artifact_title(artifact_id)}
+            for artifact_id, count in top("artifacts", start_day, end_day, "View Artifact")
+        ]
+    elif kind == "au":
+        rows = [{"userID": user_id, "entries": count, "username": _username(user_id)} for user_id, count in top("users", start_day, end_day)]
+    elif kind == "da":
+        rows = [{"day": day, "counts": counts} for day, counts in daily_counts(start_day, end_day)]
+    else:
+        rows = query(start_day, end_day, **{"user_id" if kind == "uh" else "artifact_id": subject})
+        older = max(0, len(rows) - HISTORY_LIMIT)
+        rows = rows[older:]
+    return {"start": start_day, "end": end_day, "rows": rows, "older": older}
+
+def show_access_reports():
+    """Admin dashboard entry: print a report over the access log."""
+    flush_access_log()  # include this session's queued entries
+    choice = ask_report()
+    if choice:
+        kind, days, subject = choice
+        print_report(kind, build_report(kind, days, subject), subject)
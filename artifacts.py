@@ -1,176 +1,251 @@
-import csv
 from cryptography.fernet import Fernet # type: ignore
 from encryption import *
 from utils import *
-import os
+from storage import insert_row, delete, update, artifact_details
+from storage import USERS_CSV, ARTIFACTS_CSV, ACCESS_LOG_CSV, LYRICS_CSV, MUSIC_SCORE_CSV, AUDIO_RECORDING_CSV
+from access_log import recordAccess
+from instrumentation import timed, timer
+from listing import list_artifacts_page, listing_upsert, listing_remove, PAGE_SIZE
+from content_store import acquire, release, resolve, references, content_row
+from search_index import search, update_index, searchable_values, SEARCH_FIELDS
+from search_index import enabled as search_enabled
 
-database_folder = "database"
-os.makedirs(database_folder, exist_ok=True)
-
-# CSV File Paths
-USERS_CSV = os.path.join(database_folder, "users.csv")
-ARTIFACTS_CSV = os.path.join(database_folder, "artifacts.csv")
-ACCESS_LOG_CSV = os.path.join(database_folder, "access_logs.csv")
-LYRICS_CSV = os.path.join(database_folder, "lyrics.csv")
-MUSIC_SCORE_CSV = os.path.join(database_folder, "music_scores.csv")
-AUDIO_RECORDING_CSV = os.path.join(database_folder, "audio_recordings.csv")
-
-
-def load_user_data(users_csv: str) -> dict:
-    users = {}
-    with open(users_csv, mode="r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            users[row["userID"]] = row["username"]  # Map userID to username
-    return users
 
 def display_csv_data(csv_filename: str, users_csv: str, role: str, owner_id: str = None):
-    # Load user data to match ownerID -> username
-    user_data = load_user_data(users_csv)
-
-    with open(csv_filename, mode="r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
+    # creators page through the ownerID index, so other users' rows are never read
+    page_owner = owner_id if role == "creator" else None
+    cursor = None
+
+    while True:
+        try:
+            with timer("artifacts.list_page"):
+                entries, cursor = list_artifacts_page(page_owner, PAGE_SIZE, cursor, csv_filename, users_csv)
+        except ValueError as error:  # keys wrapped under a master key that is not set
+            print(error)
+            return
 
         # Table header
         print(f"{'Artifact ID':<12} | {'Owner':<15} | {'Title (Decrypted)':<30}")
         print("-" * 65)
 
-        for row in reader:
-            if role == "creator" and row["ownerID"] != owner_id:
-                continue  # Skip records that don't match ownerID
-
-            decrypted_title = decrypt_data(row["encryptionKey"], row["title"])
-            creator_name = user_data.get(row["ownerID"], "Unknown")  # Get creator name
+        for artifact_id, _, creator_name, decrypted_title in entries:
+            print(f"{artifact_id:<12} | {creator_name:<15} | {decrypted_title:<30}")
 
-            print(f"{row['artifactID']:<12} | {creator_name:<15} | {decrypted_title:<30}")
+        if not cursor:
+            break
+        if input("> Next page (n), or press Enter to continue: ").strip().lower() != "n":
+            break
 
-def display_all_data(artifact_id, role, owner_id):
-    csv_files = [ARTIFACTS_CSV, USERS_CSV, LYRICS_CSV, MUSIC_SCORE_CSV, AUDIO_RECORDING_CSV]
+@timed("artifacts.read_artifact")
+def read_artifact(artifact_id, role, user_id):
+    """Return the decrypted fields of an artifact shown to users, raises LookupError or PermissionError."""
+    details = artifact_details(artifact_id)  # artifact, lyrics, score and recording rows in one lookup
     artifact_data = {"artifactID": artifact_id}  # Start with the ID
     displayed_data = ["title", "type", "lyrics", "language", "score", "format", "duration"]
 
-    # Get the encryption key and ownerID from ARTIFACTS_CSV
-    artifact_owner_id = None
-    encryption_key = None
-
-    with open(ARTIFACTS_CSV, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row["artifactID"] == artifact_id:
-                artifact_owner_id = row["ownerID"]
-                encryption_key = row["encryptionKey"]
-                break  # Stop searching once found
-
-    # If no encryption key is found, the artifact doesn't exist
-    if encryption_key is None:
-        print("Artifact not found.")
-        return
+    # If no artifact row is found, the artifact doesn't exist
+    artifact_row = details["artifacts"]
+    if not artifact_row or not artifact_row["encryptionKey"]:
+        raise LookupError("Artifact not found.")
 
     # If user is a creator, ensure they own the artifact
-    if role == "creator" and artifact_owner_id != owner_id:
-        print("Invalid artifact. You do not have permission to access this artifact.")
+    if role == "creator" and artifact_row["ownerID"] != user_id:
+        raise PermissionError("Invalid artifact. You do not have permission to access this artifact.")
+
+    # Proceed to collect artifact data, one decrypt per envelope row, blobs are read only now
+    rows = [(artifact_key(artifact_row), table, row) for table, row in details.items() if row]
+    for (_, table, _), values in zip(rows, open_rows(rows, columns=displayed_data)):
+        for key, value in resolve(table, values).items():  # shared lyrics and audio metadata are read from the content store
+            if key in displayed_data:  # Only collect displayed fields
+                artifact_data[key] = value
+    return artifact_data
+
+def display_all_data(artifact_id, role, owner_id):
+    try:
+        artifact_data = read_artifact(artifact_id, role, owner_id)
+    except (LookupError, PermissionError, ValueError) as error:
+        print(error)
         return
 
-    # Proceed to collect artifact data
-    for csv_filename in csv_files:
-        with open(csv_filename, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row.get("artifactID") == artifact_id:
-                    for key, value in row.items():
-                        if key in displayed_data:  # Only collect displayed fields
-                            artifact_data[key] = decrypt_data(encryption_key, value)
-
-    # Display the artifact data if found
-    if len(artifact_data) > 1:
-        print("\nArtifact Data Found:")
-        for key, value in artifact_data.items():
-            print(f"{key}: {value}")
-    else:
-        print("\nArtifact not found.")
+    print("\nArtifact Data Found:")
+    for key, value in artifact_data.items():
+        print(f"{key}: {value}")
 
+@timed("artifacts.get_artifact_data")
 def get_artifact_data(artifact_id):
     """Fetches all related artifact data."""
-    artifact = lyrics = music_score = audio_recording = None
-
-    # Read artifacts.csv
-    with open(ARTIFACTS_CSV, "r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row["artifactID"] == artifact_id:
-                artifact = row
-                break
-
-    # Read lyrics.csv
-    with open(LYRICS_CSV, "r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row["artifactID"] == artifact_id:
-                lyrics = row
-                break
-
-    # Read music_score.csv
-    with open(MUSIC_SCORE_CSV, "r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row["artifactID"] == artifact_id:
-                music_score = row
-                break
-
-    # Read audio_recording.csv
-    with open(AUDIO_RECORDING_CSV, "r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row["artifactID"] == artifact_id:
-                audio_recording = row
-                break
-
-    return artifact, lyrics, music_score, audio_recording
+    details = artifact_details(artifact_id)
+    return details["artifacts"], details["lyrics"], details["music_scores"], details["audio_recordings"]
+
+def _source_values(table, values, digest):
+    """Return the plaintext to store for extracted values: a content store reference when the source file is known."""
+    return content_row(table, acquire(table, digest, values)) if digest else values
 
 # Factory Pattern
-def addArtifact(user_id):
+def create_artifact(user_id, title, type_, file_loc_lyrics, language, score, file_loc_audio, lyrics_data, audio_data,
+                    lyrics_digest=None, audio_digest=None):
+    """Encrypt and store a new artifact from its already extracted lyrics and audio metadata; returns its ID.
+
+    With the SHA-256 of the lyrics or audio file given, what was extracted from it is kept
+    once in the content store and shared with every artifact made from the same file.
+    """
     encryption_key = Fernet.generate_key().decode()
-    # data input + encryption
-    title = encrypt_data(encryption_key, input("Title: "))
-    type_ = encrypt_data(encryption_key, input("Type: "))
     artifact_id = generate_id(ARTIFACTS_CSV, "artifactID")
     creation_date = modification_date = get_timestamp()
-    file_loc_lyrics = encrypt_data(encryption_key, input("Lyrics File Location (Enter file exact path): "))
-    checksum = generateChecksum(decrypt_data(encryption_key, title) + decrypt_data(encryption_key, type_))
-    lyrics_data = extract_lyrics(decrypt_data(encryption_key, file_loc_lyrics))
-    lyrics = encrypt_data(encryption_key, lyrics_data)
-    language = encrypt_data(encryption_key, input("Language: "))
-    score = encrypt_data(encryption_key, input("Score: "))
-    file_loc_audio = encrypt_data(encryption_key, input("Audio File Location (Enter file exact path): "))
-    audio_data = extractMetadataAudio(decrypt_data(encryption_key, file_loc_audio))
-    audio_format = encrypt_data(encryption_key, audio_data["format"])
-    duration = encrypt_data(encryption_key, str(audio_data["duration"]))
-    
+    checksum = generateChecksum(title + type_)
+    lyrics_values = _source_values("lyrics", {"lyrics": lyrics_data}, lyrics_digest)
+    audio_values = _source_values("audio_recordings", {"format": audio_data["format"], "duration": audio_data["duration"]}, audio_digest)
+
+    # encryption, every field of the artifact in one batch
+    with timer("artifacts.add.seal"):
+        artifact, lyrics, music_score, audio_recording = seal_rows([
+            (encryption_key, "artifacts", {"title": title, "type": type_, "fileLocLyrics": file_loc_lyrics, "fileLocAudio": file_loc_audio}),
+            (encryption_key, "lyrics", dict(lyrics_values, language=language)),
+            (encryption_key, "music_scores", {"score": score}),
+            (encryption_key, "audio_recordings", audio_values),
+        ])
+
     # save data
-    with open(ARTIFACTS_CSV, "a", newline="") as f:
-        csv.writer(f).writerow([artifact_id, title, type_, user_id, creation_date, modification_date, checksum, encryption_key, file_loc_lyrics, file_loc_audio])
-    with open(LYRICS_CSV, "a", newline="") as f:
-        csv.writer(f).writerow([generate_id(LYRICS_CSV, "lyricsID"), artifact_id, lyrics, language])
-    with open(MUSIC_SCORE_CSV, "a", newline="") as f:
-        csv.writer(f).writerow([generate_id(MUSIC_SCORE_CSV, "scoreID"), artifact_id, score])
-    with open(AUDIO_RECORDING_CSV, "a", newline="")as f:
-        csv.writer(f).writerow([generate_id(AUDIO_RECORDING_CSV, "recordingID"), artifact_id, audio_format, duration])
-    
+    with timer("artifacts.add.save"):
+        insert_row(ARTIFACTS_CSV, [artifact_id, artifact["title"], artifact["type"], user_id, creation_date, modification_date, checksum, wrap_key(encryption_key), artifact["fileLocLyrics"], artifact["fileLocAudio"]])
+        listing_upsert(artifact_id, user_id, title, modification_date)
+        insert_row(LYRICS_CSV, [generate_id(LYRICS_CSV, "lyricsID"), artifact_id, lyrics["lyrics"], lyrics["language"]])
+        insert_row(MUSIC_SCORE_CSV, [generate_id(MUSIC_SCORE_CSV, "scoreID"), artifact_id, music_score["score"]])
+        insert_row(AUDIO_RECORDING_CSV, [generate_id(AUDIO_RECORDING_CSV, "recordingID"), artifact_id, audio_recording["format"], audio_recording["duration"]])
+    update_index([(artifact_id, {}, {"title": title, "type": type_, "language": language, "lyrics": lyrics_data})])
+
     recordAccess(user_id, artifact_id, "Add Artifact", ACCESS_LOG_CSV) # access log
+    return artifact_id
+
+def addArtifact(user_id):
+    # data input
+    title = input("Title: ")
+    type_ = input("Type: ")
+    file_loc_lyrics = input("Lyrics File Location (Enter file exact path): ")
+    lyrics_data, lyrics_digest = extract_lyrics(file_loc_lyrics)
+    language = input("Language: ")
+    score = input("Score: ")
+    file_loc_audio = input("Audio File Location (Enter file exact path): ")
+    audio_data, audio_digest = extractMetadataAudio(file_loc_audio)
+
+    create_artifact(user_id, title, type_, file_loc_lyrics, language, score, file_loc_audio, lyrics_data, audio_data,
+                    lyrics_digest, audio_digest)
     print("Artifact added successfully!")
 
 def viewArtifacts(user_id, role):
     if role == "creator": # ensuring creator could only access their own artifacts
-        display_csv_data("database/artifacts.csv", "database/users.csv", role, owner_id = user_id)
+        display_csv_data(ARTIFACTS_CSV, USERS_CSV, role, owner_id = user_id)
         artifact_id = input("Enter the artifact ID you want to view: ").strip()
         recordAccess(user_id, artifact_id, "View Artifact", ACCESS_LOG_CSV) # access log
         display_all_data(artifact_id, role, owner_id=user_id)
     else:
-        display_csv_data("database/artifacts.csv", "database/users.csv", role)
+        display_csv_data(ARTIFACTS_CSV, USERS_CSV, role)
         artifact_id = input("Enter the artifact ID you want to view: ").strip()
         recordAccess(user_id, artifact_id, "View Artifact", ACCESS_LOG_CSV) # access log
         display_all_data(artifact_id, role, owner_id=user_id)
 
+def searchArtifacts(user_id, role):
+    query = input("Search (words, or \"a phrase\" in quotes): ").strip()
+    field = input(f"Only in ({'/'.join(SEARCH_FIELDS)}, leave blank for all): ").strip().lower()
+    if field and field not in SEARCH_FIELDS:
+        print("Invalid field.")
+        return
+    try:
+        with timer("artifacts.search"):
+            hits = search(query, user_id, role, field or None)
+    except ValueError as error:
+        print(error)
+        return
+    if not hits:
+        print("No matching artifacts found.")
+        return
+
+    # Table header
+    print(f"{'Artifact ID':<12} | {'Title (Decrypted)':<30} | {'Type':<15} | {'Language':<10}")
+    print("-" * 75)
+    for artifact_id, _, values in hits:
+        print(f"{artifact_id:<12} | {values['title']:<30} | {values['type']:<15} | {values['language']:<10}")
+
+    artifact_id = input("Enter the artifact ID you want to view (leave blank to return): ").strip()
+    if artifact_id:
+        recordAccess(user_id, artifact_id, "View Artifact", ACCESS_LOG_CSV) # access log
+        display_all_data(artifact_id, role, owner_id=user_id)
+
+def update_artifact(user_id, role, artifact_id, changes, new_lyrics="", new_audio=None, lyrics_digest=None, audio_digest=None):
+    """Apply changes to an artifact and its related rows as one transaction.
+
+    changes may hold "title", "type", "lyrics_path", "language", "score" and "audio_path";
+    blank values keep the previous data. new_lyrics and new_audio are what was extracted
+    from the new lyrics and audio paths, lyrics_digest and audio_digest the SHA-256 of
+    those files. Raises LookupError or PermissionError.
+    """
+    artifact, lyrics, music_score, audio_recording = get_artifact_data(artifact_id)
+    if not artifact:
+        raise LookupError("Error: Artifact ID not found.")
+    if role == "creator" and artifact["ownerID"] != user_id:
+        raise PermissionError("Invalid artifact. You do not have permission to access this artifact.")
+
+    encryption_key = artifact_key(artifact)
+    indexed = searchable_values(encryption_key, artifact, lyrics) if search_enabled() else {}  # words to take out of the search index
+    replaced = []  # content store references of the lyrics and audio being replaced, released once saved
+    new_title = changes.get("title")
+    new_lyrics_path = changes.get("lyrics_path")
+    new_audio_path = changes.get("audio_path")
+
+    # Update artifact data, only the changed plaintext values are passed on
+    artifact_changes = {}
+    if new_title:
+        artifact_changes["title"] = new_title
+    if changes.get("type"):
+        artifact_changes["type"] = changes["type"]
+    if new_lyrics_path:
+        artifact_changes["fileLocLyrics"] = new_lyrics_path
+    if new_audio_path:
+        artifact_changes["fileLocAudio"] = new_audio_path
+    artifact = reseal_row(encryption_key, "artifacts", artifact, artifact_changes)
+    artifact["modificationDate"] = get_timestamp()
+
+    if lyrics:
+        lyrics_changes = {}
+        if new_lyrics_path:
+            replaced.extend(references([(encryption_key, "lyrics", lyrics)]))
+            lyrics_changes.update(_source_values("lyrics", {"lyrics": new_lyrics}, lyrics_digest))
+        if changes.get("language"):
+            lyrics_changes["language"] = changes["language"]
+        lyrics = reseal_row(encryption_key, "lyrics", lyrics, lyrics_changes)
+
+    if music_score:
+        music_score = reseal_row(encryption_key, "music_scores", music_score, {"score": changes["score"]} if changes.get("score") else {})
+
+    if audio_recording:
+        audio_changes = {}
+        if new_audio_path:
+            replaced.extend(references([(encryption_key, "audio_recordings", audio_recording)]))
+            audio_changes = _source_values("audio_recordings", {"format": new_audio["format"], "duration": new_audio["duration"]}, audio_digest)
+        audio_recording = reseal_row(encryption_key, "audio_recordings", audio_recording, audio_changes)
+
+    # Save the updated records as one transaction across all affected tables
+    updates = [(ARTIFACTS_CSV, "artifactID", artifact_id, artifact)]
+    if lyrics:
+        updates.append((LYRICS_CSV, "artifactID", artifact_id, lyrics))
+    if music_score:
+        updates.append((MUSIC_SCORE_CSV, "artifactID", artifact_id, music_score))
+    if audio_recording:
+        updates.append((AUDIO_RECORDING_CSV, "artifactID", artifact_id, audio_recording))
+    with timer("artifacts.modify.save"):
+        update(updates)
+    for table, reference in replaced:
+        release(table, reference)
+    searchable = dict(indexed, **{field: changes[field] for field in ["title", "type"] if changes.get(field)})
+    if lyrics and changes.get("language"):
+        searchable["language"] = changes["language"]
+    if lyrics and new_lyrics_path:
+        searchable["lyrics"] = new_lyrics
+    update_index([(artifact_id, indexed, searchable)])
+    listing_upsert(artifact_id, artifact["ownerID"], new_title or open_row(encryption_key, "artifacts", artifact, ["title"])["title"], artifact["modificationDate"])
+
+    recordAccess(user_id, artifact_id, "Modify Artifact", ACCESS_LOG_CSV) # access log
+
 def modifyOwnArtifact(user_id, role):
     # Display artifacts before modification
     if role == "creator": # ensuring creator could only access their own artifacts
@@ -186,112 +261,76 @@ def modifyOwnArtifact(user_id, role):
     if not artifact:
         print("Error: Artifact ID not found.")
         return
-
-    # Extract encryption key
-    encryption_key = get_encryption_key(artifact_id, ARTIFACTS_CSV)
+    if role == "creator" and artifact["ownerID"] != user_id:
+        return  # display_all_data has explained why
 
     # Ask for new values, allowing blank value to keep old ones
-    new_title = input("Enter new title (leave blank to keep previous data): ").strip()
-    new_type = input("Enter new type (leave blank to keep previous data): ").strip()
+    changes = {}
+    changes["title"] = input("Enter new title (leave blank to keep previous data): ").strip()
+    changes["type"] = input("Enter new type (leave blank to keep previous data): ").strip()
 
-    new_lyrics_path = input("Enter new lyrics exact file path (leave blank to keep previous data): ").strip() if lyrics else None
-    new_lyrics = extract_lyrics(new_lyrics_path)
-    new_language = input("Enter new language (leave blank to keep previous data): ").strip() if lyrics else None
+    changes["lyrics_path"] = input("Enter new lyrics exact file path (leave blank to keep previous data): ").strip() if lyrics else None
+    new_lyrics, lyrics_digest = extract_lyrics(changes["lyrics_path"]) if lyrics else ("", None)
+    changes["language"] = input("Enter new language (leave blank to keep previous data): ").strip() if lyrics else None
 
-    new_score = input("Enter new score (leave blank to keep previous data): ").strip() if music_score else None
+    changes["score"] = input("Enter new score (leave blank to keep previous data): ").strip() if music_score else None
 
-    new_audio_path = input("Enter new audio exact file path (leave blank to keep previous data): ").strip() if audio_recording else None
-    new_audio = extractMetadataAudio(new_audio_path)
+    changes["audio_path"] = input("Enter new audio exact file path (leave blank to keep previous data): ").strip() if audio_recording else None
+    new_audio, audio_digest = extractMetadataAudio(changes["audio_path"]) if audio_recording else (None, None)
 
-    # Update artifact data
-    artifact["title"] = encrypt_data(encryption_key, new_title) if new_title else artifact["title"]
-    artifact["type"] = encrypt_data(encryption_key, new_type) if new_type else artifact["type"]
-    artifact["modificationDate"] = get_timestamp()
-    artifact["fileLocLyrics"] = encrypt_data(encryption_key, new_lyrics_path) if new_lyrics_path else artifact["fileLocLyrics"]
-    artifact["fileLocAudio"] = encrypt_data(encryption_key, new_audio_path) if new_audio_path else artifact["fileLocAudio"]
+    try:
+        update_artifact(user_id, role, artifact_id, changes, new_lyrics, new_audio, lyrics_digest, audio_digest)
+    except ValueError as error:
+        print(error)
+        return
+    print("Artifact updated successfully!")
 
-    if lyrics:
-        lyrics["lyrics"] = encrypt_data(encryption_key, new_lyrics) if new_lyrics_path else lyrics["lyrics"]
-        lyrics["language"] = encrypt_data(encryption_key, new_language) if new_language else lyrics["language"]
+def remove_artifact(user_id, artifact_id):
+    """Delete an artifact and its related rows from every table; returns False if nothing was found."""
+    def remove_entry(csv_file, key, value):
+        """Helper function to delete entries matching a key-value pair in a table."""
+        return delete(csv_file, key, value) > 0
 
-    if music_score:
-        music_score["score"] = encrypt_data(encryption_key, new_score) if new_score else music_score["score"]
+    # Shared lyrics and audio metadata lose one reference, read before the rows go
+    details = artifact_details(artifact_id)
+    key = artifact_key(details["artifacts"])
+    shared = references([(key, table, details[table]) for table in ["lyrics", "audio_recordings"]]) if key else []
+    indexed = searchable_values(key, details["artifacts"], details["lyrics"]) if key and search_enabled() else {}
 
-    if audio_recording:
-        audio_recording["format"] = encrypt_data(encryption_key, new_audio["format"]) if new_audio_path else audio_recording["format"]
-        audio_recording["duration"] = encrypt_data(encryption_key, str(new_audio["duration"])) if new_audio_path else audio_recording["duration"]
-
-
-    # Save the updated records back to the CSV files
-    def update_csv(file_path, data, key_column):
-        """Updates a CSV file with modified data."""
-        rows = []
-        with open(file_path, "r", newline="", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            fieldnames = reader.fieldnames
-            for row in reader:
-                if row[key_column] == artifact_id:
-                    rows.append(data)
-                else:
-                    rows.append(row)
-
-        with open(file_path, "w", newline="", encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-
-    update_csv(ARTIFACTS_CSV, artifact, "artifactID")
-    if lyrics:
-        update_csv(LYRICS_CSV, lyrics, "artifactID")
-    if music_score:
-        update_csv(MUSIC_SCORE_CSV, music_score, "artifactID")
-    if audio_recording:
-        update_csv(AUDIO_RECORDING_CSV, audio_recording, "artifactID")
-
-    recordAccess(user_id, artifact_id, "Modify Artifact", ACCESS_LOG_CSV) # access log
-    print("Artifact updated successfully!")
+    # Delete artifact from all sources
+    with timer("artifacts.delete"):
+        artifact_deleted = remove_entry(ARTIFACTS_CSV, "artifactID", artifact_id)
+        if artifact_deleted:
+            listing_remove(artifact_id, ARTIFACTS_CSV)
+        audio_deleted = remove_entry(AUDIO_RECORDING_CSV, "artifactID", artifact_id)
+        lyrics_deleted = remove_entry(LYRICS_CSV, "artifactID", artifact_id)
+        score_deleted = remove_entry(MUSIC_SCORE_CSV, "artifactID", artifact_id)
+        for table, reference in shared:
+            if lyrics_deleted if table == "lyrics" else audio_deleted:  # not when another session deleted it first
+                release(table, reference)
+
+    if artifact_deleted:
+        update_index([(artifact_id, indexed, {})])
 
-def delete_artifact(user_id, ARTIFACTS_CSV, AUDIO_RECORDING_CSV, LYRICS_CSV, MUSIC_SCORE_CSV):
+    recordAccess(user_id, artifact_id, "Delete Artifact", ACCESS_LOG_CSV) # access log
+    return artifact_deleted or audio_deleted or lyrics_deleted or score_deleted
 
+def delete_artifact(user_id):
     """Deletes an artifact and its related data from all sources."""
-    
+
     artifact_id = input("\nEnter Artifact ID to remove (leave blank to cancel): ").strip()
     
     if not artifact_id:  # If empty input
-        print("No artifact id entered. Operation cancelled.")    
-    
-    def remove_entry(csv_file, key, value):
-        """Helper function to remove entries matching a key-value pair in a CSV file."""
-        updated_data = []
-        found = False
-        
-        with open(csv_file, mode="r", newline="", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            data = list(reader)
-        
-        for row in data:
-            if row[key] == value:
-                found = True  # Mark that we found and removed the entry
-            else:
-                updated_data.append(row)
-        
-        if found:
-            with open(csv_file, mode="w", newline="", encoding="utf-8") as file:
-                writer = csv.DictWriter(file, fieldnames=reader.fieldnames)
-                writer.writeheader()
-                writer.writerows(updated_data)
-        
-        return found
-
-    # Delete artifact from all sources
-    artifact_deleted = remove_entry(ARTIFACTS_CSV, "artifactID", artifact_id)
-    audio_deleted = remove_entry(AUDIO_RECORDING_CSV, "artifactID", artifact_id)
-    lyrics_deleted = remove_entry(LYRICS_CSV, "artifactID", artifact_id)
-    score_deleted = remove_entry(MUSIC_SCORE_CSV, "artifactID", artifact_id)
+        print("No artifact id entered. Operation cancelled.")
+        return
 
-    recordAccess(user_id, artifact_id, "Delete Artifact", ACCESS_LOG_CSV) # access log
     # Check if anything was deleted
-    if artifact_deleted or audio_deleted or lyrics_deleted or score_deleted:
+    try:
+        removed = remove_artifact(user_id, artifact_id)
+    except ValueError as error:
+        print(error)
+        return
+    if removed:
         print(f"Artifact ID {artifact_id} and related data have been removed.")
     else:
-        print(f"Artifact ID {artifact_id} not found.")
\ No newline at end of file
+        print(f"Artifact ID {artifact_id} not found.")
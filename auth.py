@@ -1,40 +1,44 @@
-import os
 import hashlib
-import csv
-from utils import get_timestamp, generate_id
-from artifacts import viewArtifacts, addArtifact, modifyOwnArtifact, delete_artifact, display_csv_data
-
-database_folder = "database"
-os.makedirs(database_folder, exist_ok=True)
-
-# CSV File Paths
-USERS_CSV = os.path.join(database_folder, "users.csv")
-ARTIFACTS_CSV = os.path.join(database_folder, "artifacts.csv")
-ACCESS_LOG_CSV = os.path.join(database_folder, "access_logs.csv")
-LYRICS_CSV = os.path.join(database_folder, "lyrics.csv")
-MUSIC_SCORE_CSV = os.path.join(database_folder, "music_scores.csv")
-AUDIO_RECORDING_CSV = os.path.join(database_folder, "audio_recordings.csv")
+from utils import generate_id
+from storage import username_taken, find_users, add_user, remove_user, list_users_page
+from storage import USERS_CSV, ARTIFACTS_CSV
+from access_log import flush_access_log
+import instrumentation
+from instrumentation import timer
+from artifacts import viewArtifacts, searchArtifacts, addArtifact, modifyOwnArtifact, delete_artifact, display_csv_data
+from access_report import show_access_reports
+from listing import PAGE_SIZE
 
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def recordAccess(user_id, artifact_id, access_type, ACCESS_LOG_CSV):
-    if not artifact_id:  # Skip logging if artifact_id is empty or None
-        return
-    log_id = generate_id(ACCESS_LOG_CSV, "logID")
-    timestamp = get_timestamp()
-    with open(ACCESS_LOG_CSV, "a", newline="") as f:
-        csv.writer(f).writerow([log_id, user_id, artifact_id, access_type, timestamp]) 
-
 def username_exists(username, csv_filename):
-    """Check if the username already exists in the CSV file."""
-    try:
-        with open(csv_filename, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            return any(row["username"].lower() == username.lower() for row in reader)
-    except FileNotFoundError:
-        return False  # If the file doesn't exist, no usernames exist yet
+    """Check if the username already exists in the users table."""
+    return username_taken(username, csv_filename)  # case-folded directory lookup
+
+def register_user(username, email, password, role):
+    """Create a user and return the new userID; raises ValueError for an invalid role or a taken username."""
+    if role not in ["admin", "creator", "viewer"]:
+        raise ValueError("Invalid role.")
+
+    user_id = generate_id(USERS_CSV, "userID")
+    password_hash = hash_password(password)
+
+    # add_user checks again under the lock, another session may have taken the name while we prompted
+    if not add_user([user_id, username, email, password_hash, role], USERS_CSV):
+        raise ValueError("Username already exists. Please choose a different one.")
+    return user_id
+
+def authenticate(username, password):
+    """Return (userID, role) when the username and password match a user, otherwise None."""
+    password_hash = hash_password(password)
+    with timer("auth.find_users"):
+        candidates = find_users(username, USERS_CSV)  # removed users are skipped
+    for row in candidates:
+        if row["username"] == username and row["passwordHash"] == password_hash:
+            return row["userID"], row["role"]
+    return None
 
 def register():
     username = input("Username: ").strip()
@@ -46,43 +50,34 @@ def register():
     email = input("Email: ").strip()
     password = input("Password: ").strip()
     role = input("Role (admin/creator/viewer): ").strip().lower()
-    
-    if role not in ["admin", "creator", "viewer"]:
-        print("Invalid role.")
-        return
 
-    user_id = generate_id(USERS_CSV, "userID")
-    password_hash = hash_password(password)
-
-    with open(USERS_CSV, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([user_id, username, email, password_hash, role])
+    try:
+        register_user(username, email, password, role)
+    except ValueError as error:
+        print(error)
+        return
 
     print("Registration successful!")
 
 def login():
     username = input("Username: ")
     password = input("Password: ")
-    password_hash = hash_password(password)
-
-    with open(USERS_CSV, "r", newline="", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header row
 
-        for row in reader:
-            if len(row) >= 5 and row[1] == username and row[3] == password_hash:
-                user_id = row[0]  # Extract userID
-                role = row[4]  # Extract role
-                print(f"Welcome, {username}!")
-                user_dashboard(user_id, role)  # Pass userID and role
-                return
+    user = authenticate(username, password)
+    if user is None:
+        print("Invalid credentials.")
+        return
 
-    print("Invalid credentials.")
+    user_id, role = user
+    print(f"Welcome, {username}!")
+    instrumentation.start_session(user_id)  # counters cover this login only
+    user_dashboard(user_id, role)  # Pass userID and role
 
 def user_dashboard(user_id, role):
     while True:
         print("\nDashboard")
         print("> View Artifacts (va)")
+        print("> Search Artifacts (sa)")
         if role in ["admin", "creator"]:
             print("> Add Artifact (aa)")
         if role == "creator":
@@ -90,42 +85,59 @@ def user_dashboard(user_id, role):
         if role == "admin":
             print("> Delete Artifact (da)")
             print("> Manage Users (mu)")
+            print("> Access Reports (ar)")
         print("> Logout (lo)")
         
         choice = input("Select an option: ").strip().lower()
         if choice == "va":
             viewArtifacts(user_id, role)
+        elif choice == "sa":
+            searchArtifacts(user_id, role)
         elif choice == "aa" and role in ["admin", "creator"]:
             addArtifact(user_id)
         elif choice == "ma" and role == "creator":
             modifyOwnArtifact(user_id, role)
         elif choice == "mu" and role == "admin":
             manage_users(USERS_CSV)
+        elif choice == "ar" and role == "admin":
+            show_access_reports()
         elif choice == "da" and role == "admin":
             display_csv_data(ARTIFACTS_CSV, USERS_CSV, role)
-            delete_artifact(user_id, ARTIFACTS_CSV, AUDIO_RECORDING_CSV, LYRICS_CSV, MUSIC_SCORE_CSV)
+            delete_artifact(user_id)
         elif choice == "lo":
+            flush_access_log()
+            report = instrumentation.summary()
+            path = instrumentation.end_session()
+            if path:
+                instrumentation.print_summary(report)
+                print(f"Instrumentation written to {path}")
             print("Logging out...")
             break
         else:
             print("Invalid option. Try again.")
 
 def manage_users(users_csv):
-    """Displays users and prompts for user removal."""
-    
+    """Displays users page by page and prompts for user removal."""
+    prefix = input("Filter by username prefix (leave blank to list all): ").strip()
+    cursor = None
+    found = False
+
     # Read and display users
-    users = []
-    with open(users_csv, mode="r", newline="", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
+    while True:
+        with timer("auth.list_users_page"):
+            users, cursor = list_users_page(prefix, PAGE_SIZE, cursor, users_csv)
+        found = found or bool(users)
 
         print(f"{'User ID':<10} | {'Username':<15} | {'Email':<25} | {'Role':<10}")
         print("-" * 65)
 
-        for row in reader:
-            users.append(row)
+        for row in users:
             print(f"{row['userID']:<10} | {row['username']:<15} | {row['email']:<25} | {row['role']:<10}")
 
-    if not users:
+        if not cursor or input("> Next page (n), or press Enter to continue: ").strip().lower() != "n":
+            break
+
+    if not found:
         print("No users found.")
         return
 
@@ -136,19 +148,9 @@ def manage_users(users_csv):
         print("No user ID entered. Operation cancelled.")
         return
 
-    # Filter out the user
-    updated_users = [row for row in users if row["userID"] != user_id]
-
-    # Check if user was found
-    if len(updated_users) == len(users):
+    # Remove the user; check if user was found
+    if not remove_user(user_id, users_csv):
         print(f"User ID {user_id} not found.")
         return
 
-    # Write back the updated data
-    with open(users_csv, mode="w", newline="", encoding="utf-8") as file:
-        fieldnames = ["userID", "username", "email", "passwordHash", "role"]
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(updated_users)
-
     print(f"User ID {user_id} has been removed successfully.")
\ No newline at end of file
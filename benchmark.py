@@ -0,0 +1,270 @@
+import argparse
+import builtins
+import contextlib
+import datetime
+import io
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+import storage
+from storage import scan, BACKEND, USERS_CSV, ARTIFACTS_CSV
+from encryption import RECORD_FORMAT
+from auth import login
+from artifacts import display_csv_data, display_all_data, modifyOwnArtifact, delete_artifact
+from access_log import flush_access_log
+from database.generateData import GENERATED_PASSWORD
+
+BENCHMARK_OUTPUT = "benchmark.json"
+PERCENTILES = [50, 90, 99]
+STARTUP_BUDGET_MS = 1000  # cold interpreter wall time allowed for logging in and listing one page
+LAZY_MODULES = ["pdfplumber", "pdfminer", "mutagen"]  # only imported once a file is extracted, see extractors.py
+
+# Run by a fresh interpreter: log in, list the first page, log out, exit, and report the imports
+STARTUP_SCRIPT = """
+import builtins, contextlib, io, json, sys, time
+started = time.perf_counter()
+answers = {"Select an option": iter(["lo", "va", "lo", "ex"]), "Username": iter([sys.argv[1]]), "Password": iter([sys.argv[2]])}
+def scripted(prompt=""):
+    for prefix, values in answers.items():
+        if prompt.startswith(prefix):
+            return next(values)
+    return ""
+builtins.input = scripted
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+    imported = time.perf_counter()
+    main.main()
+loaded = sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[3:]))
+print(json.dumps({"import_ms": (imported - started) * 1000, "run_ms": (time.perf_counter() - imported) * 1000, "lazy_loaded": loaded}))
+"""
+
+_rows_read = [0]
+
+
+def _count_rows(function):
+    """Wrap a backend read so every row it returns is added to _rows_read."""
+    def counted(*args, **kwargs):
+        result = function(*args, **kwargs)
+        if isinstance(result, tuple):  # (rows, cursor) from the paged reads
+            _rows_read[0] += len(result[0])
+        elif isinstance(result, dict):  # artifact_details
+            _rows_read[0] += sum(1 for row in result.values() if row)
+        elif isinstance(result, list):
+            _rows_read[0] += len(result)
+        else:
+            return _count_scan(result)
+        return result
+    return counted
+
+def _count_scan(rows):
+    for row in rows:
+        _rows_read[0] += 1
+        yield row
+
+def _install_counters():
+    for name in ["get_rows", "scan", "page", "artifact_details", "find_users", "list_users_page"]:
+        setattr(storage.backend, name, _count_rows(getattr(storage.backend, name)))
+
+def _bytes_read():
+    """Bytes this process has read through system calls, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/io", "r", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _scripted_input(responses):
+    """Answer prompts by prefix, and press Enter on every other prompt."""
+    def scripted(prompt=""):
+        for prefix, answer in responses:
+            if prompt.startswith(prefix):
+                return answer
+        return ""
+    return scripted
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+def measure(operation, runs, warmup):
+    """Run an operation runs + warmup times; operation(i) returns (callable, prompt responses)."""
+    timings, rows, read = [], [], []
+    original_input = builtins.input
+    try:
+        for run in range(warmup + runs):
+            call, responses = operation(run)
+            builtins.input = _scripted_input(responses)
+            rows_before, bytes_before = _rows_read[0], _bytes_read()
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                call()
+                elapsed = time.perf_counter() - started
+            if run < warmup:
+                continue  # first runs build indexes and caches
+            timings.append(elapsed * 1000)
+            rows.append(_rows_read[0] - rows_before)
+            if bytes_before is not None:
+                read.append(_bytes_read() - bytes_before)
+    finally:
+        builtins.input = original_input
+
+    result = {"runs": runs, "mean_ms": round(sum(timings) / len(timings), 3)}
+    for percentile in PERCENTILES:
+        result[f"p{percentile}_ms"] = round(_percentile(timings, percentile), 3)
+    result["max_ms"] = round(max(timings), 3)
+    result["rows_scanned_per_op"] = round(sum(rows) / len(rows), 1)
+    result["bytes_read_per_op"] = round(sum(read) / len(read)) if read else None
+    return result
+
+def measure_startup(username, password, runs=5):
+    """Time cold interpreters going through the login-and-list path and report which LAZY_MODULES they imported."""
+    timings, imports, loaded = [], [], set()
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, username, password, *LAZY_MODULES],
+                                capture_output=True, text=True, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+        child = json.loads(result.stdout.strip().splitlines()[-1])
+        imports.append(child["import_ms"])
+        loaded.update(child["lazy_loaded"])
+    return {
+        "runs": runs,
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "max_ms": round(max(timings), 3),
+        "import_p50_ms": round(_percentile(imports, 50), 3),
+        "lazy_loaded": sorted(loaded),
+    }
+
+def _startup_user():
+    """Return the username of a generated user, who logs in with GENERATED_PASSWORD, or None."""
+    for row in scan(USERS_CSV):
+        if row["username"].startswith("bench"):
+            return row["username"]
+    return None
+
+def run_benchmark(runs=50, warmup=1, seed=0):
+    """Drive the interactive functions with scripted input and return the report dict.
+
+    modifyOwnArtifact and delete_artifact change the data, run this on a generated copy.
+    """
+    rng = random.Random(seed)
+    users = list(scan(USERS_CSV))
+    artifacts = [(row["artifactID"], row["ownerID"]) for row in scan(ARTIFACTS_CSV)]
+    roles = {row["userID"]: row["role"] for row in users}
+    generated = [row for row in users if row["username"].startswith("bench")]
+    admins = [row["userID"] for row in users if row["role"] == "admin"]
+    creators = [row["userID"] for row in users if row["role"] == "creator"]
+    creator_artifacts = [artifact for artifact in artifacts if roles.get(artifact[1]) == "creator"]
+    rng.shuffle(artifacts)
+    to_delete = artifacts[-(runs + warmup):]
+    _install_counters()
+
+    operations = {}
+    if generated:
+        def login_operation(run):
+            user = rng.choice(generated)
+            return login, [("Username", user["username"]), ("Password", GENERATED_PASSWORD), ("Select an option", "lo")]
+        operations["login"] = login_operation
+
+    def listing_operation(run):
+        return lambda: display_csv_data(ARTIFACTS_CSV, USERS_CSV, "admin"), []
+    operations["display_csv_data"] = listing_operation
+
+    if creators:
+        def creator_listing_operation(run):
+            owner = rng.choice(creators)
+            return lambda: display_csv_data(ARTIFACTS_CSV, USERS_CSV, "creator", owner_id=owner), []
+        operations["display_csv_data_creator"] = creator_listing_operation
+
+    if artifacts and admins:
+        def view_operation(run):
+            artifact_id = rng.choice(artifacts)[0]
+            return lambda: display_all_data(artifact_id, "admin", admins[0]), []
+        operations["display_all_data"] = view_operation
+
+    if creator_artifacts:
+        def modify_operation(run):
+            artifact_id, owner = rng.choice(creator_artifacts)
+            responses = [("Enter the artifact ID you want to modify", artifact_id), ("Enter new title", f"Benchmark {run}")]
+            return lambda: modifyOwnArtifact(owner, "creator"), responses
+        operations["modifyOwnArtifact"] = modify_operation
+
+    if len(to_delete) == runs + warmup and admins:
+        def delete_operation(run):
+            artifact_id = to_delete[run][0]
+            responses = [("\nEnter Artifact ID to remove", artifact_id)]
+            return lambda: delete_artifact(admins[0]), responses
+        operations["delete_artifact"] = delete_operation
+
+    results = {name: measure(operation, runs, warmup) for name, operation in operations.items()}
+    flush_access_log()
+    startup = measure_startup(generated[0]["username"], GENERATED_PASSWORD) if generated else None
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "started": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "backend": BACKEND,
+        "record_format": RECORD_FORMAT,
+        "users": len(users),
+        "artifacts": len(artifacts),
+        "operations": results,
+        "startup": startup,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the main operations. Modifies and deletes artifacts, use generated data.")
+    parser.add_argument("--runs", type=int, default=50, help="measured runs per operation")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured runs per operation before timing")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for choosing users and artifacts")
+    parser.add_argument("--output", default=BENCHMARK_OUTPUT, help="JSON file the report is written to")
+    parser.add_argument("--startup", action="store_true", help="only check the cold login-and-list time against --budget-ms")
+    parser.add_argument("--startup-runs", type=int, default=5, help="cold interpreters started for the startup check")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="startup budget in milliseconds")
+    parser.add_argument("--username", default=None, help="user for the startup check (default: a generated user)")
+    parser.add_argument("--password", default=GENERATED_PASSWORD, help="password of --username")
+    args = parser.parse_args()
+
+    if args.startup:
+        username = args.username or _startup_user()
+        if username is None:
+            sys.exit("No user to log in with: pass --username and --password, or run database/generateData.py")
+        startup = measure_startup(username, args.password, args.startup_runs)
+        print(f"Cold login-and-list: p50 {startup['p50_ms']} ms (imports {startup['import_p50_ms']} ms), "
+              f"max {startup['max_ms']} ms, budget {args.budget_ms} ms")
+        failures = []
+        if startup["p50_ms"] > args.budget_ms:
+            failures.append(f"over the startup budget by {round(startup['p50_ms'] - args.budget_ms, 3)} ms")
+        if startup["lazy_loaded"]:
+            failures.append(f"imported {', '.join(startup['lazy_loaded'])} without extracting a file")
+        if failures:
+            sys.exit("Startup regression: " + "; ".join(failures))
+        return
+
+    report = run_benchmark(args.runs, args.warmup, args.seed)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"{'Operation':<26} | {'p50 ms':>9} | {'p90 ms':>9} | {'p99 ms':>9} | {'rows/op':>9} | {'bytes/op':>11}")
+    print("-" * 88)
+    for name, result in report["operations"].items():
+        bytes_read = result["bytes_read_per_op"] if result["bytes_read_per_op"] is not None else "n/a"
+        print(f"{name:<26} | {result['p50_ms']:>9} | {result['p90_ms']:>9} | {result['p99_ms']:>9} | "
+              f"{result['rows_scanned_per_op']:>9} | {bytes_read:>11}")
+    if report["startup"]:
+        print(f"Cold login-and-list: p50 {report['startup']['p50_ms']} ms, imports {report['startup']['import_p50_ms']} ms")
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
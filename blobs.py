@@ -0,0 +1,92 @@
+import mmap
+import os
+import threading
+from locks import exclusive_lock
+import instrumentation
+
+database_folder = "database"
+os.makedirs(database_folder, exist_ok=True)
+
+BLOB_FILE = os.path.join(database_folder, "blobs.dat")
+BLOB_PREFIX = "@blob:"  # a reserved prefix, see ENVELOPE_PREFIX in encryption.py
+BLOB_THRESHOLD = 1024  # values shorter than this stay inline in the table
+
+# table name -> columns whose large values are kept in the blob file
+BLOB_FIELDS = {
+    "lyrics": ["lyrics"],
+    "music_scores": ["score"],
+    "contents": ["data"],
+}
+
+_map = None
+_map_lock = threading.Lock()
+
+
+def is_blob_ref(value):
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+def store_blobs(values):
+    """Append values to the blob file in one write and return their "@blob:offset:length" references."""
+    encoded = [value.encode("utf-8") for value in values]
+    with exclusive_lock("blobs"):
+        with open(BLOB_FILE, "ab") as file:
+            offset = file.seek(0, os.SEEK_END)
+            file.write(b"".join(encoded))
+            file.flush()
+            os.fsync(file.fileno())  # durable before any row points at it
+    if instrumentation.ENABLED:
+        instrumentation.count("bytes.written", sum(len(data) for data in encoded))
+
+    refs = []
+    for data in encoded:
+        refs.append(f"{BLOB_PREFIX}{offset}:{len(data)}")
+        offset += len(data)
+    return refs
+
+def _read(offset, length):
+    """Return bytes of the blob file from a read-only map, remapping once the file has grown.
+
+    The slice is taken under the lock, another thread may close the map when it remaps.
+    """
+    global _map
+    with _map_lock:
+        if _map is None or len(_map) < offset + length:
+            if _map is not None:
+                _map.close()
+            with open(BLOB_FILE, "rb") as file:
+                _map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return _map[offset:offset + length]
+
+def load_blob(ref):
+    offset, length = (int(part) for part in ref[len(BLOB_PREFIX):].split(":"))
+    if instrumentation.ENABLED:
+        instrumentation.count("bytes.read", length)
+    return _read(offset, length).decode("utf-8")
+
+def materialize(value):
+    """Return the stored text for a blob reference, or the value itself when it is inline."""
+    return load_blob(value) if is_blob_ref(value) else value
+
+def externalize_rows(table, fieldnames, rows):
+    """Return the list rows with their large blob fields moved into the blob file."""
+    positions = [fieldnames.index(column) for column in BLOB_FIELDS.get(table, [])]
+    if not positions:
+        return rows
+    rows = [list(row) for row in rows]
+    large = [(row, position) for row in rows for position in positions
+             if len(str(row[position])) >= BLOB_THRESHOLD and not is_blob_ref(row[position])]
+    if large:
+        for (row, position), ref in zip(large, store_blobs([str(row[position]) for row, position in large])):
+            row[position] = ref
+    return rows
+
+def externalize_row(table, row):
+    """Return a copy of a dict row with its large blob fields moved into the blob file."""
+    columns = [column for column in BLOB_FIELDS.get(table, [])
+               if len(row.get(column) or "") >= BLOB_THRESHOLD and not is_blob_ref(row[column])]
+    if not columns:
+        return row
+    row = dict(row)
+    for column, ref in zip(columns, store_blobs([row[column] for column in columns])):
+        row[column] = ref
+    return row
@@ -0,0 +1,199 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from cryptography.fernet import Fernet
+from encryption import seal_rows, wrap_key
+from storage import get_row, insert, transaction
+from storage import USERS_CSV, ARTIFACTS_CSV, ACCESS_LOG_CSV, LYRICS_CSV, MUSIC_SCORE_CSV, AUDIO_RECORDING_CSV
+from access_log import recordAccess, flush_access_log
+from utils import get_timestamp, generateChecksum, reserve_ids, probe_audio_many
+from extractors import lyrics_extractor, supported_lyrics
+from content_store import file_sha256, find, acquire, content_row
+from search_index import update_index
+
+MANIFEST_FIELDS = ["title", "type", "language", "score", "lyrics_path", "audio_path"]
+HASH_WORKERS = 8  # threads hashing source files, hashlib releases the GIL on large reads
+
+
+def read_manifest(manifest_path):
+    """Read a CSV or JSONL manifest into a list of records with the MANIFEST_FIELDS keys."""
+    records = []
+    with open(manifest_path, "r", newline="", encoding="utf-8") as file:
+        if manifest_path.lower().endswith((".jsonl", ".json")):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = csv.DictReader(file)
+        for row in rows:
+            records.append({field: str(row.get(field) or "").strip() for field in MANIFEST_FIELDS})
+    return records
+
+def extract_lyrics_source(lyrics_path):
+    """Extract the lyrics of one manifest record, without prompting.
+
+    Runs in a worker process. Returns (lyrics, error) so one bad row never stops the import.
+    """
+    try:
+        if not lyrics_path:
+            return "", None
+        extractor = lyrics_extractor(os.path.splitext(lyrics_path)[1])
+        if extractor is None:
+            raise ValueError(f"Unsupported lyrics format. Supported: {supported_lyrics()}")
+        return extractor(lyrics_path), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def hash_source(file_path):
+    """Return (SHA-256, error) for one source file, without prompting."""
+    try:
+        return file_sha256(file_path), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _known_sources(table, paths, hashed):
+    """Split distinct source paths into the stored content of known files and one path per new file to extract.
+
+    Returns ({digest: values}, {digest: path}); files listed twice in a manifest are extracted once.
+    """
+    known, pending = {}, {}
+    for path in paths:
+        digest, error = hashed[path]
+        if error or digest in known or digest in pending:
+            continue
+        values = find(table, digest)
+        if values is not None:
+            known[digest] = values
+        else:
+            pending[digest] = path
+    return known, pending
+
+def _source_result(hashed, extracted, path):
+    """Return (values, digest, error) for the source file of one record."""
+    if not path:
+        return None, None, None
+    digest, error = hashed[path]
+    if error:
+        return None, None, error
+    values, error = extracted[digest]
+    return values, digest, error
+
+def import_manifest(manifest_path, owner_id, workers=None):
+    """Import every record of a manifest as an artifact owned by owner_id.
+
+    Every source file is hashed first: files already in the content store, or listed more
+    than once, are not extracted again. Lyrics extraction runs in a process pool and audio
+    probing on a thread pool, fields are encrypted in batches and each of the four tables
+    is written with a single insert. Returns a report dict with the number of imported
+    rows, throughput and the failed rows.
+    """
+    started = time.perf_counter()
+    records = read_manifest(manifest_path)
+
+    lyrics_paths = list(dict.fromkeys(record["lyrics_path"] for record in records if record["lyrics_path"]))
+    audio_paths = list(dict.fromkeys(record["audio_path"] for record in records if record["audio_path"]))
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+        hashed = dict(zip(lyrics_paths + audio_paths, executor.map(hash_source, lyrics_paths + audio_paths)))
+    known_lyrics, pending_lyrics = _known_sources("lyrics", lyrics_paths, hashed)
+    known_audio, pending_audio = _known_sources("audio_recordings", audio_paths, hashed)
+    extracted_lyrics = {digest: (values, None) for digest, values in known_lyrics.items()}
+    extracted_audio = {digest: (values, None) for digest, values in known_audio.items()}
+
+    # PDF parsing is CPU bound and goes to processes, audio probing is I/O bound and stays on threads
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        lyrics_results = executor.map(extract_lyrics_source, list(pending_lyrics.values()), chunksize=8)
+        extracted_audio.update(zip(pending_audio, probe_audio_many(list(pending_audio.values()))))
+        for digest, (lyrics, error) in zip(pending_lyrics, lyrics_results):
+            extracted_lyrics[digest] = ({"lyrics": lyrics}, error)
+
+    imported = []
+    failures = []
+    references = {}  # (table, digest) -> [stored values, rows referencing them]
+    for row_number, record in enumerate(records, start=1):
+        lyrics, lyrics_digest, error = _source_result(hashed, extracted_lyrics, record["lyrics_path"])
+        audio, audio_digest, audio_error = _source_result(hashed, extracted_audio, record["audio_path"])
+        error = error or audio_error
+        if error:
+            failures.append({"row": row_number, "title": record["title"], "error": error})
+            continue
+        for table, digest, values in [("lyrics", lyrics_digest, lyrics), ("audio_recordings", audio_digest, audio)]:
+            if digest:
+                references.setdefault((table, digest), [values, 0])[1] += 1
+        imported.append((record, lyrics["lyrics"] if lyrics else "", lyrics_digest, audio_digest, Fernet.generate_key().decode()))
+
+    # One reference count update per distinct source file
+    stored = {(table, digest): acquire(table, digest, values, count) for (table, digest), (values, count) in references.items()}
+
+    # Encrypt every field of every artifact in one batch, 4 rows per artifact
+    items = []
+    for record, _, lyrics_digest, audio_digest, key in imported:
+        lyrics = content_row("lyrics", stored[("lyrics", lyrics_digest)]) if lyrics_digest else {"lyrics": ""}
+        audio = content_row("audio_recordings", stored[("audio_recordings", audio_digest)]) if audio_digest else {"format": "", "duration": ""}
+        items.append((key, "artifacts", {"title": record["title"], "type": record["type"],
+                                         "fileLocLyrics": record["lyrics_path"], "fileLocAudio": record["audio_path"]}))
+        items.append((key, "lyrics", dict(lyrics, language=record["language"])))
+        items.append((key, "music_scores", {"score": record["score"]}))
+        items.append((key, "audio_recordings", audio))
+    sealed = seal_rows(items, workers=workers or os.cpu_count())
+
+    count = len(imported)
+    artifact_ids = reserve_ids(ARTIFACTS_CSV, "artifactID", count)
+    lyrics_ids = reserve_ids(LYRICS_CSV, "lyricsID", count)
+    score_ids = reserve_ids(MUSIC_SCORE_CSV, "scoreID", count)
+    recording_ids = reserve_ids(AUDIO_RECORDING_CSV, "recordingID", count)
+    timestamp = get_timestamp()
+
+    artifact_rows, lyrics_rows, score_rows, recording_rows = [], [], [], []
+    for position, (record, _, _, _, key) in enumerate(imported):
+        artifact, lyrics, score, recording = sealed[position * 4:position * 4 + 4]
+        artifact_id = artifact_ids[position]
+        checksum = generateChecksum(record["title"] + record["type"])
+        artifact_rows.append([artifact_id, artifact["title"], artifact["type"], owner_id, timestamp, timestamp, checksum, wrap_key(key),
+                              artifact["fileLocLyrics"], artifact["fileLocAudio"]])
+        lyrics_rows.append([lyrics_ids[position], artifact_id, lyrics["lyrics"], lyrics["language"]])
+        score_rows.append([score_ids[position], artifact_id, score["score"]])
+        recording_rows.append([recording_ids[position], artifact_id, recording["format"], recording["duration"]])
+
+    if count:
+        with transaction():
+            insert(ARTIFACTS_CSV, artifact_rows)
+            insert(LYRICS_CSV, lyrics_rows)
+            insert(MUSIC_SCORE_CSV, score_rows)
+            insert(AUDIO_RECORDING_CSV, recording_rows)
+        update_index([
+            (artifact_id, {}, {"title": record["title"], "type": record["type"], "language": record["language"], "lyrics": lyrics})
+            for artifact_id, (record, lyrics, _, _, _) in zip(artifact_ids, imported)
+        ])
+
+    for artifact_id in artifact_ids:
+        recordAccess(owner_id, artifact_id, "Add Artifact", ACCESS_LOG_CSV) # access log
+    flush_access_log()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "imported": count,
+        "failed": failures,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(len(records) / elapsed, 1) if elapsed else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Import artifacts from a CSV or JSONL manifest.")
+    parser.add_argument("manifest", help="manifest with columns: " + ", ".join(MANIFEST_FIELDS))
+    parser.add_argument("--owner", required=True, help="userID of the admin or creator who will own the artifacts")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    args = parser.parse_args()
+
+    owner = get_row(USERS_CSV, "userID", args.owner)
+    if not owner or owner["role"] not in ["admin", "creator"]:
+        print("Owner must be an existing admin or creator.")
+        return
+
+    report = import_manifest(args.manifest, args.owner, args.workers)
+    print(f"Imported {report['imported']} artifacts in {report['seconds']}s ({report['rows_per_second']} rows/s).")
+    for failure in report["failed"]:
+        print(f"Row {failure['row']} ({failure['title']}): {failure['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import json
+import os
+import socket
+from report_view import ask_report, print_report
+
+database_folder = "database"
+
+# Where service.py listens: a Unix socket, or a local TCP port where Unix sockets are unavailable.
+# This module only uses the standard library, so the client starts without loading cryptography,
+# pdfplumber or mutagen and without reading any table.
+SOCKET_PATH = os.path.join(database_folder, ".scma.sock")
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = int(os.environ.get("SCMA_SERVICE_PORT", "8765"))
+
+
+def connect():
+    """Open a connection to the running service; raises OSError when it is not running."""
+    if hasattr(socket, "AF_UNIX"):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(SOCKET_PATH)
+        except OSError:
+            connection.close()
+            raise
+    else:
+        connection = socket.create_connection((SERVICE_HOST, SERVICE_PORT))
+    return connection.makefile("rwb")
+
+def call(connection, op, **params):
+    """Send one JSON request line and return the result; raises RuntimeError with the service's message."""
+    connection.write(json.dumps({"op": op, **params}).encode("utf-8") + b"\n")
+    connection.flush()
+    line = connection.readline()
+    if not line:
+        raise ConnectionError("The service closed the connection.")
+    response = json.loads(line)
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response["result"]
+
+def _path(prompt):
+    """Ask for a file path and make it absolute, the service does not share our working directory."""
+    path = input(prompt).strip()
+    return os.path.abspath(path) if path else ""
+
+def show_artifacts(connection, token):
+    cursor = None
+    while True:
+        page = call(connection, "list", token=token, cursor=cursor)
+        cursor = page["cursor"]
+
+        # Table header
+        print(f"{'Artifact ID':<12} | {'Owner':<15} | {'Title (Decrypted)':<30}")
+        print("-" * 65)
+
+        for entry in page["artifacts"]:
+            print(f"{entry['artifactID']:<12} | {entry['owner']:<15} | {entry['title']:<30}")
+
+        if not cursor:
+            break
+        if input("> Next page (n), or press Enter to continue: ").strip().lower() != "n":
+            break
+
+def show_artifact(connection, token, artifact_id):
+    """Print an artifact's fields; returns False if it cannot be shown."""
+    try:
+        artifact = call(connection, "view", token=token, artifactID=artifact_id)
+    except RuntimeError as error:
+        print(error)
+        return False
+    print("\nArtifact Data Found:")
+    for key, value in artifact.items():
+        print(f"{key}: {value}")
+    return True
+
+def search_artifacts(connection, token):
+    query = input("Search (words, or \"a phrase\" in quotes): ").strip()
+    field = input("Only in (title/type/language/lyrics, leave blank for all): ").strip().lower()
+    hits = call(connection, "search", token=token, query=query, field=field)["artifacts"]
+    if not hits:
+        print("No matching artifacts found.")
+        return
+
+    # Table header
+    print(f"{'Artifact ID':<12} | {'Title (Decrypted)':<30} | {'Type':<15} | {'Language':<10}")
+    print("-" * 75)
+    for hit in hits:
+        print(f"{hit['artifactID']:<12} | {hit['title']:<30} | {hit['type']:<15} | {hit['language']:<10}")
+
+    artifact_id = input("Enter the artifact ID you want to view (leave blank to return): ").strip()
+    if artifact_id:
+        show_artifact(connection, token, artifact_id)
+
+def add_artifact(connection, token):
+    params = {
+        "title": input("Title: "),
+        "type": input("Type: "),
+        "lyrics_path": _path("Lyrics File Location (Enter file exact path): "),
+        "language": input("Language: "),
+        "score": input("Score: "),
+        "audio_path": _path("Audio File Location (Enter file exact path): "),
+    }
+    result = call(connection, "add", token=token, **params)
+    print(f"Artifact {result['artifactID']} added successfully!")
+
+def modify_artifact(connection, token):
+    show_artifacts(connection, token)
+    artifact_id = input("Enter the artifact ID you want to modify: ").strip()
+    if not show_artifact(connection, token, artifact_id):
+        return
+
+    changes = {
+        "title": input("Enter new title (leave blank to keep previous data): ").strip(),
+        "type": input("Enter new type (leave blank to keep previous data): ").strip(),
+        "lyrics_path": _path("Enter new lyrics exact file path (leave blank to keep previous data): "),
+        "language": input("Enter new language (leave blank to keep previous data): ").strip(),
+        "score": input("Enter new score (leave blank to keep previous data): ").strip(),
+        "audio_path": _path("Enter new audio exact file path (leave blank to keep previous data): "),
+    }
+    call(connection, "modify", token=token, artifactID=artifact_id, **changes)
+    print("Artifact updated successfully!")
+
+def delete_artifact(connection, token):
+    show_artifacts(connection, token)
+    artifact_id = input("\nEnter Artifact ID to remove (leave blank to cancel): ").strip()
+    if not artifact_id:
+        print("No artifact id entered. Operation cancelled.")
+        return
+    call(connection, "delete", token=token, artifactID=artifact_id)
+    print(f"Artifact ID {artifact_id} and related data have been removed.")
+
+def manage_users(connection, token):
+    prefix = input("Filter by username prefix (leave blank to list all): ").strip()
+    cursor = None
+    found = False
+    while True:
+        page = call(connection, "users", token=token, prefix=prefix, cursor=cursor)
+        cursor = page["cursor"]
+        found = found or bool(page["users"])
+
+        print(f"{'User ID':<10} | {'Username':<15} | {'Email':<25} | {'Role':<10}")
+        print("-" * 65)
+        for row in page["users"]:
+            print(f"{row['userID']:<10} | {row['username']:<15} | {row['email']:<25} | {row['role']:<10}")
+
+        if not cursor or input("> Next page (n), or press Enter to continue: ").strip().lower() != "n":
+            break
+
+    if not found:
+        print("No users found.")
+        return
+    user_id = input("\nEnter User ID to remove (leave blank to cancel): ").strip()
+    if not user_id:
+        print("No user ID entered. Operation cancelled.")
+        return
+    call(connection, "remove_user", token=token, userID=user_id)
+    print(f"User ID {user_id} has been removed successfully.")
+
+def access_reports(connection, token):
+    choice = ask_report()
+    if choice:
+        kind, days, subject = choice
+        print_report(kind, call(connection, "report", token=token, report=kind, days=days, subject=subject), subject)
+
+def dashboard(connection, token, role):
+    while True:
+        print("\nDashboard")
+        print("> View Artifacts (va)")
+        print("> Search Artifacts (sa)")
+        if role in ["admin", "creator"]:
+            print("> Add Artifact (aa)")
+        if role == "creator":
+            print("> Modify Artifact (ma)")
+        if role == "admin":
+            print("> Delete Artifact (da)")
+            print("> Manage Users (mu)")
+            print("> Access Reports (ar)")
+        print("> Logout (lo)")
+
+        choice = input("Select an option: ").strip().lower()
+        try:
+            if choice == "va":
+                show_artifacts(connection, token)
+                show_artifact(connection, token, input("Enter the artifact ID you want to view: ").strip())
+            elif choice == "sa":
+                search_artifacts(connection, token)
+            elif choice == "aa" and role in ["admin", "creator"]:
+                add_artifact(connection, token)
+            elif choice == "ma" and role == "creator":
+                modify_artifact(connection, token)
+            elif choice == "da" and role == "admin":
+                delete_artifact(connection, token)
+            elif choice == "mu" and role == "admin":
+                manage_users(connection, token)
+            elif choice == "ar" and role == "admin":
+                access_reports(connection, token)
+            elif choice == "lo":
+                call(connection, "logout", token=token)
+                print("Logging out...")
+                break
+            else:
+                print("Invalid option. Try again.")
+        except RuntimeError as error:
+            print(error)
+
+def main():
+    try:
+        connection = connect()
+    except OSError:
+        print("The SCMA service is not running. Start it with: python service.py")
+        return
+
+    with connection:
+        while True:
+            print("\nWelcome to SCMA Application")
+            print("> Register (re)\n> Login (lo)\n> Exit (ex)")
+            choice = input("Select an option: ").strip().lower()
+            try:
+                if choice == "re":
+                    call(connection, "register", username=input("Username: ").strip(), email=input("Email: ").strip(),
+                         password=input("Password: ").strip(), role=input("Role (admin/creator/viewer): ").strip().lower())
+                    print("Registration successful!")
+                elif choice == "lo":
+                    username = input("Username: ")
+                    user = call(connection, "login", username=username, password=input("Password: "))
+                    print(f"Welcome, {username}!")
+                    dashboard(connection, user["token"], user["role"])
+                elif choice == "ex":
+                    print("Exiting...")
+                    break
+                else:
+                    print("Invalid option.")
+            except RuntimeError as error:
+                print(error)
+
+if __name__ == "__main__":
+    main()
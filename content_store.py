@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import hmac
+import json
+from locks import exclusive_lock
+from encryption import seal_row, open_row, open_rows
+from storage import get_row, insert_row, update, CONTENTS_CSV
+
+# Lyrics and audio metadata extracted from a source file are stored once per file content, in
+# the contents table, and the lyrics and audio_recordings rows keep a "@content:<sha256>"
+# reference in their first field instead. Rows written before this, or without a source
+# file, keep their values inline and are read as before.
+#
+# The SHA-256 of the source file is only ever stored inside a row encrypted with the
+# artifact's key. The content row is found by an ID and encrypted with a key both derived
+# from it, so the contents table alone reveals neither, though anyone holding the same
+# file can derive them.
+#
+# An entry whose last reference is gone keeps its row with the data blanked and refCount 0,
+# content IDs come back when the same file is uploaded again.
+HASH_CHUNK_SIZE = 1024 * 1024
+CONTENT_PREFIX = "@content:"  # a reserved prefix, see ENVELOPE_PREFIX in encryption.py
+
+# table -> the fields of its rows that a content entry holds, the reference is kept in the first
+CONTENT_FIELDS = {
+    "lyrics": ["lyrics"],
+    "audio_recordings": ["format", "duration"],
+}
+
+
+def file_sha256(file_path):
+    """Hash a file in fixed-size chunks so large uploads are never read into memory at once."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _derive(table, digest, purpose):
+    return hmac.new(bytes.fromhex(digest), f"{purpose}:{table}".encode(), hashlib.sha256).digest()
+
+def _content_id(table, digest):
+    return _derive(table, digest, "id").hex()
+
+def _content_key(table, digest):
+    return base64.urlsafe_b64encode(_derive(table, digest, "key")).decode()
+
+def is_content_ref(value):
+    return isinstance(value, str) and value.startswith(CONTENT_PREFIX)
+
+def find(table, digest):
+    """Return the values stored for a source file's SHA-256, or None if no artifact uses it."""
+    row = get_row(CONTENTS_CSV, "contentID", _content_id(table, digest))
+    if not row or not int(row["refCount"] or 0):
+        return None
+    try:
+        return json.loads(open_row(_content_key(table, digest), "contents", row)["data"])
+    except ValueError:
+        return None  # the decryption error, extract the file again
+
+def extract_once(table, file_path, extract):
+    """Return (values, digest) for a source file: the stored values when its content is known, else extract(file_path).
+
+    extract returns the CONTENT_FIELDS of the table as a dict, or None when it cannot read the file.
+    """
+    digest = file_sha256(file_path)
+    values = find(table, digest)
+    if values is None:
+        values = extract(file_path)
+    return values, digest
+
+def acquire(table, digest, values, count=1):
+    """Count count more rows referencing a source file's content, storing values when it is new; returns the reference."""
+    content_id = _content_id(table, digest)
+    with exclusive_lock("contents"):
+        row = get_row(CONTENTS_CSV, "contentID", content_id)
+        references = int(row["refCount"] or 0) if row else 0
+        if references:
+            update([(CONTENTS_CSV, "contentID", content_id, dict(row, refCount=str(references + count)))])
+        else:
+            data = {field: values.get(field, "") for field in CONTENT_FIELDS[table]}
+            sealed = seal_row(_content_key(table, digest), "contents", {"data": json.dumps(data)})
+            if row:
+                update([(CONTENTS_CSV, "contentID", content_id, dict(row, data=sealed["data"], refCount=str(count)))])
+            else:
+                insert_row(CONTENTS_CSV, [content_id, sealed["data"], count])
+    return CONTENT_PREFIX + digest
+
+def release(table, reference):
+    """Drop one reference to a content entry, blanking its data with the last reference."""
+    content_id = _content_id(table, reference[len(CONTENT_PREFIX):])
+    with exclusive_lock("contents"):
+        row = get_row(CONTENTS_CSV, "contentID", content_id)
+        if not row or not int(row["refCount"] or 0):
+            return
+        count = int(row["refCount"]) - 1
+        update([(CONTENTS_CSV, "contentID", content_id, dict(row, refCount=str(count), data=row["data"] if count else ""))])
+
+def content_row(table, reference):
+    """Return the plaintext values a row holding only a reference stands for."""
+    values = {field: "" for field in CONTENT_FIELDS[table]}
+    values[CONTENT_FIELDS[table][0]] = reference
+    return values
+
+def resolve(table, values):
+    """Replace a reference among a row's opened values with the stored content, in place; returns values."""
+    fields = CONTENT_FIELDS.get(table)
+    reference = values.get(fields[0]) if fields else None
+    if is_content_ref(reference):
+        content = find(table, reference[len(CONTENT_PREFIX):])
+        if content is None:
+            content = {field: "[Content missing]" for field in fields}
+        values.update(content)
+    return values
+
+def references(items):
+    """Return [(table, reference)] for the rows among (encryption_key, table, row) that point into the store."""
+    items = [(key, table, row) for key, table, row in items if row and table in CONTENT_FIELDS]
+    opened = open_rows(items, columns=[CONTENT_FIELDS[table][0] for _, table, _ in items])
+    refs = []
+    for (_, table, _), values in zip(items, opened):
+        if is_content_ref(values.get(CONTENT_FIELDS[table][0])):
+            refs.append((table, values[CONTENT_FIELDS[table][0]]))
+    return refs
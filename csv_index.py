@@ -0,0 +1,345 @@
+import atexit
+import csv
+import json
+import os
+from locks import exclusive_lock, shared_lock
+from tombstones import load_tombstones, add_tombstones, clear_tombstones, tombstone_signature
+from journal import journal_lock, load_overlay, apply_overlay, commit, committed_transactions, clear_journal
+import instrumentation
+from instrumentation import timed
+
+database_folder = "database"
+os.makedirs(database_folder, exist_ok=True)
+
+INDEX_FOLDER = os.path.join(database_folder, ".index")
+
+COMPACTION_RATIO = 0.2  # rewrite a table once this share of its rows are tombstoned
+CHECKPOINT_TRANSACTIONS = 64  # fold the journal into the tables after this many commits
+
+# (csv_filename, key_column) -> {"signature", "fieldnames", "offsets"}
+_indexes = {}
+_dirty = set()
+
+
+def _file_signature(csv_filename):
+    """Return the (mtime, size) pair used to detect changes made outside this process."""
+    stat = os.stat(csv_filename)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def table_signature(csv_filename):
+    """Return a signature that changes whenever the table or its tombstones change."""
+    return [_file_signature(csv_filename), tombstone_signature(csv_filename)]
+
+def table_lock(csv_filename):
+    """Return the exclusive lock that serializes appends, tombstones and rewrites of a table across processes."""
+    return exclusive_lock(os.path.basename(csv_filename))
+
+def _open_snapshot(csv_filename):
+    """Open a table under a shared lock and return (file, signature, tombstones, end).
+
+    The lock is only held while the file is opened: writers append past `end` and
+    rewrites swap in a new file, so the handle keeps reading a consistent snapshot.
+    """
+    with shared_lock(os.path.basename(csv_filename)):
+        file = open(csv_filename, "rb")
+        if instrumentation.ENABLED:
+            instrumentation.count("files.opened")
+        signature = table_signature(csv_filename)
+        stat = os.fstat(file.fileno())
+        tombstones = load_tombstones(csv_filename, stat.st_ino)
+        end = stat.st_size
+    return file, signature, tombstones, end
+
+def _index_path(csv_filename, key_column):
+    name = os.path.basename(csv_filename)
+    return os.path.join(INDEX_FOLDER, f"{name}.{key_column}.json")
+
+def _parse_record(raw):
+    if instrumentation.ENABLED:
+        instrumentation.count("rows.parsed")
+        instrumentation.count("bytes.read", len(raw))
+    return next(csv.reader([raw.decode("utf-8")]), [])
+
+def _iter_records(file, start, end=None):
+    """Yield (offset, raw_record) pairs, keeping quoted newlines inside one record."""
+    file.seek(start)
+    offset = record_start = start
+    record = b""
+    for line in file:
+        if not record:
+            if end is not None and offset >= end:
+                return  # Past the snapshot, rows appended after it was taken
+            record_start = offset
+        record += line
+        offset += len(line)
+        if record.count(b'"') % 2 == 0:  # an odd count means a quoted field continues
+            if record.strip():
+                yield record_start, record
+            record = b""
+    if record.strip():
+        yield record_start, record
+
+@timed("csv.build_index")
+def build_index(csv_filename, key_column):
+    """Scan the CSV file once and map every value of key_column to the byte offsets of its live rows."""
+    file, signature, tombstones, end = _open_snapshot(csv_filename)
+    offsets = {}
+    with file:
+        records = _iter_records(file, 0, end)
+        header = next(records, None)
+        fieldnames = _parse_record(header[1]) if header else []
+        position = fieldnames.index(key_column)
+        for offset, raw in records:
+            if offset in tombstones:
+                continue  # Deleted, waiting for compaction
+            row = _parse_record(raw)
+            if len(row) > position:
+                offsets.setdefault(row[position], []).append(offset)
+
+    index = {"signature": signature, "fieldnames": fieldnames, "offsets": offsets}
+    _indexes[(csv_filename, key_column)] = index
+    _dirty.add((csv_filename, key_column))
+    return index
+
+def load_index(csv_filename, key_column):
+    """Return an up-to-date index, rebuilding it when the file's or its tombstones' mtime or size has changed."""
+    signature = table_signature(csv_filename)
+
+    index = _indexes.get((csv_filename, key_column))
+    if index and index["signature"] == signature:
+        return index
+
+    try:
+        with open(_index_path(csv_filename, key_column), "r", encoding="utf-8") as file:
+            if instrumentation.ENABLED:
+                instrumentation.count("files.opened")
+            index = json.load(file)
+        if index["signature"] == signature:
+            _indexes[(csv_filename, key_column)] = index
+            return index
+    except (FileNotFoundError, ValueError, KeyError):
+        pass  # Missing or unreadable index file, rebuild it below
+
+    return build_index(csv_filename, key_column)
+
+def read_row_at(csv_filename, offset, fieldnames):
+    """Seek to a byte offset and parse the single row stored there."""
+    return read_rows_at(csv_filename, [offset], fieldnames)[0]
+
+def read_rows_at(csv_filename, offsets, fieldnames):
+    """Parse the rows stored at the given byte offsets, reusing one file handle.
+
+    Rows with a committed change in the journal are returned in their journaled version.
+    """
+    overlay = load_overlay()
+    rows = []
+    with open(csv_filename, "rb") as file:
+        if instrumentation.ENABLED:
+            instrumentation.count("files.opened")
+        for offset in offsets:
+            _, raw = next(_iter_records(file, offset))
+            rows.append(apply_overlay(csv_filename, dict(zip(fieldnames, _parse_record(raw))), overlay))
+    return rows
+
+def get_rows(csv_filename, key_column, value):
+    """Return every row whose key_column equals value, without scanning the file."""
+    try:
+        index = load_index(csv_filename, key_column)
+    except FileNotFoundError:
+        return []
+    offsets = index["offsets"].get(value, [])
+    if not offsets:
+        return []
+    return read_rows_at(csv_filename, offsets, index["fieldnames"])
+
+def get_row(csv_filename, key_column, value):
+    """Return the first row whose key_column equals value, or None."""
+    rows = get_rows(csv_filename, key_column, value)
+    return rows[0] if rows else None
+
+def iter_rows(csv_filename):
+    """Yield every live row of a table as a dict, skipping tombstoned rows and applying the journal."""
+    file, _, tombstones, end = _open_snapshot(csv_filename)
+    overlay = load_overlay()
+    with file:
+        records = _iter_records(file, 0, end)
+        header = next(records, None)
+        fieldnames = _parse_record(header[1]) if header else []
+        for offset, raw in records:
+            if offset not in tombstones:
+                yield apply_overlay(csv_filename, dict(zip(fieldnames, _parse_record(raw))), overlay)
+
+def tail_rows(csv_filename, start=0, end=None):
+    """Open a snapshot of an append-only table and return (inode, end, rows).
+
+    rows yields (offset, row) for the live rows stored from byte offset start up to end
+    (default: the end of the snapshot). Pass the returned end back as start to read only
+    the rows appended since; the inode tells whether the file was replaced in between.
+    """
+    file, _, tombstones, snapshot_end = _open_snapshot(csv_filename)
+    inode = os.fstat(file.fileno()).st_ino
+    end = snapshot_end if end is None else min(end, snapshot_end)
+
+    def rows():
+        overlay = load_overlay()
+        with file:
+            header = next(_iter_records(file, 0, end), None)
+            if not header:
+                return
+            fieldnames = _parse_record(header[1])
+            for offset, raw in _iter_records(file, max(start, header[0] + len(header[1])), end):
+                if offset not in tombstones:
+                    yield offset, apply_overlay(csv_filename, dict(zip(fieldnames, _parse_record(raw))), overlay)
+    return inode, end, rows()
+
+def append_rows(csv_filename, rows, header=None):
+    """Append rows to a CSV file and record their offsets in every loaded index of that file.
+
+    header is written first when the file is missing or empty, e.g. a table added after the database was created.
+    """
+    with table_lock(csv_filename):
+        try:
+            previous = table_signature(csv_filename)
+        except FileNotFoundError:
+            previous = None
+        offsets = []
+        with open(csv_filename, "a", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            if header and not os.path.getsize(csv_filename):
+                writer.writerow(header)
+            for row in rows:
+                file.flush()
+                offsets.append(os.path.getsize(csv_filename))
+                writer.writerow(row)
+        if instrumentation.ENABLED and offsets:
+            instrumentation.count("files.opened")
+            instrumentation.count("bytes.written", os.path.getsize(csv_filename) - offsets[0])
+
+        signature = table_signature(csv_filename)
+        for (filename, key_column), index in _indexes.items():
+            if filename != csv_filename:
+                continue
+            if index["signature"] != previous:  # changed elsewhere, let load_index rebuild it
+                index["signature"] = None
+                continue
+            position = index["fieldnames"].index(key_column)
+            for offset, row in zip(offsets, rows):
+                index["offsets"].setdefault(str(row[position]), []).append(offset)
+            index["signature"] = signature
+            _dirty.add((filename, key_column))
+
+def append_row(csv_filename, row):
+    append_rows(csv_filename, [row])
+
+def delete_rows(csv_filename, key_column, value):
+    """Delete the rows where key_column == value by appending tombstones; returns the rows deleted.
+
+    The rows stay in the file, hidden from every reader, until the table is rewritten: by
+    the next journal checkpoint, or by compaction here once COMPACTION_RATIO of them are dead.
+    """
+    with table_lock(csv_filename):
+        try:
+            index = load_index(csv_filename, key_column)
+        except FileNotFoundError:
+            return 0
+        offsets = index["offsets"].get(value, [])
+        if not offsets:
+            return 0
+        rows = read_rows_at(csv_filename, offsets, index["fieldnames"])
+
+        previous = index["signature"]
+        add_tombstones(csv_filename, offsets)
+        signature = table_signature(csv_filename)
+
+        # Drop the dead offsets from every loaded index instead of rebuilding them
+        for (filename, column), loaded in _indexes.items():
+            if filename != csv_filename:
+                continue
+            if loaded["signature"] != previous:
+                loaded["signature"] = None
+                continue
+            for offset, row in zip(offsets, rows):
+                remaining = [o for o in loaded["offsets"].get(row[column], []) if o != offset]
+                if remaining:
+                    loaded["offsets"][row[column]] = remaining
+                else:
+                    loaded["offsets"].pop(row[column], None)
+            loaded["signature"] = signature
+            _dirty.add((filename, column))
+
+        dead = len(load_tombstones(csv_filename))
+        live = sum(len(row_offsets) for row_offsets in index["offsets"].values())
+        if dead >= COMPACTION_RATIO * (dead + live):
+            compact_table(csv_filename)
+
+    return len(rows)
+
+def _rewrite_table(csv_filename, overlay):
+    """Rewrite a table without its tombstoned rows and with its journaled changes folded in, then drop its tombstones.
+
+    The new file is written next to the old one and swapped in with os.replace, so
+    readers see either the old or the new table, never a partial one.
+    """
+    with table_lock(csv_filename):
+        inode = os.stat(csv_filename).st_ino
+        clear_tombstones(csv_filename, keep=inode)  # left by a rewrite that crashed, before the inode can be reused
+        tombstones = load_tombstones(csv_filename, inode)
+        temp_filename = csv_filename + ".rewrite"
+        with open(csv_filename, "rb") as source, \
+                open(temp_filename, "w", newline="", encoding="utf-8") as target:
+            records = _iter_records(source, 0)
+            header = next(records, None)
+            fieldnames = _parse_record(header[1]) if header else []
+            writer = csv.DictWriter(target, fieldnames=fieldnames)
+            writer.writeheader()
+            for offset, raw in records:
+                if offset not in tombstones:
+                    writer.writerow(apply_overlay(csv_filename, dict(zip(fieldnames, _parse_record(raw))), overlay))
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(temp_filename, csv_filename)
+        clear_tombstones(csv_filename)
+
+def compact_table(csv_filename):
+    """Rewrite a table once without its tombstoned rows, then drop the tombstones."""
+    _rewrite_table(csv_filename, {})  # journaled changes stay in the journal until the checkpoint
+
+def update_rows(changes):
+    """Commit a list of (csv_filename, key_column, value, row) updates as one transaction.
+
+    The new rows are appended to the write-ahead journal and are visible to every reader
+    at once; the tables themselves are only rewritten when the journal is folded back in
+    batches by checkpoint_journal. Updates must not change indexed key columns.
+    """
+    commit(changes)
+    if committed_transactions() >= CHECKPOINT_TRANSACTIONS:
+        checkpoint_journal()
+
+def checkpoint_journal():
+    """Fold every committed journal change into its table, one rewrite per table, then empty the journal.
+
+    Each rewrite also compacts the table. Folding is idempotent, so a crash part-way
+    through is repaired by the next checkpoint.
+    """
+    with journal_lock():
+        overlay = load_overlay()
+        for csv_filename in overlay:
+            _rewrite_table(csv_filename, overlay)
+        if overlay:
+            clear_journal()
+
+@atexit.register
+def save_indexes():
+    """Persist indexes that were built or updated in this session."""
+    if not _dirty:
+        return
+    os.makedirs(INDEX_FOLDER, exist_ok=True)
+    for key in list(_dirty):
+        index = _indexes.get(key)
+        if index is None:
+            continue
+        path = _index_path(*key)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(path + ".tmp", path)
+    _dirty.clear()
@@ -0,0 +1,163 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+# run from the project folder like makeCSV.py: python database/generateData.py --artifacts 10000
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+from auth import hash_password
+from encryption import seal_rows, wrap_key
+from utils import reserve_ids, generateChecksum
+from csv_index import table_lock
+from access_log import load_manifest, save_manifest
+from storage import insert, transaction, BACKEND
+from search_index import mark_stale
+from storage import USERS_CSV, ARTIFACTS_CSV, ACCESS_LOG_CSV, LYRICS_CSV, MUSIC_SCORE_CSV, AUDIO_RECORDING_CSV
+
+GENERATED_PASSWORD = "scma-bench"  # every generated user logs in with this password
+CHUNK_SIZE = 5000  # artifacts encrypted and written per batch
+LOG_DAYS = 90  # access log timestamps are spread over this many days up to now
+
+WORDS = ["love", "night", "river", "fire", "heart", "city", "dream", "rain", "light", "road", "home", "song",
+         "shadow", "summer", "ocean", "morning", "gold", "wind", "star", "dance", "silver", "tears", "sky", "time"]
+GENRES = ["Pop", "Rock", "Jazz", "Blues", "Folk", "Classical", "Hip Hop", "Country", "Soul", "Electronic"]
+LANGUAGES = ["English", "Indonesian", "French", "Spanish", "Japanese", "German"]
+KEYS = ["C major", "G major", "D minor", "A minor", "E flat major", "B minor", "F major"]
+FORMATS = ["MP3", "WAV", "FLAC", "M4A"]
+ACCESS_TYPES = ["View Artifact", "View Artifact", "View Artifact", "Modify Artifact"]
+
+
+def _line(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 8))).capitalize()
+
+def _lyrics(rng):
+    """Verses with a repeated chorus, about as repetitive as real lyrics."""
+    chorus = [_line(rng) for _ in range(4)]
+    parts = []
+    for verse in range(1, rng.randint(3, 5)):
+        parts.append(f"[Verse {verse}]")
+        parts.extend(_line(rng) for _ in range(rng.randint(4, 8)))
+        parts.append("[Chorus]")
+        parts.extend(chorus)
+    return "\n".join(parts)
+
+def _generate_users(rng, count):
+    """Insert generated users and return the IDs of those who may own artifacts."""
+    user_ids = reserve_ids(USERS_CSV, "userID", count)
+    rows = []
+    owners = []
+    password_hash = hash_password(GENERATED_PASSWORD)
+    for user_id in user_ids:
+        role = rng.choices(["admin", "creator", "viewer"], weights=[1, 6, 3])[0]
+        rows.append([user_id, f"bench{user_id}", f"bench{user_id}@example.com", password_hash, role])
+        if role != "viewer":
+            owners.append(user_id)
+    insert(USERS_CSV, rows)
+    return user_ids, owners or user_ids[:1]
+
+def _append_access_logs(rows):
+    if BACKEND != "csv":
+        insert(ACCESS_LOG_CSV, rows)
+        return
+    with table_lock(ACCESS_LOG_CSV):  # keep the segment manifest in step with the active file
+        manifest = load_manifest(ACCESS_LOG_CSV)
+        insert(ACCESS_LOG_CSV, rows)
+        active = manifest["active"]
+        active["first"] = active["first"] or rows[0][-1]
+        active["last"] = rows[-1][-1]
+        active["rows"] += len(rows)
+        save_manifest(ACCESS_LOG_CSV, manifest)
+
+def generate(artifact_count, user_count=None, logs_per_artifact=3, seed=0, workers=None):
+    """Fill all six tables with encrypted synthetic data; returns {table: rows added}.
+
+    Rows are appended to whatever the tables already hold, in the configured storage
+    backend and record format. Access log timestamps increase monotonically.
+    """
+    rng = random.Random(seed)
+    user_ids, owners = _generate_users(rng, user_count or max(10, artifact_count // 100))
+    counts = {"users": len(user_ids), "artifacts": 0, "lyrics": 0, "music_scores": 0, "audio_recordings": 0, "access_logs": 0}
+
+    now = datetime.datetime.now()
+    log_start = now - datetime.timedelta(days=LOG_DAYS)
+    if BACKEND == "csv":
+        last = load_manifest(ACCESS_LOG_CSV)["active"]["last"]
+        if last:
+            log_start = max(log_start, datetime.datetime.strptime(last, "%Y-%m-%d %H:%M:%S"))
+    log_step = (now - log_start) / max(1, artifact_count * logs_per_artifact)
+    log_number = 0
+
+    for start in range(0, artifact_count, CHUNK_SIZE):
+        count = min(CHUNK_SIZE, artifact_count - start)
+        records = []
+        items = []
+        for _ in range(count):
+            key = Fernet.generate_key().decode()
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+            type_ = rng.choice(GENRES)
+            records.append((key, title, type_, rng.choice(owners)))
+            items.append((key, "artifacts", {"title": title, "type": type_,
+                                             "fileLocLyrics": f"/music/{title}/lyrics.pdf", "fileLocAudio": f"/music/{title}/audio.mp3"}))
+            items.append((key, "lyrics", {"lyrics": _lyrics(rng), "language": rng.choice(LANGUAGES)}))
+            items.append((key, "music_scores", {"score": rng.choice(KEYS)}))
+            items.append((key, "audio_recordings", {"format": rng.choice(FORMATS), "duration": round(rng.uniform(90, 420), 1)}))
+        sealed = seal_rows(items, workers=workers or os.cpu_count(), use_processes=True)
+
+        artifact_ids = reserve_ids(ARTIFACTS_CSV, "artifactID", count)
+        lyrics_ids = reserve_ids(LYRICS_CSV, "lyricsID", count)
+        score_ids = reserve_ids(MUSIC_SCORE_CSV, "scoreID", count)
+        recording_ids = reserve_ids(AUDIO_RECORDING_CSV, "recordingID", count)
+        log_ids = reserve_ids(ACCESS_LOG_CSV, "logID", count * logs_per_artifact)
+
+        artifact_rows, lyrics_rows, score_rows, recording_rows, log_rows = [], [], [], [], []
+        for position, (key, title, type_, owner_id) in enumerate(records):
+            artifact, lyrics, score, recording = sealed[position * 4:position * 4 + 4]
+            artifact_id = artifact_ids[position]
+            created = (log_start + log_step * log_number).strftime("%Y-%m-%d %H:%M:%S")
+            artifact_rows.append([artifact_id, artifact["title"], artifact["type"], owner_id, created, created,
+                                  generateChecksum(title + type_), wrap_key(key), artifact["fileLocLyrics"], artifact["fileLocAudio"]])
+            lyrics_rows.append([lyrics_ids[position], artifact_id, lyrics["lyrics"], lyrics["language"]])
+            score_rows.append([score_ids[position], artifact_id, score["score"]])
+            recording_rows.append([recording_ids[position], artifact_id, recording["format"], recording["duration"]])
+            for entry in range(logs_per_artifact):
+                access_type = "Add Artifact" if entry == 0 else rng.choice(ACCESS_TYPES)
+                user_id = owner_id if entry == 0 else rng.choice(user_ids)
+                timestamp = (log_start + log_step * log_number).strftime("%Y-%m-%d %H:%M:%S")
+                log_rows.append([log_ids[len(log_rows)], user_id, artifact_id, access_type, timestamp])
+                log_number += 1
+
+        with transaction():
+            insert(ARTIFACTS_CSV, artifact_rows)
+            insert(LYRICS_CSV, lyrics_rows)
+            insert(MUSIC_SCORE_CSV, score_rows)
+            insert(AUDIO_RECORDING_CSV, recording_rows)
+        if log_rows:
+            _append_access_logs(log_rows)
+
+        for table in ["artifacts", "lyrics", "music_scores", "audio_recordings"]:
+            counts[table] += count
+        counts["access_logs"] += len(log_rows)
+    mark_stale()  # the generated artifacts are indexed by the next search
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the tables with encrypted synthetic data for benchmarking.")
+    parser.add_argument("--artifacts", type=int, required=True, help="number of artifacts to generate, e.g. 10000")
+    parser.add_argument("--users", type=int, default=None, help="number of users (default: artifacts / 100, at least 10)")
+    parser.add_argument("--logs-per-artifact", type=int, default=3, help="access log entries per artifact")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, the same seed gives the same plaintext")
+    parser.add_argument("--workers", type=int, default=None, help="encryption processes (default: CPU count)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.artifacts, args.users, args.logs_per_artifact, args.seed, args.workers)
+    for table, count in counts.items():
+        print(f"Generated {count} rows in {table}")
+    print(f"Done in {time.perf_counter() - started:.1f}s. Generated users log in with the password '{GENERATED_PASSWORD}'.")
+
+if __name__ == "__main__":
+    main()
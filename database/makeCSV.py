@@ -13,6 +13,7 @@ FILES = {
     "lyrics": os.path.join(DATABASE_FOLDER, "lyrics.csv"),
     "music_scores": os.path.join(DATABASE_FOLDER, "music_scores.csv"),
     "audio_recordings": os.path.join(DATABASE_FOLDER, "audio_recordings.csv"),
+    "contents": os.path.join(DATABASE_FOLDER, "contents.csv"),
 }
 
 
@@ -24,6 +25,7 @@ HEADERS = {
     "lyrics": ["lyricsID", "artifactID", "lyrics", "language"],
     "music_scores": ["scoreID", "artifactID", "score"],
     "audio_recordings": ["recordingID", "artifactID", "format", "duration"],
+    "contents": ["contentID", "data", "refCount"],
 }
 
 # initialize CSV files
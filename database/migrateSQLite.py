@@ -0,0 +1,45 @@
+import os
+import sys
+from itertools import islice
+
+# run from the project folder like makeCSV.py: python database/migrateSQLite.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage_csv
+import storage_sqlite
+from access_log import list_segments
+from database.makeCSV import FILES, HEADERS
+
+BATCH_SIZE = 10000  # rows inserted per executemany
+
+
+def migrate():
+    """Copy every live row of the CSV tables, archived access log segments included, into the SQLite database.
+
+    Runs in one transaction, so an interrupted migration leaves the database empty.
+    Returns {table: rows copied}.
+    """
+    counts = {}
+    with storage_sqlite.transaction():
+        for table, csv_filename in FILES.items():
+            if next(storage_sqlite.scan(table), None) is not None:
+                raise RuntimeError(f"{storage_sqlite.DATABASE_FILE} already holds {table}, remove it to migrate again")
+
+            sources = list_segments(csv_filename) if table == "access_logs" else [csv_filename]
+            counts[table] = 0
+            for source in sources:
+                if not os.path.exists(source):
+                    continue
+                rows = ([row.get(column, "") for column in HEADERS[table]] for row in storage_csv.scan(source))
+                while True:
+                    batch = list(islice(rows, BATCH_SIZE))
+                    if not batch:
+                        break
+                    storage_sqlite.insert(table, batch)
+                    counts[table] += len(batch)
+    return counts
+
+if __name__ == "__main__":
+    for table, count in migrate().items():
+        print(f"Copied {count} rows into {table}")
+    print(f"Migration finished. Set SCMA_STORAGE=sqlite to use {storage_sqlite.DATABASE_FILE}.")
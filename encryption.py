@@ -1,24 +1,247 @@
-from cryptography.fernet import Fernet
-import csv
+import json
+import lzma
+import os
+import zlib
+from cryptography.fernet import Fernet, MultiFernet
+import concurrent.futures  # ProcessPoolExecutor is looked up on use, importing multiprocessing slows startup
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from storage import get_row, page, ARTIFACTS_CSV
+from blobs import materialize
+from instrumentation import timed
+
+CIPHER_CACHE_SIZE = 256  # prepared Fernet objects kept per process
+PARALLEL_THRESHOLD = 256  # smaller batches are cheaper to run inline than to hand to a pool
+
+# Payload format inside the Fernet token: plain UTF-8, or a header byte followed by the
+# compressed UTF-8. 0xF8 and up never start valid UTF-8, so tokens written before
+# compression existed still decrypt unchanged.
+PAYLOAD_ZLIB = b"\xf8"
+PAYLOAD_LZMA = b"\xf9"
+COMPRESS_THRESHOLD = 256  # shorter values are stored plain, compression would not pay off
+COMPRESSION = "zlib"  # or "lzma": smaller for long lyrics, several times slower
+
+# Record format for new writes: "field" encrypts every column on its own, "envelope" seals all
+# encrypted columns of a row into one token kept in the first of them. Both are always readable.
+RECORD_FORMAT_ENV = "SCMA_RECORD_FORMAT"
+RECORD_FORMAT = os.environ.get(RECORD_FORMAT_ENV, "field").strip().lower()
+# In encrypted columns and encryptionKey, a value starting with "@" is a marker rather than a token:
+# Fernet tokens are urlsafe base64 and never do. Besides the prefixes defined here, blobs.py and
+# content_store.py reserve "@blob:" and "@content:".
+ENVELOPE_PREFIX = "@env:"
+ENCRYPTED_FIELDS = {
+    "artifacts": ["title", "type", "fileLocLyrics", "fileLocAudio"],
+    "lyrics": ["lyrics", "language"],
+    "music_scores": ["score"],
+    "audio_recordings": ["format", "duration"],
+    "contents": ["data"],
+}
+
+# With a master key set, the encryptionKey column holds each artifact's key encrypted under it
+# instead of the key itself. Several comma-separated master keys may be given while changing
+# it: keys are wrapped under the first and unwrapped with whichever fits.
+MASTER_KEY_ENV = "SCMA_MASTER_KEY"
+WRAPPED_PREFIX = "@wrapped:"
+MASTER_KEY_PROBE = 100  # artifact rows looked at on startup for wrapped keys
+
+@lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def get_cipher(encryption_key: str) -> Fernet:
+    """Return a prepared Fernet object for a key, reusing it across calls."""
+    return Fernet(encryption_key)
+
+def encode_payload(data: str) -> bytes:
+    """Compress values of COMPRESS_THRESHOLD bytes or more, keeping the plain bytes when that is smaller."""
+    raw = data.encode()
+    if len(raw) < COMPRESS_THRESHOLD:
+        return raw
+    if COMPRESSION == "lzma":
+        payload = PAYLOAD_LZMA + lzma.compress(raw)
+    else:
+        payload = PAYLOAD_ZLIB + zlib.compress(raw, 6)
+    return payload if len(payload) < len(raw) else raw
+
+def decode_payload(payload: bytes) -> str:
+    header = payload[:1]
+    if header == PAYLOAD_ZLIB:
+        return zlib.decompress(payload[1:]).decode()
+    if header == PAYLOAD_LZMA:
+        return lzma.decompress(payload[1:]).decode()
+    return payload.decode()
+
+def is_compressed(payload: bytes) -> bool:
+    return payload[:1] in (PAYLOAD_ZLIB, PAYLOAD_LZMA)
 
 # Strategy Pattern
+@timed("encrypt_data")
 def encrypt_data(encryption_key: str, data: str) -> str:
-    f = Fernet(encryption_key)  # Convert key back to bytes
-    encrypted_data = f.encrypt(data.encode())  # Encrypt string
+    f = get_cipher(encryption_key)
+    encrypted_data = f.encrypt(encode_payload(data))  # Compress if large, then encrypt
     return encrypted_data.decode()  # Convert to a string for CSV storage
 
+@timed("decrypt_data")
 def decrypt_data(encryption_key: str, encrypted_data: str) -> str:
     try:
-        f = Fernet(encryption_key.encode())  # Convert key to bytes
-        return f.decrypt(encrypted_data.encode()).decode()  # Decrypt and return plaintext
+        f = get_cipher(encryption_key)
+        return decode_payload(f.decrypt(encrypted_data.encode()))  # Decrypt, decompress and return plaintext
     except Exception as e:
         return f"[Decryption Failed: {e}]"  # Return error message if decryption fails
 
+def _encrypt_chunk(pairs):
+    return [encrypt_data(key, data) for key, data in pairs]
+
+def _decrypt_chunk(pairs):
+    return [decrypt_data(key, token) for key, token in pairs]
+
+def _run_batch(function, pairs, workers, use_processes):
+    pairs = list(pairs)
+    if not workers or workers < 2 or len(pairs) < PARALLEL_THRESHOLD:
+        return function(pairs)
+
+    chunk_size = -(-len(pairs) // (workers * 4))  # a few chunks per worker to even out the load
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    executor_class = concurrent.futures.ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        return [value for chunk in executor.map(function, chunks) for value in chunk]
+
+def encrypt_many(pairs, workers=None, use_processes=False):
+    """Encrypt a list of (encryption_key, plaintext) pairs, keeping their order.
+
+    With workers set, batches of PARALLEL_THRESHOLD or more pairs are split across a
+    thread pool, or a process pool when use_processes is True.
+    """
+    return _run_batch(_encrypt_chunk, pairs, workers, use_processes)
+
+def decrypt_many(pairs, workers=None, use_processes=False):
+    """Decrypt a list of (encryption_key, token) pairs, keeping their order.
+
+    Failed tokens yield the same error string as decrypt_data.
+    """
+    return _run_batch(_decrypt_chunk, pairs, workers, use_processes)
+
+def _uses_envelope(table):
+    return RECORD_FORMAT == "envelope" and len(ENCRYPTED_FIELDS[table]) > 1
+
+def is_envelope(table, row):
+    return materialize(row.get(ENCRYPTED_FIELDS[table][0]) or "").startswith(ENVELOPE_PREFIX)
+
+def seal_rows(items, workers=None, use_processes=False):
+    """Encrypt a list of (encryption_key, table, {column: plaintext}) in one batch.
+
+    Returns one {column: stored value} dict per item, in the configured record format.
+    """
+    pairs = []
+    for key, table, values in items:
+        fields = ENCRYPTED_FIELDS[table]
+        if _uses_envelope(table):
+            pairs.append((key, json.dumps({field: str(values.get(field, "")) for field in fields})))
+        else:
+            pairs.extend((key, str(values.get(field, ""))) for field in fields)
+    tokens = iter(encrypt_many(pairs, workers, use_processes))
+
+    sealed = []
+    for key, table, values in items:
+        fields = ENCRYPTED_FIELDS[table]
+        if _uses_envelope(table):
+            sealed.append({field: "" for field in fields})
+            sealed[-1][fields[0]] = ENVELOPE_PREFIX + next(tokens)
+        else:
+            sealed.append({field: next(tokens) for field in fields})
+    return sealed
+
+def seal_row(encryption_key, table, values):
+    return seal_rows([(encryption_key, table, values)])[0]
+
+def open_rows(items, columns=None, workers=None, use_processes=False):
+    """Decrypt a list of (encryption_key, table, row) in one batch, whatever format each row was written in.
+
+    Returns one {column: plaintext} dict per item. With columns set, per-field rows only
+    decrypt those columns; an envelope is always opened whole with a single decrypt.
+    """
+    pairs = []
+    plan = []
+    for key, table, row in items:
+        fields = ENCRYPTED_FIELDS[table]
+        first = materialize(row.get(fields[0]) or "")
+        if first.startswith(ENVELOPE_PREFIX):
+            pairs.append((key, first[len(ENVELOPE_PREFIX):]))
+            plan.append(None)
+        else:
+            wanted = [field for field in fields if columns is None or field in columns]
+            pairs.extend((key, materialize(row.get(field) or "")) for field in wanted)
+            plan.append(wanted)
+    decrypted = iter(decrypt_many(pairs, workers, use_processes))
+
+    opened = []
+    for (key, table, row), wanted in zip(items, plan):
+        if wanted is None:
+            text = next(decrypted)
+            try:
+                opened.append(json.loads(text))
+            except ValueError:
+                opened.append({field: text for field in ENCRYPTED_FIELDS[table]})  # the decryption error
+        else:
+            opened.append({field: next(decrypted) for field in wanted})
+    return opened
+
+def open_row(encryption_key, table, row, columns=None):
+    return open_rows([(encryption_key, table, row)], columns)[0]
+
+def reseal_row(encryption_key, table, row, changes):
+    """Return a copy of an encrypted row with the plaintext changes applied, in the configured record format.
+
+    A per-field row staying per-field only has the changed columns re-encrypted; otherwise the
+    row is opened and sealed again, which is how rows migrate between formats.
+    """
+    row = dict(row)
+    if not is_envelope(table, row) and not _uses_envelope(table):
+        tokens = encrypt_many([(encryption_key, str(value)) for value in changes.values()])
+        row.update(zip(changes, tokens))
+        return row
+    values = open_row(encryption_key, table, row)
+    values.update(changes)
+    row.update(seal_row(encryption_key, table, values))
+    return row
+
+@lru_cache(maxsize=1)
+def _master_cipher(master_keys):
+    return MultiFernet([Fernet(key.strip()) for key in master_keys.split(",") if key.strip()])
+
+def wrap_key(encryption_key):
+    """Return the value to store in the encryptionKey column for a new key: wrapped when a master key is set."""
+    master_keys = os.environ.get(MASTER_KEY_ENV)
+    if not master_keys:
+        return encryption_key
+    return WRAPPED_PREFIX + _master_cipher(master_keys).encrypt(encryption_key.encode()).decode()
+
+@lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def _unwrap_key(stored, master_keys):
+    try:
+        return _master_cipher(master_keys).decrypt(stored[len(WRAPPED_PREFIX):].encode()).decode()
+    except Exception:
+        raise ValueError(f"Artifact key not wrapped under {MASTER_KEY_ENV}.") from None
+
+def artifact_key(artifact_row):
+    """Return the Fernet key of an artifact row, unwrapping it with the master key; None when it has none.
+
+    Raises ValueError for a wrapped key when no master key, or the wrong one, is set.
+    """
+    stored = artifact_row.get("encryptionKey") if artifact_row else None
+    if not stored or not stored.startswith(WRAPPED_PREFIX):
+        return stored or None
+    master_keys = os.environ.get(MASTER_KEY_ENV)
+    if not master_keys:
+        raise ValueError(f"Artifact keys are wrapped, set {MASTER_KEY_ENV} to read them.")
+    return _unwrap_key(stored, master_keys)
+
+def check_master_key():
+    """Raise ValueError on startup when the first artifacts have wrapped keys and no master key is set."""
+    if os.environ.get(MASTER_KEY_ENV):
+        return
+    rows, _ = page(ARTIFACTS_CSV, page_size=MASTER_KEY_PROBE)
+    if any((row.get("encryptionKey") or "").startswith(WRAPPED_PREFIX) for row in rows):
+        raise ValueError(f"Artifact keys are wrapped, set {MASTER_KEY_ENV} to read them.")
+
 def get_encryption_key(artifact_id, artifacts_csv):
     """Retrieve the encryption key for a given artifactID from ARTIFACTS_CSV."""
-    with open(artifacts_csv, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row.get("artifactID") == artifact_id:
-                return row.get("encryptionKey")  # Return the encryption key if found
-    return None  # Return None if not found
\ No newline at end of file
+    row = get_row(artifacts_csv, "artifactID", artifact_id)
+    return artifact_key(row)  # None if not found
@@ -0,0 +1,94 @@
+import importlib
+import threading
+
+# Lyrics and audio handlers are named as "module:attribute" and imported the first time a file of
+# their format is read, so sessions that only log in and list titles never load pdfplumber or mutagen.
+# A handler may also be given directly as a callable. Add formats with register_audio_format and
+# register_lyrics_format instead of editing the extraction functions in utils.
+
+_audio_formats = {}  # key -> {"opener", "labels", "sniff"}, tried in registration order
+_lyrics_formats = {}  # ".ext" -> extractor
+_loaded = {}  # "module:attribute" -> object
+_load_lock = threading.Lock()
+
+
+def load(target):
+    """Return what a "module:attribute" string names, importing the module on first use; callables are returned as they are."""
+    if callable(target):
+        return target
+    with _load_lock:
+        if target not in _loaded:
+            module, _, attribute = target.partition(":")
+            value = importlib.import_module(module)
+            _loaded[target] = getattr(value, attribute) if attribute else value
+    return _loaded[target]
+
+def register_audio_format(key, opener, labels, sniff):
+    """Register an audio container.
+
+    opener(path) returns an object whose info.length is the duration in seconds, like
+    mutagen's file types. sniff(header) tells from a file's first 12 bytes whether it is
+    this format. labels are the names shown for it, the first is used unless the file
+    extension is another one of them.
+    """
+    _audio_formats[key] = {"opener": opener, "labels": list(labels), "sniff": sniff}
+
+def register_lyrics_format(extension, extractor):
+    """Register extractor(path, workers=None) returning the text of lyrics files with this extension."""
+    _lyrics_formats[extension.lower()] = extractor
+
+def detect_audio_format(header):
+    """Return the key of the first registered format whose sniff accepts the header, or None."""
+    for key, audio_format in _audio_formats.items():
+        if audio_format["sniff"](header):
+            return key
+    return None
+
+def audio_labels(key):
+    return _audio_formats[key]["labels"]
+
+def audio_duration(key, file_path):
+    return load(_audio_formats[key]["opener"])(file_path).info.length
+
+def supported_audio():
+    """Return the labels of every registered audio format, for messages."""
+    labels = []
+    for audio_format in _audio_formats.values():
+        labels.extend(label for label in audio_format["labels"] if label not in labels)
+    return ", ".join(labels)
+
+def lyrics_extractor(extension):
+    """Return the extractor registered for a file extension such as ".pdf", or None."""
+    extractor = _lyrics_formats.get(extension.lower())
+    return load(extractor) if extractor else None
+
+def supported_lyrics():
+    return ", ".join(sorted(_lyrics_formats))
+
+# Built-in formats
+
+def _is_flac(header):
+    return header[:4] == b"fLaC"
+
+def _is_wav(header):
+    return header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+def _is_mp4(header):
+    return header[4:8] == b"ftyp"
+
+def _is_mpeg_frame(header):
+    return len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0
+
+def _is_mp3(header):
+    # ADTS AAC uses the MPEG sync word with layer bits 00, MP3 frames never do
+    return header[:3] == b"ID3" or (_is_mpeg_frame(header) and header[1] & 0x06 != 0)
+
+def _is_aac(header):
+    return _is_mpeg_frame(header) and header[1] & 0x06 == 0
+
+register_audio_format("FLAC", "mutagen.flac:FLAC", ["FLAC"], _is_flac)
+register_audio_format("WAV", "mutagen.wave:WAVE", ["WAV"], _is_wav)
+register_audio_format("MP4", "mutagen.mp4:MP4", ["M4A", "MP4", "AAC"], _is_mp4)
+register_audio_format("MP3", "mutagen.mp3:MP3", ["MP3"], _is_mp3)
+register_audio_format("AAC", "mutagen.aac:AAC", ["AAC"], _is_aac)
+register_lyrics_format(".pdf", "utils:extract_text_from_pdf")
@@ -0,0 +1,125 @@
+import atexit
+import cProfile
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+database_folder = "database"
+
+# SCMA_INSTRUMENT=summary writes counters and timers per session, =profile also writes a cProfile dump.
+# Unset, timed() returns functions unwrapped and callers skip count() behind the ENABLED check.
+INSTRUMENT_ENV = "SCMA_INSTRUMENT"
+MODE = os.environ.get(INSTRUMENT_ENV, "").strip().lower()
+ENABLED = MODE in ("summary", "profile")
+REPORT_FOLDER = os.path.join(database_folder, "instrumentation")
+
+_lock = threading.Lock()
+_counters = {}
+_timers = {}  # name -> [calls, seconds]
+_session = {"user": None, "started": time.time()}
+_profiler = None
+
+
+def count(name, amount=1):
+    """Add to a counter. Call sites check ENABLED first so disabled sessions pay one boolean test."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def _record(name, seconds):
+    with _lock:
+        timer = _timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+
+def timed(name):
+    """Decorator counting calls and wall time of a function; a no-op when instrumentation is off."""
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+@contextmanager
+def timer(name):
+    """Time a block like timed() times a function."""
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - started)
+
+def start_session(user_id):
+    """Reset the counters for a user session, and start profiling in profile mode."""
+    global _profiler
+    if not ENABLED:
+        return
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+        _session.update(user=user_id, started=time.time())
+    if MODE == "profile" and _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def summary():
+    with _lock:
+        return {
+            "user": _session["user"],
+            "started": datetime.datetime.fromtimestamp(_session["started"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds": round(time.time() - _session["started"], 3),
+            "counters": dict(sorted(_counters.items())),
+            "timers": {
+                name: {"calls": calls, "total_ms": round(seconds * 1000, 3), "mean_ms": round(seconds * 1000 / calls, 3)}
+                for name, (calls, seconds) in sorted(_timers.items())
+            },
+        }
+
+def end_session():
+    """Write the session summary (and profile) to REPORT_FOLDER; returns the summary path or None."""
+    global _profiler
+    if not ENABLED or not (_counters or _timers or _profiler):
+        return None
+    os.makedirs(REPORT_FOLDER, exist_ok=True)
+    name = f"session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+    report = summary()
+    path = os.path.join(REPORT_FOLDER, name + ".json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(os.path.join(REPORT_FOLDER, name + ".prof"))  # open with pstats or snakeviz
+        _profiler = None
+
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+        _session.update(user=None, started=time.time())
+    return path
+
+def print_summary(report):
+    print(f"\nSession instrumentation ({report['seconds']}s)")
+    for name, value in report["counters"].items():
+        print(f"  {name:<24} {value:>12}")
+    for name, timer in report["timers"].items():
+        print(f"  {name:<24} {timer['calls']:>6} calls {timer['total_ms']:>10} ms")
+
+@atexit.register
+def _write_remaining():
+    """Report whatever was recorded outside a login session, e.g. by bulk_import."""
+    end_session()
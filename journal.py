@@ -0,0 +1,120 @@
+import json
+import os
+import uuid
+from locks import exclusive_lock
+import instrumentation
+
+database_folder = "database"
+os.makedirs(database_folder, exist_ok=True)
+
+JOURNAL_FILE = os.path.join(database_folder, "journal.wal")
+
+def journal_lock():
+    """Held while committing and while the journal is folded into the tables."""
+    return exclusive_lock("journal")
+
+_cache = {"signature": None, "overlay": {}, "transactions": 0, "changes": 0, "offset": 0, "head": b"", "pending": {}}
+HEAD_BYTES = 64  # start of the journal remembered to tell an appended journal from a cleared and rewritten one
+
+
+def journal_signature():
+    """Return the (mtime, size) of the journal, or None when it is empty."""
+    try:
+        stat = os.stat(JOURNAL_FILE)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size] if stat.st_size else None
+
+def load_overlay():
+    """Return {csv_filename: {column: {value: (sequence, row)}}} for every committed, not yet folded change.
+
+    Records of a transaction whose commit marker never reached the disk are ignored. While
+    the journal only grows, just the records appended since the last call are parsed and
+    added to the same overlay. The sequence numbers changes in journal order, so a row
+    journaled under more than one key column resolves to its newest change.
+    """
+    signature = journal_signature()
+    if _cache["signature"] == signature:
+        return _cache["overlay"]
+    if not signature:
+        _cache.update(signature=None, overlay={}, transactions=0, changes=0, offset=0, head=b"", pending={})
+        return _cache["overlay"]
+
+    with open(JOURNAL_FILE, "rb") as file:
+        head = file.read(HEAD_BYTES)
+        known = _cache["head"]
+        if not _cache["offset"] or signature[1] < _cache["offset"] or head[:len(known)] != known:
+            _cache.update(overlay={}, transactions=0, changes=0, offset=0, pending={})  # cleared since, parse it all
+        file.seek(_cache["offset"])
+        data = file.read()
+    end = data.rfind(b"\n") + 1  # a line still being written is parsed on a later call
+
+    overlay = _cache["overlay"]
+    pending = _cache["pending"]
+    for line in data[:end].decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue  # Torn write left by a crash, its transaction never committed
+        if "commit" in record:
+            changes = pending.pop(record["txn"], [])
+            if len(changes) != record["commit"]:
+                continue
+            for change in changes:
+                _cache["changes"] += 1
+                overlay.setdefault(change["table"], {}).setdefault(change["column"], {})[change["value"]] = (_cache["changes"], change["row"])
+            _cache["transactions"] += 1
+        else:
+            pending.setdefault(record["txn"], []).append(record)
+
+    _cache.update(signature=signature, offset=_cache["offset"] + end, head=head)
+    return overlay
+
+def committed_transactions():
+    load_overlay()
+    return _cache["transactions"]
+
+def commit(changes):
+    """Durably append one transaction of (csv_filename, key_column, value, row) changes.
+
+    The records and their commit marker go out in a single write followed by fsync, so a
+    crash leaves either the whole transaction or none of it.
+    """
+    txn = uuid.uuid4().hex
+    lines = [
+        json.dumps({"txn": txn, "table": csv_filename, "column": column, "value": value, "row": row})
+        for csv_filename, column, value, row in changes
+    ]
+    lines.append(json.dumps({"txn": txn, "commit": len(changes)}))
+
+    data = ("\n".join(lines) + "\n").encode("utf-8")
+
+    with journal_lock():
+        with open(JOURNAL_FILE, "ab+") as file:
+            if file.seek(0, os.SEEK_END):
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    data = b"\n" + data  # start on a fresh line after a torn write
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+    if instrumentation.ENABLED:
+        instrumentation.count("files.opened")
+        instrumentation.count("bytes.written", len(data))
+
+def clear_journal():
+    with journal_lock():
+        with open(JOURNAL_FILE, "w", encoding="utf-8") as file:
+            file.flush()
+            os.fsync(file.fileno())
+
+def apply_overlay(csv_filename, row, overlay):
+    """Return the newest journaled version of a base row, or the row itself if it has no pending change."""
+    columns = overlay.get(csv_filename)
+    newest = None
+    if columns:
+        for column, values in columns.items():
+            change = values.get(row.get(column))
+            if change and (newest is None or change[0] > newest[0]):
+                newest = change
+    return dict(newest[1]) if newest else row
@@ -0,0 +1,112 @@
+import atexit
+import json
+import os
+from encryption import open_rows, artifact_key, encrypt_data, decrypt_data
+from storage import scan, page, signature, USERS_CSV, ARTIFACTS_CSV
+
+database_folder = "database"
+
+# The listing is only written to disk when a Fernet key is provided through this variable
+LISTING_KEY_ENV = "SCMA_LISTING_KEY"
+LISTING_FILE = os.path.join(database_folder, ".listing")
+
+PAGE_SIZE = 20
+
+# artifacts_csv -> {"users_signature", "usernames", "entries"}
+# entries: artifactID -> {"ownerID", "title", "modificationDate"} of the titles decrypted so far
+_views = {}
+_dirty = set()
+
+
+def load_user_data(users_csv: str) -> dict:
+    users = {}
+    for row in scan(users_csv):
+        users[row["userID"]] = row["username"]  # Map userID to username
+    return users
+
+def _load_persisted(artifacts_csv):
+    key = os.environ.get(LISTING_KEY_ENV)
+    if not key or artifacts_csv != ARTIFACTS_CSV:
+        return None
+    try:
+        with open(LISTING_FILE, "r", encoding="utf-8") as file:
+            return json.loads(decrypt_data(key, file.read()))
+    except (FileNotFoundError, ValueError):
+        return None  # Missing, or written with another key
+
+def _get_view(artifacts_csv):
+    view = _views.get(artifacts_csv)
+    if view is None:
+        view = _load_persisted(artifacts_csv) or {
+            "users_signature": None, "usernames": {}, "entries": {},
+        }
+        _views[artifacts_csv] = view
+    return view
+
+def _refresh_usernames(view, artifacts_csv, users_csv):
+    users_signature = signature(users_csv)
+    if view["users_signature"] != users_signature:
+        view["usernames"] = load_user_data(users_csv)
+        view["users_signature"] = users_signature
+        _dirty.add(artifacts_csv)
+
+def list_artifacts_page(owner_id=None, page_size=PAGE_SIZE, cursor=None, artifacts_csv=ARTIFACTS_CSV, users_csv=USERS_CSV):
+    """Return one page of (artifactID, ownerID, owner username, decrypted title) and the next cursor.
+
+    Only the rows on the requested page are read. With owner_id set, rows are located
+    through the ownerID index instead of filtering the whole table.
+    The returned cursor is None on the last page.
+    """
+    if owner_id is not None:
+        rows, next_cursor = page(artifacts_csv, "ownerID", owner_id, page_size, cursor)
+    else:
+        rows, next_cursor = page(artifacts_csv, page_size=page_size, cursor=cursor)
+
+    view = _get_view(artifacts_csv)
+    _refresh_usernames(view, artifacts_csv, users_csv)
+
+    # Reuse titles already in the materialized view, decrypt the rest in one batch
+    stale = [
+        row for row in rows
+        if view["entries"].get(row["artifactID"], {}).get("modificationDate") != row["modificationDate"]
+    ]
+    opened = open_rows([(artifact_key(row), "artifacts", row) for row in stale], ["title"])
+    for row, title in zip(stale, (values["title"] for values in opened)):
+        view["entries"][row["artifactID"]] = {
+            "ownerID": row["ownerID"], "title": title, "modificationDate": row["modificationDate"],
+        }
+        _dirty.add(artifacts_csv)
+
+    usernames = view["usernames"]
+    entries = [
+        (row["artifactID"], row["ownerID"], usernames.get(row["ownerID"], "Unknown"), view["entries"][row["artifactID"]]["title"])
+        for row in rows
+    ]
+    return entries, next_cursor
+
+def listing_upsert(artifact_id, owner_id, title, modification_date, artifacts_csv=ARTIFACTS_CSV):
+    """Record an artifact that was just added or modified, after it has been written."""
+    view = _views.get(artifacts_csv)
+    if view is None:
+        return  # Nothing materialized yet, pages decrypt their titles when they are listed
+    view["entries"][artifact_id] = {"ownerID": owner_id, "title": title, "modificationDate": modification_date}
+    _dirty.add(artifacts_csv)
+
+def listing_remove(artifact_id, artifacts_csv=ARTIFACTS_CSV):
+    """Drop an artifact that was just deleted, after it has been removed from the file."""
+    view = _views.get(artifacts_csv)
+    if view is None:
+        return
+    view["entries"].pop(artifact_id, None)
+    _dirty.add(artifacts_csv)
+
+@atexit.register
+def save_listing():
+    """Persist the default listing, encrypted, when a listing key is configured."""
+    key = os.environ.get(LISTING_KEY_ENV)
+    if not key or ARTIFACTS_CSV not in _dirty:
+        return
+    with open(LISTING_FILE + ".tmp", "w", encoding="utf-8") as file:
+        file.write(encrypt_data(key, json.dumps(_views[ARTIFACTS_CSV])))
+    os.replace(LISTING_FILE + ".tmp", LISTING_FILE)
+    _dirty.clear()
@@ -0,0 +1,65 @@
+import os
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to locks that only coordinate threads of this process
+    fcntl = None
+
+database_folder = "database"
+os.makedirs(database_folder, exist_ok=True)
+
+LOCK_FOLDER = os.path.join(database_folder, ".locks")
+
+_held = threading.local()  # name -> [mode, depth] for the locks the current thread holds
+_fallback_locks = {}
+
+
+def _held_locks():
+    if not hasattr(_held, "locks"):
+        _held.locks = {}
+    return _held.locks
+
+@contextmanager
+def _lock(name, mode):
+    held = _held_locks()
+    current = held.get(name)
+    if current:
+        if mode == "exclusive" and current[0] == "shared":
+            raise RuntimeError(f"Cannot upgrade the shared lock on {name} to exclusive")
+        current[1] += 1  # already covered by the lock this thread holds
+        try:
+            yield
+        finally:
+            current[1] -= 1
+        return
+
+    if fcntl:
+        os.makedirs(LOCK_FOLDER, exist_ok=True)
+        handle = open(os.path.join(LOCK_FOLDER, name + ".lock"), "a+")
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX if mode == "exclusive" else fcntl.LOCK_SH)
+    else:
+        handle = _fallback_locks.setdefault(name, threading.RLock())
+        handle.acquire()
+
+    held[name] = [mode, 1]
+    try:
+        yield
+    finally:
+        del held[name]
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            handle.close()
+        else:
+            handle.release()
+
+def exclusive_lock(name):
+    """Hold the named advisory lock alone, across every process sharing the database folder.
+
+    Re-entrant within a thread. Used by writers: appends, tombstones, compaction and journal commits.
+    """
+    return _lock(name, "exclusive")
+
+def shared_lock(name):
+    """Hold the named advisory lock together with any number of other readers."""
+    return _lock(name, "shared")
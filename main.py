@@ -1,18 +1,12 @@
-import os
 from auth import register, login
-
-database_folder = "database"
-os.makedirs(database_folder, exist_ok=True)
-
-# CSV File Paths
-USERS_CSV = os.path.join(database_folder, "users.csv")
-ARTIFACTS_CSV = os.path.join(database_folder, "artifacts.csv")
-ACCESS_LOG_CSV = os.path.join(database_folder, "access_logs.csv")
-LYRICS_CSV = os.path.join(database_folder, "lyrics.csv")
-MUSIC_SCORE_CSV = os.path.join(database_folder, "music_scores.csv")
-AUDIO_RECORDING_CSV = os.path.join(database_folder, "audio_recordings.csv")
+from encryption import check_master_key
 
 def main():
+    try:
+        check_master_key()
+    except ValueError as error:
+        print(error)
+        return
     while True:
         print("\nWelcome to SCMA Application")
         print("> Register (re)\n> Login (lo)\n> Exit (ex)")
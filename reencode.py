@@ -0,0 +1,116 @@
+import argparse
+from encryption import artifact_key, get_cipher, encrypt_many, is_compressed, COMPRESS_THRESHOLD, ENVELOPE_PREFIX
+from storage import scan, get_row, update, transaction, ARTIFACTS_CSV, LYRICS_CSV, MUSIC_SCORE_CSV
+from blobs import materialize, is_blob_ref
+from locks import exclusive_lock
+
+# Compresses the large fields written by versions without compression. Run it as its own command,
+# alongside sessions if need be: rows are streamed in batches of BATCH_SIZE, each batch is one
+# transaction and rows changed by a session since they were read are left alone. Rows already
+# compressed are skipped, so an interrupted run is simply started again.
+REENCODE_FIELDS = {  # journaled by artifactID, like every other update of these tables
+    LYRICS_CSV: ["lyrics"],
+    MUSIC_SCORE_CSV: ["score"],
+}
+BATCH_SIZE = 64  # rows re-encoded per transaction
+
+
+def _may_need_reencode(value):
+    """A Fernet token is longer than 4/3 of its plaintext, so short tokens never hold a value worth compressing."""
+    length = int(value.rsplit(":", 1)[1]) if is_blob_ref(value) else len(value)
+    return length * 3 // 4 >= COMPRESS_THRESHOLD
+
+def _plain_text(encryption_key, token):
+    """Return the text of a token written without compression, or None if it needs no re-encoding."""
+    try:
+        payload = get_cipher(encryption_key).decrypt(token.encode())
+    except Exception:
+        return None  # undecryptable values are left as they are
+    if is_compressed(payload) or len(payload) < COMPRESS_THRESHOLD:
+        return None
+    return payload.decode()
+
+def _reencode_batch(table, rows, keys, failed):
+    columns = REENCODE_FIELDS[table]
+    pairs = []
+    targets = []
+    for row in rows:
+        artifact_id = row["artifactID"]
+        if artifact_id not in keys:
+            try:
+                keys[artifact_id] = artifact_key(get_row(ARTIFACTS_CSV, "artifactID", artifact_id))
+            except ValueError as error:
+                keys[artifact_id] = None
+                failed[artifact_id] = str(error)
+        if not keys[artifact_id]:
+            continue
+        for column in columns:
+            value = materialize(row[column])
+            prefix = ENVELOPE_PREFIX if value.startswith(ENVELOPE_PREFIX) else ""
+            text = _plain_text(keys[artifact_id], value[len(prefix):])
+            if text is not None:
+                pairs.append((keys[artifact_id], text))
+                targets.append((row, column, prefix))
+
+    updated = {}
+    for (row, column, prefix), token in zip(targets, encrypt_many(pairs)):
+        updated.setdefault(row["artifactID"], (row, dict(row)))[1][column] = prefix + token
+
+    with transaction():
+        changes = []
+        for artifact_id, (old, new) in updated.items():
+            if get_row(table, "artifactID", artifact_id) == old:  # skip rows modified since they were read
+                changes.append((table, "artifactID", artifact_id, new))
+        if changes:
+            update(changes)
+    return len(changes)
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def reencode_table(table, failed, batch_size=BATCH_SIZE):
+    """Compress-and-re-encrypt the large fields of a table that were written uncompressed; returns the rows rewritten.
+
+    Artifacts whose key cannot be read are skipped and recorded in failed as {artifactID: reason}.
+    """
+    columns = REENCODE_FIELDS[table]
+    candidates = (row for row in scan(table) if any(_may_need_reencode(row[column] or "") for column in columns))
+    keys = {}
+    rewritten = 0
+    for batch in _batches(candidates, batch_size):
+        rewritten += _reencode_batch(table, batch, keys, failed)
+        if len(keys) > batch_size:
+            keys.clear()  # keep memory bounded on large tables
+    return rewritten
+
+def reencode_all(batch_size=BATCH_SIZE):
+    """Re-encode every table in REENCODE_FIELDS; returns ({table: rows rewritten}, {artifactID: reason skipped})."""
+    failed = {}
+    with exclusive_lock("reencode"):  # one run at a time
+        counts = {table: reencode_table(table, failed, batch_size) for table in REENCODE_FIELDS}
+    return counts, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress the lyrics and scores written without compression.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows written per transaction")
+    args = parser.parse_args()
+
+    counts, failed = reencode_all(args.batch_size)
+    for table, count in counts.items():
+        print(f"Re-encoded {count} rows of {table}")
+    reasons = {}
+    for artifact_id, reason in failed.items():
+        reasons.setdefault(reason, []).append(artifact_id)
+    for reason, artifact_ids in reasons.items():
+        shown = ", ".join(artifact_ids[:10]) + (", ..." if len(artifact_ids) > 10 else "")
+        print(f"{len(artifact_ids)} artifacts were left as they are ({shown}): {reason}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Prompts and printing of the access reports, shared by the CLI (access_report.py) and the thin
+# client. Only the standard library is used here, so the client can import it.
+REPORT_DAYS = 7  # default period of the dashboard reports
+REPORTS = {
+    "mv": "Most viewed artifacts",
+    "au": "Most active users",
+    "da": "Daily activity",
+    "uh": "User history",
+    "ah": "Artifact history",
+}
+DAILY_TYPES = ["View Artifact", "Add Artifact", "Modify Artifact", "Delete Artifact"]
+
+
+def ask_report():
+    """Prompt for a report; returns (kind, days, subject), or None for an invalid choice."""
+    print("\nAccess Reports")
+    for kind, name in REPORTS.items():
+        print(f"> {name} ({kind})")
+    choice = input("Select a report: ").strip().lower()
+    if choice not in REPORTS:
+        print("Invalid option.")
+        return None
+
+    subject = None
+    if choice == "uh":
+        subject = input("User ID: ").strip()
+    elif choice == "ah":
+        subject = input("Artifact ID: ").strip()
+    days = input(f"Number of days to include (default {REPORT_DAYS}): ").strip()
+    days = int(days) if days.isdigit() and int(days) > 0 else REPORT_DAYS
+    return choice, days, subject
+
+def print_report(kind, report, subject=None):
+    """Print a report as returned by access_report.build_report."""
+    print(f"\n{report['start']} to {report['end']}")
+
+    if kind == "mv":
+        print(f"{'Artifact ID':<12} | {'Views':>6} | {'Title (Decrypted)':<30}")
+        print("-" * 55)
+        for row in report["rows"]:
+            print(f"{row['artifactID']:<12} | {row['views']:>6} | {row['title']:<30}")
+    elif kind == "au":
+        print(f"{'User ID':<10} | {'Entries':>7} | {'Username':<15}")
+        print("-" * 40)
+        for row in report["rows"]:
+            print(f"{row['userID']:<10} | {row['entries']:>7} | {row['username']:<15}")
+    elif kind == "da":
+        print(f"{'Day':<10} | {'Views':>6} | {'Adds':>6} | {'Modifies':>8} | {'Deletes':>7}")
+        print("-" * 50)
+        for row in report["rows"]:
+            print(f"{row['day']:<10} | " + " | ".join(f"{row['counts'].get(access_type, 0):>{width}}" for access_type, width in zip(DAILY_TYPES, [6, 6, 8, 7])))
+    else:
+        column = "userID" if kind == "uh" else "artifactID"
+        other = "artifactID" if kind == "uh" else "userID"
+        print(f"{'Time':<19} | {other:<10} | {'Access Type':<15}")
+        print("-" * 50)
+        for row in report["rows"]:
+            print(f"{row['timeStamp']:<19} | {row[other]:<10} | {row['accessType']:<15}")
+        if report["older"]:
+            print(f"({report['older']} older entries not shown)")
+        if not report["rows"]:
+            print(f"No entries for {column} {subject}.")
@@ -0,0 +1,214 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.fernet import Fernet
+from encryption import open_rows, seal_rows, artifact_key, wrap_key
+from storage import scan, artifact_details, update, transaction, BACKEND
+from storage import ARTIFACTS_CSV, LYRICS_CSV, MUSIC_SCORE_CSV, AUDIO_RECORDING_CSV
+from locks import exclusive_lock
+
+database_folder = "database"
+
+# Gives every artifact a new key and re-encrypts its rows under it, in batches of BATCH_SIZE
+# artifacts, each written as one transaction. Artifacts are taken in scan order, which is not
+# artifactID order, so the IDs of every finished batch are appended to DONE_FILE and an
+# interrupted run skips them when it resumes. Artifacts added during a run are rotated as well.
+#
+# Content store entries have keys of their own, derived from the source file, and are left as
+# they are; lyrics and audio rows referencing them are re-encrypted like any other row.
+CHECKPOINT_FILE = os.path.join(database_folder, ".cache", f"key_rotation.{BACKEND}.json")
+DONE_FILE = CHECKPOINT_FILE + ".done"  # one JSON list of artifact IDs per finished batch
+BATCH_SIZE = 1000  # artifacts per transaction and checkpoint
+RETRY_PASSES = 3  # passes over artifacts modified by another session while they were rotated
+TABLES = {
+    "artifacts": ARTIFACTS_CSV,
+    "lyrics": LYRICS_CSV,
+    "music_scores": MUSIC_SCORE_CSV,
+    "audio_recordings": AUDIO_RECORDING_CSV,
+}
+
+
+def _store_key(encryption_key, wrap):
+    return wrap_key(encryption_key) if wrap else encryption_key
+
+def _rekey(details, rewrap, wrap):
+    """Return {table name: new row} for an artifact's rows under a new key, or the reason it cannot be rotated.
+
+    With rewrap, only the stored key is wrapped again under the current master key.
+    """
+    try:
+        old_key = artifact_key(details["artifacts"])
+    except ValueError as error:
+        return str(error)
+    if rewrap:
+        return {"artifacts": dict(details["artifacts"], encryptionKey=_store_key(old_key, wrap))}
+
+    items = [(old_key, table, row) for table, row in details.items() if row]
+    opened = open_rows(items)
+    if any(value.startswith("[Decryption Failed") for values in opened for value in values.values()):
+        return "Rows do not decrypt with the artifact's key."  # re-encrypting would lose them for good
+
+    new_key = Fernet.generate_key().decode()
+    sealed = seal_rows([(new_key, table, values) for (_, table, _), values in zip(items, opened)])
+    rekeyed = {table: dict(row, **values) for (_, table, row), values in zip(items, sealed)}
+    rekeyed["artifacts"]["encryptionKey"] = _store_key(new_key, wrap)
+    return rekeyed
+
+def _rekey_chunk(chunk, rewrap, wrap):
+    """Runs in a worker process."""
+    return [(artifact_id, details, _rekey(details, rewrap, wrap)) for artifact_id, details in chunk]
+
+def _submit(executor, workers, artifact_ids, rewrap, wrap):
+    """Read the rows of a batch of artifacts and hand them to the workers; returns the futures."""
+    batch = [(artifact_id, artifact_details(artifact_id)) for artifact_id in artifact_ids]
+    batch = [(artifact_id, details) for artifact_id, details in batch if details["artifacts"]]
+    chunk_size = max(1, -(-len(batch) // workers))
+    return [executor.submit(_rekey_chunk, batch[i:i + chunk_size], rewrap, wrap) for i in range(0, len(batch), chunk_size)]
+
+def _write(futures, state):
+    """Save a batch of rotated artifacts as one transaction; artifacts changed since they were read are left for a retry."""
+    results = [result for future in futures for result in future.result()]
+    with transaction():
+        changes = []
+        for artifact_id, details, rekeyed in results:
+            if isinstance(rekeyed, str):
+                state["failed"][artifact_id] = rekeyed
+            elif artifact_details(artifact_id) != details:
+                state["changed"].append(artifact_id)
+            else:
+                changes.extend((TABLES[table], "artifactID", artifact_id, row) for table, row in rekeyed.items())
+                state["rotated"] += 1
+        if changes:
+            update(changes)
+
+def _load_checkpoint(mode, restart):
+    """Return (state, IDs of the artifacts already done) of an interrupted run, or a fresh state."""
+    if not restart:
+        try:
+            with open(CHECKPOINT_FILE, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            state = None
+        if state is not None:
+            if state["mode"] != mode:
+                raise ValueError(f"An unfinished {state['mode']} run is checkpointed, finish it or start over with --restart.")
+            return state, _load_done()
+    if os.path.exists(DONE_FILE):
+        os.remove(DONE_FILE)
+    return {"mode": mode, "rotated": 0, "changed": [], "failed": {}}, set()
+
+def _load_done():
+    done = set()
+    try:
+        with open(DONE_FILE, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    done.update(json.loads(line))
+                except ValueError:
+                    pass  # torn by a crash, that batch is done again
+    except FileNotFoundError:
+        pass
+    return done
+
+def _save_checkpoint(state):
+    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+    with open(CHECKPOINT_FILE + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(CHECKPOINT_FILE + ".tmp", CHECKPOINT_FILE)
+
+def _mark_done(artifact_ids):
+    with open(DONE_FILE, "a", encoding="utf-8") as file:
+        file.write(json.dumps(artifact_ids) + "\n")
+
+def _batches(artifact_ids, batch_size):
+    batch = []
+    for artifact_id in artifact_ids:
+        batch.append(artifact_id)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _finish(pending, state, mark):
+    artifact_ids, futures = pending
+    _write(futures, state)
+    _save_checkpoint(state)  # before the batch counts as done, so its changed artifacts are kept for a retry
+    if mark:
+        _mark_done(artifact_ids)
+
+def _run(executor, workers, batches, rewrap, wrap, state, mark):
+    """Rotate batches of artifact IDs, reading the next batch while the workers encrypt the previous one."""
+    pending = None
+    for artifact_ids in batches:
+        submitted = (artifact_ids, _submit(executor, workers, artifact_ids, rewrap, wrap))
+        if pending:
+            _finish(pending, state, mark)
+        pending = submitted
+    if pending:
+        _finish(pending, state, mark)
+
+def rotate_keys(workers=None, batch_size=BATCH_SIZE, rewrap=False, wrap=True, restart=False):
+    """Re-encrypt every artifact under a new key, resuming an interrupted run unless restart is set.
+
+    Keys are stored wrapped under the first key of SCMA_MASTER_KEY when it is set, or
+    unwrapped with wrap False. With rewrap, keys stay the same and are only stored again
+    that way. Returns a report with the number rotated, {artifactID: reason} for those
+    that could not be, the IDs still changing under other sessions, and the time taken.
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count()
+    mode = ("rewrap" if rewrap else "rotate") + ("" if wrap else " --unwrap")
+    with exclusive_lock("key_rotation"):  # one run at a time
+        state, done = _load_checkpoint(mode, restart)
+        # spawned, not forked, so workers left behind by a killed run do not inherit the lock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            remaining = (row["artifactID"] for row in scan(ARTIFACTS_CSV) if row["artifactID"] not in done)
+            _run(executor, workers, _batches(remaining, batch_size), rewrap, wrap, state, mark=True)
+            for _ in range(RETRY_PASSES):
+                if not state["changed"]:
+                    break
+                changed, state["changed"] = state["changed"], []
+                _run(executor, workers, _batches(changed, batch_size), rewrap, wrap, state, mark=False)
+        if state["changed"]:
+            _save_checkpoint(state)  # retried by the next run
+        else:
+            for path in [CHECKPOINT_FILE, DONE_FILE]:
+                if os.path.exists(path):
+                    os.remove(path)
+    return {
+        "rotated": state["rotated"],
+        "failed": state["failed"],
+        "changed": state["changed"],
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Give every artifact a new encryption key.")
+    parser.add_argument("--workers", type=int, default=None, help="encryption processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="artifacts written per transaction")
+    parser.add_argument("--rewrap", action="store_true", help="keep the keys, only wrap them again under SCMA_MASTER_KEY")
+    parser.add_argument("--unwrap", action="store_true", help="store the keys unwrapped, reading them with SCMA_MASTER_KEY")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    args = parser.parse_args()
+
+    try:
+        report = rotate_keys(args.workers, args.batch_size, args.rewrap, not args.unwrap, args.restart)
+    except ValueError as error:
+        print(error)
+        return
+    print(f"{'Rewrapped' if args.rewrap else 'Rotated'} the keys of {report['rotated']} artifacts in {report['seconds']}s.")
+    reasons = {}
+    for artifact_id, reason in report["failed"].items():
+        reasons.setdefault(reason, []).append(artifact_id)
+    for reason, artifact_ids in reasons.items():
+        shown = ", ".join(artifact_ids[:10]) + (", ..." if len(artifact_ids) > 10 else "")
+        print(f"{len(artifact_ids)} artifacts were left as they are ({shown}): {reason}")
+    if report["changed"]:
+        print(f"{len(report['changed'])} artifacts kept changing during the run, run it again to rotate them.")
+
+if __name__ == "__main__":
+    main()
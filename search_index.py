@@ -0,0 +1,312 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from encryption import encrypt_many, decrypt_many, open_rows, artifact_key
+from storage import scan, get_rows, artifact_details, BACKEND, ARTIFACTS_CSV, LYRICS_CSV
+from content_store import resolve
+from instrumentation import timed
+
+database_folder = "database"
+
+# Search keeps an inverted index from words to artifact IDs, so a query decrypts only the
+# artifacts it finds. Words are stored as HMACs of "field:word" and every postings list is
+# Fernet-encrypted, both under the key in this variable; without it there is no search.
+SEARCH_KEY_ENV = "SCMA_SEARCH_KEY"
+INDEX_FILE = os.path.join(database_folder, ".cache", f"search.{BACKEND}.sqlite3")
+STALE_FILE = INDEX_FILE + ".stale"  # artifacts changed without updating the index, rebuilt on the next search
+SEARCH_FIELDS = ["title", "type", "language", "lyrics"]
+SEARCH_LIMIT = 20  # results returned per query
+COMPACT_CHANGES = 20000  # pending changes merged into the postings once there are this many
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TOKEN_LENGTH = 64
+
+# postings: token hash -> encrypted JSON list of artifact IDs
+# changes: token hash -> encrypted {"+": [IDs added], "-": [IDs removed]}, applied in rowid order
+# meta: "check", an HMAC telling which key built the index, and "pending", the number of changes
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS postings (token BLOB PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS changes (token BLOB NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_changes_token ON changes (token);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+_local = threading.local()  # one connection per thread, like storage_sqlite
+_compacting = threading.Lock()
+
+
+def enabled():
+    return bool(os.environ.get(SEARCH_KEY_ENV))
+
+def _key():
+    """Return the Fernet key of the index, derived from the secret in SEARCH_KEY_ENV, which can be any text."""
+    secret = os.environ.get(SEARCH_KEY_ENV)
+    if not secret:
+        raise ValueError(f"Search is not configured, set {SEARCH_KEY_ENV} to a secret.")
+    return base64.urlsafe_b64encode(hmac.new(secret.encode(), b"scma-search-postings", hashlib.sha256).digest()).decode()
+
+def _hmac_key(key):
+    return hashlib.sha256(b"scma-search-tokens:" + key.encode()).digest()  # not the Fernet key itself
+
+def _token_hash(hmac_key, field, token):
+    return hmac.new(hmac_key, f"{field}:{token}".encode(), hashlib.sha256).digest()
+
+def _check(key):
+    return hmac.new(_hmac_key(key), b"check", hashlib.sha256).hexdigest()
+
+def words(text):
+    """Split text into case-folded words, in order."""
+    return [token for token in TOKEN_PATTERN.findall(str(text).casefold()) if len(token) <= MAX_TOKEN_LENGTH]
+
+def _terms(hmac_key, values):
+    return {_token_hash(hmac_key, field, token) for field in SEARCH_FIELDS for token in set(words(values.get(field, "")))}
+
+def _connection():
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+        connection = sqlite3.connect(INDEX_FILE, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+    return connection
+
+@contextmanager
+def _transaction(mode="IMMEDIATE"):
+    connection = _connection()
+    connection.execute(f"BEGIN {mode}")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+def _meta(connection, name, default=None):
+    row = connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+def _set_meta(connection, name, value):
+    connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, str(value)))
+
+def _ready(connection, key):
+    """Whether the index was built with this key and has followed every change since."""
+    return _meta(connection, "check") == _check(key) and not os.path.exists(STALE_FILE)
+
+def mark_stale():
+    """Record that artifacts changed without the index, so the next search rebuilds it."""
+    if os.path.exists(INDEX_FILE):
+        os.makedirs(os.path.dirname(STALE_FILE), exist_ok=True)
+        open(STALE_FILE, "a").close()
+
+def searchable_values(encryption_key, artifact_row, lyrics_row):
+    """Decrypt the SEARCH_FIELDS of one artifact from its artifact and lyrics rows."""
+    items = [(encryption_key, "artifacts", artifact_row)] + ([(encryption_key, "lyrics", lyrics_row)] if lyrics_row else [])
+    opened = open_rows(items, columns=SEARCH_FIELDS)
+    values = {field: "" for field in SEARCH_FIELDS}
+    values.update({field: opened[0].get(field, "") for field in ["title", "type"]})
+    if lyrics_row:
+        lyrics = resolve("lyrics", opened[1])
+        values.update(lyrics=lyrics.get("lyrics", ""), language=lyrics.get("language", ""))
+    return values
+
+@timed("search.update")
+def update_index(changes):
+    """Record a list of (artifactID, old values, new values) after the artifacts were written.
+
+    Values are {field: plaintext} of SEARCH_FIELDS, {} for an artifact added or deleted.
+    Only the words that changed are written. When search is not configured, or the index
+    cannot be written, the index is marked stale instead.
+    """
+    if not enabled():
+        mark_stale()
+        return
+    key = _key()
+    hmac_key = _hmac_key(key)
+    delta = {}
+    for artifact_id, old, new in changes:
+        old_terms, new_terms = _terms(hmac_key, old), _terms(hmac_key, new)
+        for term in new_terms - old_terms:
+            delta.setdefault(term, {"+": [], "-": []})["+"].append(artifact_id)
+        for term in old_terms - new_terms:
+            delta.setdefault(term, {"+": [], "-": []})["-"].append(artifact_id)
+    if not delta:
+        return
+
+    try:
+        tokens = encrypt_many([(key, json.dumps(entry)) for entry in delta.values()])
+        with _transaction() as connection:
+            if not _ready(connection, key):
+                return  # never built, or built with another key: the next search builds it
+            connection.executemany("INSERT INTO changes VALUES (?, ?)", zip(delta, tokens))
+            pending = int(_meta(connection, "pending", 0)) + len(delta)
+            _set_meta(connection, "pending", pending)
+    except (sqlite3.Error, ValueError):  # the artifacts are already written, never fail after them
+        mark_stale()
+        return
+    if pending >= COMPACT_CHANGES and not _compacting.locked():
+        threading.Thread(target=compact, daemon=True).start()
+
+def _postings(connection, key, terms):
+    """Return {term: set of artifact IDs}, the merged postings with the pending changes applied."""
+    terms = list(terms)
+    stored = {}
+    for term in terms:
+        row = connection.execute("SELECT data FROM postings WHERE token = ?", (term,)).fetchone()
+        pending = [data for (data,) in connection.execute("SELECT data FROM changes WHERE token = ? ORDER BY rowid", (term,))]
+        stored[term] = ([row[0]] if row else [], pending)
+
+    pairs = [(key, data) for term in terms for group in stored[term] for data in group]
+    opened = iter(decrypt_many(pairs))
+    postings = {}
+    for term in terms:
+        merged, pending = stored[term]
+        try:
+            ids = set(json.loads(next(opened))) if merged else set()
+            for _ in pending:
+                change = json.loads(next(opened))
+                ids.update(change["+"])
+                ids.difference_update(change["-"])
+        except ValueError:
+            raise ValueError("The search index was written with another key, run python search_index.py --rebuild")
+        postings[term] = ids
+    return postings
+
+def compact():
+    """Merge the pending changes into the postings, one transaction."""
+    key = _key()
+    with _compacting, _transaction() as connection:
+        terms = [term for (term,) in connection.execute("SELECT DISTINCT token FROM changes")]
+        postings = _postings(connection, key, terms)
+        empty = [term for term in terms if not postings[term]]
+        kept = [term for term in terms if postings[term]]
+        tokens = encrypt_many([(key, json.dumps(sorted(postings[term]))) for term in kept], workers=os.cpu_count())
+        connection.executemany("INSERT OR REPLACE INTO postings VALUES (?, ?)", zip(kept, tokens))
+        connection.executemany("DELETE FROM postings WHERE token = ?", [(term,) for term in empty])
+        connection.execute("DELETE FROM changes")
+        _set_meta(connection, "pending", 0)
+
+@timed("search.rebuild")
+def rebuild(workers=None):
+    """Build the index from every artifact, decrypting each once; returns the number of artifacts indexed.
+
+    Writers wait for the rebuild, so changes made meanwhile are applied on top of it.
+    """
+    key = _key()
+    hmac_key = _hmac_key(key)
+    if os.path.exists(STALE_FILE):
+        os.remove(STALE_FILE)
+    with _transaction() as connection:
+        artifacts = [row for row in scan(ARTIFACTS_CSV) if row["encryptionKey"]]
+        lyrics = {}
+        for row in scan(LYRICS_CSV):
+            lyrics.setdefault(row["artifactID"], row)  # the first row, as artifact_details returns
+
+        items = []
+        for row in artifacts:
+            items.append((artifact_key(row), "artifacts", row))
+            if row["artifactID"] in lyrics:
+                items.append((artifact_key(row), "lyrics", lyrics[row["artifactID"]]))
+        opened = iter(open_rows(items, columns=SEARCH_FIELDS, workers=workers or os.cpu_count()))
+
+        postings = {}
+        stored_lyrics = {}  # content store reference -> values, each shared text is decrypted once
+        for row in artifacts:
+            values = {field: "" for field in SEARCH_FIELDS}
+            values.update({field: value for field, value in next(opened).items() if field in ["title", "type"]})
+            if row["artifactID"] in lyrics:
+                lyrics_values = next(opened)
+                reference = lyrics_values.get("lyrics", "")
+                if reference not in stored_lyrics:
+                    stored_lyrics[reference] = resolve("lyrics", dict(lyrics_values))["lyrics"]
+                values.update(lyrics=stored_lyrics[reference], language=lyrics_values.get("language", ""))
+            for term in _terms(hmac_key, values):
+                postings.setdefault(term, []).append(row["artifactID"])
+
+        tokens = encrypt_many([(key, json.dumps(ids)) for ids in postings.values()], workers=workers or os.cpu_count())
+        connection.execute("DELETE FROM postings")
+        connection.execute("DELETE FROM changes")
+        connection.executemany("INSERT INTO postings VALUES (?, ?)", zip(postings, tokens))
+        _set_meta(connection, "pending", 0)
+        _set_meta(connection, "check", _check(key))
+    return len(artifacts)
+
+def _sort_key(artifact_id):
+    return (0, int(artifact_id), "") if artifact_id.isdigit() else (1, 0, artifact_id)
+
+def _matches(values, query_words, phrase, fields):
+    """Check a decrypted artifact against the query, the index may hold words it no longer has."""
+    if phrase:
+        return any(f" {phrase} " in f" {' '.join(words(values[field]))} " for field in fields)
+    found = set()
+    for field in fields:
+        found.update(words(values[field]))
+    return all(word in found for word in query_words)
+
+@timed("search.query")
+def search(query, user_id, role, field=None, limit=SEARCH_LIMIT):
+    """Return [(artifactID, ownerID, {field: plaintext})] of the artifacts matching every word of the query.
+
+    A query in double quotes matches the words as a phrase within one field. field limits the
+    search to one of SEARCH_FIELDS. Creators only find their own artifacts. Raises ValueError
+    when search is not configured.
+    """
+    key = _key()
+    hmac_key = _hmac_key(key)
+    fields = [field] if field else SEARCH_FIELDS
+    query = query.strip()
+    query_words = words(query)
+    if not query_words:
+        return []
+    phrase = " ".join(query_words) if len(query) > 1 and query[0] == query[-1] == '"' else None
+
+    connection = _connection()
+    if not _ready(connection, key):
+        rebuild()
+
+    terms = {word: [_token_hash(hmac_key, name, word) for name in fields] for word in set(query_words)}
+    with _transaction("DEFERRED"):  # one snapshot of the postings and their pending changes
+        postings = _postings(connection, key, [term for word_terms in terms.values() for term in word_terms])
+    candidates = None
+    for word_terms in terms.values():
+        found = set().union(*(postings[term] for term in word_terms))
+        candidates = found if candidates is None else candidates & found
+    if role == "creator":  # ownership is checked on the plaintext ownerID before anything is decrypted
+        candidates &= {row["artifactID"] for row in get_rows(ARTIFACTS_CSV, "ownerID", user_id)}
+
+    hits = []
+    for artifact_id in sorted(candidates, key=_sort_key):
+        details = artifact_details(artifact_id)
+        artifact = details["artifacts"]
+        if not artifact or not artifact["encryptionKey"]:
+            continue
+        if role == "creator" and artifact["ownerID"] != user_id:
+            continue
+        values = searchable_values(artifact_key(artifact), artifact, details["lyrics"])
+        if _matches(values, query_words, phrase, fields):
+            hits.append((artifact_id, artifact["ownerID"], values))
+            if len(hits) >= limit:
+                break
+    return hits
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or compact the search index.")
+    parser.add_argument("--rebuild", action="store_true", help="index every artifact again")
+    parser.add_argument("--compact", action="store_true", help="merge the pending changes into the postings")
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Indexed {rebuild()} artifacts.")
+    if args.compact:
+        compact()
+        print("Search index compacted.")
+    if not args.rebuild and not args.compact:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+import secrets
+import signal
+import socket
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from auth import register_user, authenticate
+from storage import list_users_page, remove_user
+from artifacts import read_artifact, create_artifact, update_artifact, remove_artifact
+from listing import list_artifacts_page, PAGE_SIZE
+from access_report import build_report, REPORT_DAYS
+from access_log import recordAccess, flush_access_log, FLUSH_INTERVAL
+from bulk_import import extract_lyrics_source, hash_source
+from content_store import find
+from search_index import search, SEARCH_FIELDS
+from utils import probe_audio
+from storage import ACCESS_LOG_CSV
+from encryption import check_master_key
+from client import SOCKET_PATH, SERVICE_HOST, SERVICE_PORT
+
+# One long-running process serves the dashboard operations as JSON lines, see client.py.
+# Table indexes, the listing, cipher and extraction caches stay warm between requests.
+EXTRACT_WORKERS = os.cpu_count()  # processes parsing PDFs
+REQUEST_LIMIT = 1024 * 1024  # longest request line accepted, in bytes
+SESSION_IDLE = 8 * 60 * 60  # seconds a login token stays valid without being used
+ALL_ROLES = ["admin", "creator", "viewer"]
+
+# Table operations run one at a time on a single thread: the storage modules keep their
+# caches and open transactions in module state. PDF parsing goes to processes, audio probing to threads.
+_storage = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scma-storage")
+_probes = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scma-audio")
+_extractors = None  # ProcessPoolExecutor, started with the service
+_sessions = {}  # token -> {"userID", "role", "used"}
+
+
+async def _run(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(_storage, function, *args)
+
+async def _source(table, path, executor, extract):
+    """Return (values, digest, error) for a source file, extracting it only when the content store lacks its content."""
+    loop = asyncio.get_running_loop()
+    digest, error = await loop.run_in_executor(_probes, hash_source, path)
+    if error:
+        return None, None, error
+    stored = await _run(find, table, digest)
+    if stored is not None:
+        return (stored["lyrics"] if table == "lyrics" else stored), digest, None
+    values, error = await loop.run_in_executor(executor, extract, path)
+    return values, digest, error
+
+async def _extract(lyrics_path, audio_path):
+    """Extract lyrics and audio metadata in the worker pools, unless the content store already has them.
+
+    Returns (lyrics, audio, lyrics SHA-256, audio SHA-256); raises ValueError if either file cannot be read.
+    """
+    lyrics, audio = ("", None, None), ({"format": "", "duration": ""}, None, None)
+    if lyrics_path and audio_path:
+        lyrics, audio = await asyncio.gather(
+            _source("lyrics", lyrics_path, _extractors, extract_lyrics_source),
+            _source("audio_recordings", audio_path, _probes, probe_audio),
+        )
+    elif lyrics_path:
+        lyrics = await _source("lyrics", lyrics_path, _extractors, extract_lyrics_source)
+    elif audio_path:
+        audio = await _source("audio_recordings", audio_path, _probes, probe_audio)
+    if lyrics[2] or audio[2]:
+        raise ValueError(lyrics[2] or audio[2])
+    return lyrics[0], audio[0], lyrics[1], audio[1]
+
+async def _register(request, session):
+    user_id = await _run(register_user, request["username"], request.get("email", ""), request["password"], request.get("role", ""))
+    return {"userID": user_id}
+
+async def _login(request, session):
+    user = await _run(authenticate, request["username"], request["password"])
+    if user is None:
+        raise PermissionError("Invalid credentials.")
+    token = secrets.token_urlsafe(24)
+    _sessions[token] = {"userID": user[0], "role": user[1], "used": time.monotonic()}
+    return {"token": token, "userID": user[0], "role": user[1]}
+
+async def _logout(request, session):
+    _sessions.pop(request["token"], None)
+    await _run(flush_access_log)
+    return {}
+
+async def _list(request, session):
+    # creators page through the ownerID index, so other users' rows are never read
+    owner_id = session["userID"] if session["role"] == "creator" else None
+    entries, cursor = await _run(list_artifacts_page, owner_id, PAGE_SIZE, request.get("cursor"))
+    return {
+        "artifacts": [
+            {"artifactID": artifact_id, "ownerID": owner, "owner": owner_name, "title": title}
+            for artifact_id, owner, owner_name, title in entries
+        ],
+        "cursor": cursor,
+    }
+
+async def _view(request, session):
+    artifact_id = request["artifactID"]
+    await _run(recordAccess, session["userID"], artifact_id, "View Artifact", ACCESS_LOG_CSV)
+    return await _run(read_artifact, artifact_id, session["role"], session["userID"])
+
+async def _users(request, session):
+    users, cursor = await _run(list_users_page, request.get("prefix", ""), PAGE_SIZE, request.get("cursor"))
+    return {"users": [{field: row[field] for field in ["userID", "username", "email", "role"]} for row in users], "cursor": cursor}
+
+async def _remove_user(request, session):
+    user_id = request["userID"]
+    if not await _run(remove_user, user_id):
+        raise LookupError(f"User ID {user_id} not found.")
+    return {}
+
+async def _report(request, session):
+    await _run(flush_access_log)  # include the entries still queued
+    days = int(request.get("days") or REPORT_DAYS)
+    if days < 1:
+        raise ValueError("days must be at least 1.")
+    return await _run(build_report, request["report"], days, request.get("subject"))
+
+async def _search(request, session):
+    field = request.get("field") or None
+    if field is not None and field not in SEARCH_FIELDS:
+        raise ValueError(f"Unknown field, expected one of: {', '.join(SEARCH_FIELDS)}")
+    hits = await _run(search, request["query"], session["userID"], session["role"], field)
+    return {"artifacts": [{"artifactID": artifact_id, "ownerID": owner, **values} for artifact_id, owner, values in hits]}
+
+async def _add(request, session):
+    lyrics, audio, lyrics_digest, audio_digest = await _extract(request.get("lyrics_path"), request.get("audio_path"))
+    artifact_id = await _run(
+        create_artifact, session["userID"], request.get("title", ""), request.get("type", ""), request.get("lyrics_path", ""),
+        request.get("language", ""), request.get("score", ""), request.get("audio_path", ""), lyrics, audio, lyrics_digest, audio_digest,
+    )
+    return {"artifactID": artifact_id}
+
+async def _modify(request, session):
+    changes = {field: request.get(field) or "" for field in ["title", "type", "lyrics_path", "language", "score", "audio_path"]}
+    lyrics, audio, lyrics_digest, audio_digest = await _extract(changes["lyrics_path"], changes["audio_path"])
+    await _run(update_artifact, session["userID"], session["role"], request["artifactID"], changes, lyrics, audio, lyrics_digest, audio_digest)
+    return {}
+
+async def _delete(request, session):
+    artifact_id = request["artifactID"]
+    if not await _run(remove_artifact, session["userID"], artifact_id):
+        raise LookupError(f"Artifact ID {artifact_id} not found.")
+    return {}
+
+# op -> (handler, roles allowed to call it, None when no login is needed); the same rules as the dashboard
+OPERATIONS = {
+    "register": (_register, None),
+    "login": (_login, None),
+    "logout": (_logout, ALL_ROLES),
+    "list": (_list, ALL_ROLES),
+    "view": (_view, ALL_ROLES),
+    "search": (_search, ALL_ROLES),
+    "add": (_add, ["admin", "creator"]),
+    "modify": (_modify, ["creator"]),
+    "delete": (_delete, ["admin"]),
+    "users": (_users, ["admin"]),
+    "remove_user": (_remove_user, ["admin"]),
+    "report": (_report, ["admin"]),
+}
+
+def _session(token):
+    session = _sessions.get(token)
+    if session is None or time.monotonic() - session["used"] > SESSION_IDLE:
+        _sessions.pop(token, None)
+        raise PermissionError("Not logged in.")
+    session["used"] = time.monotonic()
+    return session
+
+async def dispatch(line):
+    """Answer one request line with {"ok": True, "result": ...} or {"ok": False, "error": message}."""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict) or request.get("op") not in OPERATIONS:
+            raise ValueError("Unknown operation.")
+        handler, roles = OPERATIONS[request["op"]]
+        session = None
+        if roles is not None:
+            session = _session(request.get("token"))
+            if session["role"] not in roles:
+                raise PermissionError("You do not have permission to do this.")
+        return {"ok": True, "result": await handler(request, session)}
+    except KeyError as error:
+        return {"ok": False, "error": f"Missing parameter: {error.args[0]}"}
+    except (ValueError, LookupError, PermissionError) as error:
+        return {"ok": False, "error": str(error)}
+    except Exception as error:
+        traceback.print_exc()
+        return {"ok": False, "error": f"Internal error: {type(error).__name__}"}
+
+async def _handle(reader, writer):
+    """Serve the requests of one connection, one JSON line each, until the client disconnects."""
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:  # longer than REQUEST_LIMIT
+                writer.write(json.dumps({"ok": False, "error": "Request too long."}).encode() + b"\n")
+                break
+            if not line:
+                break
+            writer.write(json.dumps(await dispatch(line)).encode("utf-8") + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+def _remove_stale_socket():
+    """Remove a socket file left by a service that did not shut down; refuse to start next to a running one."""
+    if not os.path.exists(SOCKET_PATH):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(SOCKET_PATH)
+    except OSError:
+        os.remove(SOCKET_PATH)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"The service is already running on {SOCKET_PATH}")
+
+def _flush_periodically(loop):
+    """Write queued access log entries every FLUSH_INTERVAL, even while no new entry comes in."""
+    _storage.submit(flush_access_log)
+    loop.call_later(FLUSH_INTERVAL, _flush_periodically, loop)
+
+async def serve():
+    if hasattr(socket, "AF_UNIX"):
+        umask = os.umask(0o177)  # only the user running the service may connect
+        try:
+            server = await asyncio.start_unix_server(_handle, path=SOCKET_PATH, limit=REQUEST_LIMIT)
+        finally:
+            os.umask(umask)
+        address = SOCKET_PATH
+    else:
+        server = await asyncio.start_server(_handle, SERVICE_HOST, SERVICE_PORT, limit=REQUEST_LIMIT)
+        address = f"{SERVICE_HOST}:{SERVICE_PORT}"
+
+    await _run(list_artifacts_page, None, PAGE_SIZE)  # load the indexes and listing before the first request
+    _flush_periodically(asyncio.get_running_loop())
+    print(f"SCMA service listening on {address}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    global _extractors
+    check_master_key()  # refuse to serve artifacts that cannot be opened
+    if hasattr(socket, "AF_UNIX"):
+        _remove_stale_socket()
+    _extractors = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # stop on kill as on Ctrl+C
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        _extractors.shutdown()
+        _storage.submit(flush_access_log).result()
+        if hasattr(socket, "AF_UNIX") and os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+from blobs import externalize_rows, externalize_row
+from database.makeCSV import FILES, HEADERS
+
+# Every module reads and writes the tables through this interface. The backend is chosen
+# once per process: "csv" (default) keeps the files created by database/makeCSV.py,
+# "sqlite" uses the database filled by database/migrateSQLite.py.
+STORAGE_ENV = "SCMA_STORAGE"
+BACKEND = os.environ.get(STORAGE_ENV, "csv").strip().lower()
+
+if BACKEND == "csv":
+    import storage_csv as backend
+elif BACKEND == "sqlite":
+    import storage_sqlite as backend
+else:
+    raise ValueError(f"Unknown {STORAGE_ENV} backend: {BACKEND} (expected csv or sqlite)")
+
+# Table paths, the CSV backend stores each table in this file and the SQLite backend in the table of the same name
+USERS_CSV = FILES["users"]
+ARTIFACTS_CSV = FILES["artifacts"]
+ACCESS_LOG_CSV = FILES["access_logs"]
+LYRICS_CSV = FILES["lyrics"]
+MUSIC_SCORE_CSV = FILES["music_scores"]
+AUDIO_RECORDING_CSV = FILES["audio_recordings"]
+CONTENTS_CSV = FILES["contents"]
+
+
+def _table_name(table):
+    return os.path.splitext(os.path.basename(table))[0]
+
+def get_rows(table, column, value):
+    """Return every live row where column == value, as dicts.
+
+    Large fields come back as blob references, see blobs.materialize.
+    """
+    return backend.get_rows(backend.resolve_table(table), column, value)
+
+def get_row(table, column, value):
+    """Return the first live row where column == value, or None."""
+    rows = get_rows(table, column, value)
+    return rows[0] if rows else None
+
+def scan(table):
+    """Yield every live row of a table as a dict, in insertion order."""
+    return backend.scan(backend.resolve_table(table))
+
+def insert(table, rows):
+    """Insert rows given as lists in the table's column order, large fields go to the blob file."""
+    name = _table_name(table)
+    backend.insert(backend.resolve_table(table), externalize_rows(name, HEADERS.get(name, []), rows))
+
+def insert_row(table, row):
+    insert(table, [row])
+
+def update(changes):
+    """Apply a list of (table, key_column, value, row) updates atomically. Key columns must not change."""
+    backend.update([
+        (backend.resolve_table(table), column, value, externalize_row(_table_name(table), row))
+        for table, column, value, row in changes
+    ])
+
+def delete(table, column, value):
+    """Delete the rows where column == value and return how many there were."""
+    return backend.delete(backend.resolve_table(table), column, value)
+
+def transaction():
+    """Context manager grouping the writes of a block; see the backend for what is atomic."""
+    return backend.transaction()
+
+def signature(table):
+    """Return a value that changes whenever the table's rows change, in any process."""
+    return backend.signature(backend.resolve_table(table))
+
+def highest_id(table, id_column):
+    return backend.highest_id(backend.resolve_table(table), id_column)
+
+def page(table, column=None, value=None, page_size=20, cursor=None):
+    """Return (rows, next_cursor) for one page of a table, optionally where column == value.
+
+    Pass the returned cursor back to get the following page; it is None on the last page.
+    """
+    return backend.page(backend.resolve_table(table), column, value, page_size, cursor)
+
+def between(table, column, low, high):
+    """Return the rows where low <= column <= high, compared as text, in insertion order."""
+    return backend.between(backend.resolve_table(table), column, low, high)
+
+def rows_after(table, position=None):
+    """Return (rows, position, reset) to follow an append-only table.
+
+    rows iterates the rows added after position, or every row when position is None. Pass
+    the returned position back to read only newer rows; reset is True when the table was
+    replaced since position was taken and rows start again from the first row.
+    """
+    return backend.rows_after(backend.resolve_table(table), position)
+
+def artifact_details(artifact_id):
+    """Return the artifact row and its lyrics, score and recording rows, keyed by table name."""
+    return backend.artifact_details(artifact_id)
+
+def username_taken(username, users_table=USERS_CSV):
+    """Check, ignoring case, whether a username is registered."""
+    return backend.username_taken(backend.resolve_table(users_table), username)
+
+def find_users(username, users_table=USERS_CSV):
+    """Return the user rows whose username matches, ignoring case."""
+    return backend.find_users(backend.resolve_table(users_table), username)
+
+def add_user(row, users_table=USERS_CSV):
+    """Insert a user row [userID, username, email, passwordHash, role] unless the username is taken."""
+    return backend.add_user(backend.resolve_table(users_table), row)
+
+def remove_user(user_id, users_table=USERS_CSV):
+    """Delete a user; returns False if the user does not exist."""
+    return backend.remove_user(backend.resolve_table(users_table), user_id)
+
+def list_users_page(prefix="", page_size=20, cursor=None, users_table=USERS_CSV):
+    """Return one page of users whose username starts with prefix, ignoring case, and the next cursor."""
+    return backend.list_users_page(backend.resolve_table(users_table), prefix, page_size, cursor)
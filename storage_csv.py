@@ -0,0 +1,161 @@
+import base64
+import csv
+import os
+from bisect import bisect_right
+from contextlib import contextmanager
+from csv_index import get_rows as _get_rows, iter_rows, tail_rows, append_rows, delete_rows, update_rows, load_index, read_rows_at, table_signature
+from journal import journal_signature
+import user_index
+from database.makeCSV import FILES, HEADERS
+
+# Storage backend over the CSV files created by database/makeCSV.py, tables are addressed by file path
+
+_transaction = []  # update batches of the open transaction(s), innermost last
+_row_order = {}  # csv_filename -> (signature, byte offsets of every row in file order)
+
+
+def resolve_table(table):
+    """Accept a table name ("artifacts") or a CSV path and return the CSV path."""
+    return FILES.get(table, table)
+
+def _table_name(csv_filename):
+    return os.path.splitext(os.path.basename(csv_filename))[0]
+
+def get_rows(csv_filename, column, value):
+    return _get_rows(csv_filename, column, value)
+
+def scan(csv_filename):
+    return iter_rows(csv_filename)
+
+def insert(csv_filename, rows):
+    append_rows(csv_filename, rows, HEADERS.get(_table_name(csv_filename)))
+
+def update(changes):
+    if _transaction:
+        _transaction[-1].extend(changes)  # committed together when the outermost transaction ends
+    else:
+        update_rows(changes)
+
+def delete(csv_filename, column, value):
+    return delete_rows(csv_filename, column, value)
+
+@contextmanager
+def transaction():
+    """Group the updates made inside the block into one journal commit.
+
+    Inserts and deletes are written as they happen, only updates are atomic here.
+    """
+    _transaction.append([])
+    try:
+        yield
+    except BaseException:
+        _transaction.pop()
+        raise
+    changes = _transaction.pop()
+    if changes:
+        update(changes)
+
+def signature(csv_filename):
+    """Changes whenever the table, its tombstones or the journal of pending updates change."""
+    try:
+        return [table_signature(csv_filename), journal_signature()]
+    except FileNotFoundError:
+        return None
+
+def highest_id(csv_filename, id_column):
+    """Scan a table for its highest numeric ID, at least 999 to keep IDs four digits long."""
+    highest = 999
+    try:
+        with open(csv_filename, mode="r", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                value = row.get(id_column) or ""
+                if value.isdigit():
+                    highest = max(highest, int(value))
+    except FileNotFoundError:
+        pass  # If file doesn't exist, assume no existing IDs
+    return highest
+
+def between(csv_filename, column, low, high):
+    """Return the rows where low <= column <= high, compared as text, in file order."""
+    return [row for row in iter_rows(csv_filename) if low <= row.get(column, "") <= high]
+
+def rows_after(csv_filename, position):
+    """Return (rows, position, reset) for the rows appended after position, [file inode, byte offset]."""
+    try:
+        inode, end, rows = tail_rows(csv_filename, position[1] if position else 0)
+    except FileNotFoundError:
+        return iter(()), None, bool(position)
+    reset = bool(position) and (position[0] != inode or position[1] > end)
+    if reset:  # the file was replaced, read it again from the first row
+        inode, end, rows = tail_rows(csv_filename)
+    return (row for _, row in rows), [inode, end], reset
+
+def _encode_cursor(inode, offset):
+    return base64.urlsafe_b64encode(f"o:{inode}:{offset}".encode()).decode()
+
+def _decode_cursor(cursor):
+    """Return the (inode, byte offset) a cursor was taken at."""
+    try:
+        prefix, inode, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        if prefix == "o":
+            return int(inode), int(offset)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid cursor: {cursor}")
+
+def _page_offsets(csv_filename, column, value):
+    """Return the byte offsets of the rows to page through, in file order, plus the fieldnames."""
+    if column is not None:
+        index = load_index(csv_filename, column)  # secondary index, only the matching rows
+        return index["offsets"].get(value, []), index["fieldnames"]
+
+    index = load_index(csv_filename, HEADERS[_table_name(csv_filename)][0])
+    cached = _row_order.get(csv_filename)
+    if not cached or cached[0] != index["signature"]:
+        offsets = sorted(offset for row_offsets in index["offsets"].values() for offset in row_offsets)
+        cached = _row_order[csv_filename] = (index["signature"], offsets)
+    return cached[1], index["fieldnames"]
+
+def page(csv_filename, column=None, value=None, page_size=20, cursor=None):
+    """Return one page of rows, optionally where column == value, and the next cursor.
+
+    Only the rows on the page are read from the file. The cursor is None on the last page.
+    Cursors are byte offsets into one version of the file: appends keep them valid, but
+    once compaction or a journal checkpoint has rewritten the table they are rejected.
+    """
+    offsets, fieldnames = _page_offsets(csv_filename, column, value)
+    inode = os.stat(csv_filename).st_ino
+    start = 0
+    if cursor:
+        cursor_inode, offset = _decode_cursor(cursor)
+        if cursor_inode != inode:
+            raise ValueError("The table was rewritten since the previous page, list it again from the start.")
+        start = bisect_right(offsets, offset)
+    page_offsets = offsets[start:start + page_size]
+    rows = read_rows_at(csv_filename, page_offsets, fieldnames)
+    next_cursor = _encode_cursor(inode, page_offsets[-1]) if start + page_size < len(offsets) else None
+    return rows, next_cursor
+
+def artifact_details(artifact_id):
+    """Return {table name: first row for the artifact or None} for the artifact and its three detail tables."""
+    details = {}
+    for table in ["artifacts", "lyrics", "music_scores", "audio_recordings"]:
+        rows = _get_rows(FILES[table], "artifactID", artifact_id)
+        details[table] = rows[0] if rows else None
+    return details
+
+def username_taken(users_csv, username):
+    return user_index.username_taken(username, users_csv)
+
+def find_users(users_csv, username):
+    return user_index.find_users(username, users_csv)
+
+def add_user(users_csv, row):
+    return user_index.add_user(row, users_csv)
+
+def remove_user(users_csv, user_id):
+    return user_index.remove_user(user_id, users_csv)
+
+def list_users_page(users_csv, prefix, page_size, cursor):
+    return user_index.list_users_page(prefix, page_size, cursor, users_csv)
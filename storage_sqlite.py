@@ -0,0 +1,261 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import instrumentation
+from database.makeCSV import DATABASE_FOLDER, HEADERS
+
+# Storage backend over one SQLite database, tables are addressed by name ("artifacts")
+
+DATABASE_FILE = os.path.join(DATABASE_FOLDER, "scma.sqlite3")
+
+# Indexed lookups; usernames get their own case-insensitive index
+INDEXES = {
+    "users": ["userID"],
+    "artifacts": ["artifactID", "ownerID"],
+    "access_logs": ["userID", "artifactID", "timeStamp"],
+    "lyrics": ["artifactID"],
+    "music_scores": ["artifactID"],
+    "audio_recordings": ["artifactID"],
+    "contents": ["contentID"],
+}
+DETAIL_TABLES = ["lyrics", "music_scores", "audio_recordings"]
+
+_local = threading.local()  # one connection per thread
+
+
+def _create_schema(connection):
+    connection.execute('CREATE TABLE IF NOT EXISTS "_versions" (name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+    for table, columns in HEADERS.items():
+        column_list = ", ".join(f'"{column}" TEXT' for column in columns)
+        connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({column_list})')
+        for column in INDEXES.get(table, []):
+            connection.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+        # every write bumps the table's version, which is what signature() reports
+        connection.execute('INSERT OR IGNORE INTO "_versions" VALUES (?, 0)', (table,))
+        for event in ["INSERT", "UPDATE", "DELETE"]:
+            connection.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{table}_{event.lower()}_version" AFTER {event} ON "{table}" '
+                f'BEGIN UPDATE "_versions" SET version = version + 1 WHERE name = \'{table}\'; END'
+            )
+    connection.execute('CREATE INDEX IF NOT EXISTS "idx_users_username" ON "users" ("username" COLLATE NOCASE)')
+
+def _connection():
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(DATABASE_FILE, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")  # readers never wait for the writer
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with _write(connection):
+            _create_schema(connection)
+        _local.connection = connection
+    return connection
+
+@contextmanager
+def _write(connection):
+    """Run the block in a write transaction, or inside the one already open on this thread."""
+    depth = getattr(_local, "depth", 0)
+    if not depth:
+        connection.execute("BEGIN IMMEDIATE")
+    _local.depth = depth + 1
+    try:
+        yield connection
+    except BaseException:
+        _local.depth = depth
+        if not depth:
+            connection.execute("ROLLBACK")
+        raise
+    _local.depth = depth
+    if not depth:
+        connection.execute("COMMIT")
+
+def resolve_table(table):
+    """Accept a table name or the CSV path of the table and return the table name."""
+    name = os.path.splitext(os.path.basename(table))[0]
+    if name not in HEADERS:
+        raise ValueError(f"Unknown table: {table}")
+    return name
+
+def _column(table, column):
+    if column not in HEADERS[table]:
+        raise ValueError(f"Unknown column {column} in {table}")
+    return f'"{column}"'
+
+def get_rows(table, column, value):
+    cursor = _connection().execute(f'SELECT * FROM "{table}" WHERE {_column(table, column)} = ? ORDER BY rowid', (value,))
+    rows = [dict(row) for row in cursor]
+    if instrumentation.ENABLED:
+        instrumentation.count("rows.parsed", len(rows))
+    return rows
+
+def scan(table):
+    for row in _connection().execute(f'SELECT * FROM "{table}" ORDER BY rowid'):
+        if instrumentation.ENABLED:
+            instrumentation.count("rows.parsed")
+        yield dict(row)
+
+def insert(table, rows):
+    placeholders = ", ".join("?" for _ in HEADERS[table])
+    with _write(_connection()) as connection:
+        connection.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', [[str(value) for value in row] for row in rows])
+
+def update(changes):
+    with _write(_connection()) as connection:
+        for table, key_column, value, row in changes:
+            columns = [column for column in HEADERS[table] if column in row]
+            assignments = ", ".join(f"{_column(table, column)} = ?" for column in columns)
+            connection.execute(
+                f'UPDATE "{table}" SET {assignments} WHERE {_column(table, key_column)} = ?',
+                [row[column] for column in columns] + [value],
+            )
+
+def delete(table, column, value):
+    with _write(_connection()) as connection:
+        return connection.execute(f'DELETE FROM "{table}" WHERE {_column(table, column)} = ?', (value,)).rowcount
+
+@contextmanager
+def transaction():
+    """Run every insert, update and delete of the block in one SQLite transaction."""
+    with _write(_connection()):
+        yield
+
+def signature(table):
+    """Return the database file's inode and the table's write counter, kept by triggers so any process's change is seen."""
+    version = _connection().execute('SELECT version FROM "_versions" WHERE name = ?', (table,)).fetchone()[0]
+    return [os.stat(DATABASE_FILE).st_ino, version]
+
+def highest_id(table, id_column):
+    """Return the highest numeric ID in a table, at least 999 to keep IDs four digits long."""
+    column = _column(table, id_column)
+    highest = _connection().execute(
+        f'SELECT MAX(CAST({column} AS INTEGER)) FROM "{table}" WHERE {column} != \'\' AND {column} NOT GLOB \'*[^0-9]*\''
+    ).fetchone()[0]
+    return max(999, highest or 0)
+
+def between(table, column, low, high):
+    """Return the rows where low <= column <= high, compared as text, in insertion order."""
+    column = _column(table, column)
+    cursor = _connection().execute(f'SELECT * FROM "{table}" WHERE {column} >= ? AND {column} <= ? ORDER BY rowid', (low, high))
+    rows = [dict(row) for row in cursor]
+    if instrumentation.ENABLED:
+        instrumentation.count("rows.parsed", len(rows))
+    return rows
+
+def rows_after(table, position):
+    """Return (rows, position, reset) for the rows inserted after position, [database inode, rowid]."""
+    inode = os.stat(DATABASE_FILE).st_ino
+    connection = _connection()
+    highest = connection.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+    last = position[1] if position and position[0] == inode else 0
+    reset = bool(position) and (position[0] != inode or highest < last)
+    if reset:
+        last = 0
+
+    def rows():
+        for row in connection.execute(f'SELECT * FROM "{table}" WHERE rowid > ? AND rowid <= ? ORDER BY rowid', (last, highest)):
+            if instrumentation.ENABLED:
+                instrumentation.count("rows.parsed")
+            yield dict(row)
+    return rows(), [inode, highest], reset
+
+def _encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def page(table, column=None, value=None, page_size=20, cursor=None):
+    """Return one page of rows in insertion order, optionally where column == value, and the next cursor."""
+    conditions = ["rowid > ?"]
+    parameters = [_decode_cursor(cursor) if cursor else 0]
+    if column is not None:
+        conditions.append(f"{_column(table, column)} = ?")
+        parameters.append(value)
+    rows = _connection().execute(
+        f'SELECT rowid AS "_rowid", * FROM "{table}" WHERE {" AND ".join(conditions)} ORDER BY rowid LIMIT ?',
+        parameters + [page_size + 1],
+    ).fetchall()
+
+    page_rows = [dict(row) for row in rows[:page_size]]
+    next_cursor = _encode_cursor(page_rows[-1]["_rowid"]) if len(rows) > page_size else None
+    for row in page_rows:
+        del row["_rowid"]
+    return page_rows, next_cursor
+
+def artifact_details(artifact_id):
+    """Return {table name: first row for the artifact or None}, joined in one indexed query."""
+    tables = ["artifacts"] + DETAIL_TABLES
+    selected = ", ".join(
+        f'"{table}"."{column}" AS "{table}.{column}"' for table in tables for column in HEADERS[table]
+    )
+    joins = " ".join(
+        f'LEFT JOIN "{table}" ON "{table}".rowid = '
+        f'(SELECT rowid FROM "{table}" WHERE "artifactID" = "artifacts"."artifactID" ORDER BY rowid LIMIT 1)'
+        for table in DETAIL_TABLES
+    )
+    row = _connection().execute(
+        f'SELECT {selected} FROM "artifacts" {joins} WHERE "artifacts"."artifactID" = ? ORDER BY "artifacts".rowid LIMIT 1',
+        (artifact_id,),
+    ).fetchone()
+
+    details = {table: None for table in tables}
+    if row is None:
+        for table in DETAIL_TABLES:  # detail rows left behind by a missing artifact
+            rows = get_rows(table, "artifactID", artifact_id)
+            details[table] = rows[0] if rows else None
+        return details
+    for table in tables:
+        values = {column: row[f"{table}.{column}"] for column in HEADERS[table]}
+        details[table] = values if values[HEADERS[table][0]] is not None else None
+    return details
+
+# Usernames are compared with SQLite's NOCASE collation, which folds ASCII letters only
+
+def username_taken(table, username):
+    return _connection().execute(
+        f'SELECT 1 FROM "{table}" WHERE "username" = ? COLLATE NOCASE LIMIT 1', (username,)
+    ).fetchone() is not None
+
+def find_users(table, username):
+    cursor = _connection().execute(f'SELECT * FROM "{table}" WHERE "username" = ? COLLATE NOCASE ORDER BY rowid', (username,))
+    return [dict(row) for row in cursor]
+
+def add_user(table, row):
+    """Insert a user row unless the username is taken, checked inside the same write transaction."""
+    with _write(_connection()):
+        if username_taken(table, row[1]):
+            return False
+        insert(table, [row])
+    return True
+
+def remove_user(table, user_id):
+    return delete(table, "userID", user_id) > 0
+
+def list_users_page(table, prefix, page_size, cursor):
+    """Return one page of users whose username starts with prefix, ordered ignoring case, and the next cursor."""
+    pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    conditions = ["\"username\" LIKE ? ESCAPE '\\'"]
+    parameters = [pattern]
+    if cursor:
+        name, rowid = _decode_cursor(cursor)
+        conditions.append('("username" > ? COLLATE NOCASE OR ("username" = ? COLLATE NOCASE AND rowid > ?))')
+        parameters += [name, name, rowid]
+    rows = _connection().execute(
+        f'SELECT rowid AS "_rowid", * FROM "{table}" WHERE {" AND ".join(conditions)} '
+        f'ORDER BY "username" COLLATE NOCASE, rowid LIMIT ?',
+        parameters + [page_size + 1],
+    ).fetchall()
+
+    page_rows = [dict(row) for row in rows[:page_size]]
+    next_cursor = None
+    if len(rows) > page_size:
+        next_cursor = _encode_cursor([page_rows[-1]["username"], page_rows[-1]["_rowid"]])
+    for row in page_rows:
+        del row["_rowid"]
+    return page_rows, next_cursor
@@ -0,0 +1,26 @@
+import utils
+
+
+def _answers(monkeypatch, answers):
+    answers = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+def test_extract_metadata_audio_asks_again_for_a_missing_file(monkeypatch, tmp_path):
+    _answers(monkeypatch, [""])
+    assert utils.extractMetadataAudio(str(tmp_path / "missing.mp3")) == ({"format": "", "duration": ""}, None)
+
+def test_extract_metadata_audio_asks_again_after_an_error(monkeypatch, tmp_path):
+    audio = tmp_path / "song.mp3"
+    audio.write_bytes(b"not audio")
+    calls = []
+
+    def extract_once(table, file_path, extract):
+        calls.append(file_path)
+        if len(calls) == 1:
+            raise OSError("unreadable")
+        return {"format": "MP3", "duration": "1.00"}, "digest"
+
+    monkeypatch.setattr(utils, "extract_once", extract_once)
+    _answers(monkeypatch, [str(audio)])
+    assert utils.extractMetadataAudio(str(audio)) == ({"format": "MP3", "duration": "1.00"}, "digest")
+    assert calls == [str(audio), str(audio)]
@@ -0,0 +1,60 @@
+import glob
+import os
+from locks import shared_lock
+
+database_folder = "database"
+os.makedirs(database_folder, exist_ok=True)
+
+TOMBSTONE_FOLDER = os.path.join(database_folder, "tombstones")
+
+# Tombstones are the byte offsets of deleted rows. Offsets only hold for the file they were taken
+# from, so each file of a table has its own tombstone file, named after its inode: a rewritten
+# table starts without tombstones even if the old ones could not be removed.
+# (csv_filename, inode) -> (signature, {offset of a dead row})
+_cache = {}
+
+
+def _table_inode(csv_filename):
+    return os.stat(csv_filename).st_ino
+
+def _tombstone_path(csv_filename, inode):
+    return os.path.join(TOMBSTONE_FOLDER, f"{os.path.basename(csv_filename)}.{inode}")
+
+def tombstone_signature(csv_filename, inode=None):
+    """Return the (mtime, size) of the tombstone file of a table's current file, or None when nothing is deleted."""
+    try:
+        stat = os.stat(_tombstone_path(csv_filename, inode or _table_inode(csv_filename)))
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def load_tombstones(csv_filename, inode=None):
+    """Return the offsets of every row deleted from the table file with the given inode (default: the current one)."""
+    inode = inode or _table_inode(csv_filename)
+    signature = tombstone_signature(csv_filename, inode)
+    cached = _cache.get((csv_filename, inode))
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    tombstones = set()
+    with shared_lock(os.path.basename(csv_filename)):  # no half-written tombstone lines
+        signature = tombstone_signature(csv_filename, inode)
+        if signature:
+            with open(_tombstone_path(csv_filename, inode), "r", encoding="utf-8") as file:
+                tombstones.update(int(line) for line in file if line.strip())
+    _cache[(csv_filename, inode)] = (signature, tombstones)
+    return tombstones
+
+def add_tombstones(csv_filename, offsets):
+    """Append tombstones marking the rows stored at the given byte offsets as deleted."""
+    os.makedirs(TOMBSTONE_FOLDER, exist_ok=True)
+    with open(_tombstone_path(csv_filename, _table_inode(csv_filename)), "a", encoding="utf-8") as file:
+        file.write("".join(f"{offset}\n" for offset in offsets))
+
+def clear_tombstones(csv_filename, keep=None):
+    """Remove the tombstone files of a table, except the one of the file with inode keep."""
+    for path in glob.glob(_tombstone_path(glob.escape(csv_filename), "*")):
+        if path != _tombstone_path(csv_filename, keep):
+            os.remove(path)
+    for key in [key for key in _cache if key[0] == csv_filename and key[1] != keep]:
+        del _cache[key]
@@ -0,0 +1,115 @@
+import base64
+from bisect import bisect_left, bisect_right
+from csv_index import load_index, read_rows_at, append_row, delete_rows, get_row, table_lock
+from database.makeCSV import FILES
+
+USERS_CSV = FILES["users"]
+
+PAGE_SIZE = 20
+
+# users_csv -> {"signature", "names": {case-folded username: [{"userID", "offset"}]}, "sorted": [...] or None}
+_directories = {}
+
+
+def load_user_directory(users_csv=USERS_CSV):
+    """Return the case-folded username directory, built from the userID and username indexes.
+
+    It is rebuilt in memory only when users.csv changed outside add_user/remove_user.
+    """
+    names_index = load_index(users_csv, "username")
+    directory = _directories.get(users_csv)
+    if directory and directory["signature"] == names_index["signature"]:
+        return directory
+
+    user_ids = {
+        offset: user_id
+        for user_id, offsets in load_index(users_csv, "userID")["offsets"].items()
+        for offset in offsets
+    }
+    names = {}
+    for username, offsets in names_index["offsets"].items():
+        for offset in offsets:
+            names.setdefault(username.casefold(), []).append({"userID": user_ids.get(offset), "offset": offset})
+
+    directory = {"signature": names_index["signature"], "names": names, "sorted": None}
+    _directories[users_csv] = directory
+    return directory
+
+def username_taken(username, users_csv=USERS_CSV):
+    """Check, ignoring case, whether a username is registered."""
+    try:
+        return username.casefold() in load_user_directory(users_csv)["names"]
+    except FileNotFoundError:
+        return False  # If the file doesn't exist, no usernames exist yet
+
+def find_users(username, users_csv=USERS_CSV):
+    """Return the rows whose username matches, ignoring case, without scanning users.csv."""
+    entries = load_user_directory(users_csv)["names"].get(username.casefold(), [])
+    fieldnames = load_index(users_csv, "username")["fieldnames"]
+    return read_rows_at(users_csv, [entry["offset"] for entry in entries], fieldnames)
+
+def add_user(row, users_csv=USERS_CSV):
+    """Append a user row [userID, username, email, passwordHash, role] unless the username is taken."""
+    with table_lock(users_csv):
+        if username_taken(row[1], users_csv):
+            return False
+        directory = load_user_directory(users_csv)
+        append_row(users_csv, row)
+
+        names_index = load_index(users_csv, "username")
+        directory["names"].setdefault(row[1].casefold(), []).append(
+            {"userID": row[0], "offset": names_index["offsets"][row[1]][-1]}
+        )
+        directory["signature"] = names_index["signature"]
+        directory["sorted"] = None
+    return True
+
+def remove_user(user_id, users_csv=USERS_CSV):
+    """Tombstone a user and drop it from the directory; returns False if the user does not exist."""
+    with table_lock(users_csv):
+        row = get_row(users_csv, "userID", user_id)
+        if row is None:
+            return False
+        directory = load_user_directory(users_csv)
+        delete_rows(users_csv, "userID", user_id)
+
+        folded = row["username"].casefold()
+        remaining = [entry for entry in directory["names"].get(folded, []) if entry["userID"] != user_id]
+        if remaining:
+            directory["names"][folded] = remaining
+        else:
+            directory["names"].pop(folded, None)
+        directory["signature"] = load_index(users_csv, "username")["signature"]
+        directory["sorted"] = None
+    return True
+
+def list_users_page(prefix="", page_size=PAGE_SIZE, cursor=None, users_csv=USERS_CSV):
+    """Return one page of user rows whose username starts with prefix (ignoring case), and the next cursor.
+
+    Users are ordered by case-folded username. The returned cursor is None on the last page.
+    """
+    directory = load_user_directory(users_csv)
+    if directory["sorted"] is None:
+        directory["sorted"] = sorted(directory["names"])
+    names = directory["sorted"]
+    prefix = prefix.casefold()
+
+    if cursor:
+        start = bisect_right(names, base64.urlsafe_b64decode(cursor.encode()).decode())
+    else:
+        start = bisect_left(names, prefix)
+
+    page_names = []
+    offsets = []
+    for name in names[start:]:
+        if not name.startswith(prefix) or len(offsets) >= page_size:
+            break
+        page_names.append(name)
+        offsets.extend(entry["offset"] for entry in directory["names"][name])
+
+    position = start + len(page_names)
+    has_more = position < len(names) and names[position].startswith(prefix)
+    next_cursor = base64.urlsafe_b64encode(page_names[-1].encode()).decode() if has_more and page_names else None
+
+    fieldnames = load_index(users_csv, "username")["fieldnames"]
+    return read_rows_at(users_csv, offsets, fieldnames), next_cursor
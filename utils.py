@@ -1,43 +1,56 @@
 import datetime
 import random
-import csv
 import hashlib
 import os
-import pdfplumber
-import secrets
-from mutagen.mp3 import MP3
-from mutagen.wave import WAVE
-from mutagen.flac import FLAC
-from mutagen.mp4 import MP4 
+import json
+import atexit
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from storage import highest_id
+from locks import exclusive_lock
+import instrumentation
+from instrumentation import timed
+from extractors import load, audio_labels, audio_duration, supported_audio, lyrics_extractor, supported_lyrics
+from extractors import detect_audio_format as detect_header_format
+from content_store import extract_once
 
 database_folder = "database"
 os.makedirs(database_folder, exist_ok=True)
 
-# CSV File Paths
-USERS_CSV = os.path.join(database_folder, "users.csv")
-ARTIFACTS_CSV = os.path.join(database_folder, "artifacts.csv")
-ACCESS_LOG_CSV = os.path.join(database_folder, "access_logs.csv")
-LYRICS_CSV = os.path.join(database_folder, "lyrics.csv")
-MUSIC_SCORE_CSV = os.path.join(database_folder, "music_scores.csv")
-AUDIO_RECORDING_CSV = os.path.join(database_folder, "audio_recordings.csv")
+SEQUENCE_FOLDER = os.path.join(database_folder, ".sequences")
 
+PARALLEL_PAGES = 32  # PDFs shorter than this are faster to extract in-process
 
-def generate_id(csv_filename, id_column):
-    existing_ids = set()
+AUDIO_CACHE_FILE = os.path.join(database_folder, ".cache", "audio_metadata.json")
 
-    # Read existing IDs from the CSV file
-    try:
-        with open(csv_filename, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            existing_ids = {row[id_column] for row in reader if row.get(id_column)}
-    except FileNotFoundError:
-        pass  # If file doesn't exist, assume no existing IDs
+_audio_cache = None  # absolute path -> {"size", "mtime", "format", "duration"}
+_audio_cache_dirty = False
 
-    # Generate a unique ID
-    while True:
-        new_id = str(secrets.randbelow(9000) + 1000)  # Generate a secure random number between 1000-9999
-        if new_id not in existing_ids:
-            return new_id
+
+def reserve_ids(csv_filename, id_column, count):
+    """Reserve a block of unique IDs for a table by advancing its persisted high-water mark."""
+    os.makedirs(SEQUENCE_FOLDER, exist_ok=True)
+    sequence_file = os.path.join(SEQUENCE_FOLDER, f"{os.path.basename(csv_filename)}.{id_column}")
+
+    # serialize allocation across concurrent processes
+    with exclusive_lock(f"sequence.{os.path.basename(sequence_file)}"), open(sequence_file, "a+", encoding="utf-8") as file:
+        file.seek(0)
+        content = file.read().strip()
+        if not content and instrumentation.ENABLED:
+            instrumentation.count("generate_id.scans")
+        last_id = int(content) if content else highest_id(csv_filename, id_column)  # seed a table created before sequences existed
+        file.seek(0)
+        file.truncate()
+        file.write(str(last_id + count))
+        file.flush()
+        os.fsync(file.fileno())
+
+    if instrumentation.ENABLED:
+        instrumentation.count("generate_id.ids", count)
+    return [str(new_id) for new_id in range(last_id + 1, last_id + count + 1)]
+
+def generate_id(csv_filename, id_column):
+    return reserve_ids(csv_filename, id_column, 1)[0]
 
 def get_timestamp():
     return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -45,73 +58,156 @@ def get_timestamp():
 def generateChecksum(data):
     return hashlib.sha256(data.encode()).hexdigest()
 
-# Observer Pattern
-def recordAccess(user_id, artifact_id, access_type, ACCESS_LOG_CSV):
-    if not artifact_id:  # Skip logging if artifact_id is empty or None
-        return
-    log_id = generate_id(ACCESS_LOG_CSV, "logID")
-    timestamp = get_timestamp()
-    with open(ACCESS_LOG_CSV, "a", newline="") as f:
-        csv.writer(f).writerow([log_id, user_id, artifact_id, access_type, timestamp])
-
-
 # Extract lyrics, if no file given it will store empty string so user could modify it later
 def extract_lyrics(file_path):
-    """Extract lyrics from a given PDF file, allowing user to retry if file is missing."""
+    """Extract lyrics from a given file (PDF, or a registered format), allowing user to retry if file is missing.
+
+    Returns (lyrics, SHA-256 of the file), or ("", None) when skipped. A file whose content
+    is already stored is not extracted again.
+    """
     while True:
         if not file_path.strip():  # If blank, return empty string
-            return ""
+            return "", None
 
         if os.path.exists(file_path):
-            ext = os.path.splitext(file_path)[1].lower()
-            if ext != ".pdf":
-                print("Unsupported file format. Only PDF files are allowed!")
-                file_path = input("Enter a valid PDF file path (or press Enter to skip): ").strip()
+            extractor = lyrics_extractor(os.path.splitext(file_path)[1])
+            if extractor is None:
+                print(f"Unsupported file format. Supported: {supported_lyrics()}")
+                file_path = input("Enter a valid lyrics file path (or press Enter to skip): ").strip()
                 continue
 
-            return extract_text_from_pdf(file_path)
+            values, digest = extract_once("lyrics", file_path, lambda path: {"lyrics": extractor(path)})
+            return values["lyrics"], digest
 
         print("File not found. Please enter a valid file path.")
-        file_path = input("Enter a valid PDF file path (or press Enter to skip): ").strip()
-
-def extract_text_from_pdf(file_path):
-    """Extract text from a PDF file"""
-    text = ""
+        file_path = input("Enter a valid lyrics file path (or press Enter to skip): ").strip()
+
+def _page_texts(pdf, start=0, end=None):
+    for page in pdf.pages[start:end]:
+        page_text = page.extract_text()
+        if page_text:
+            yield page_text
+        page.flush_cache()  # release the parsed page before moving on
+
+def iter_pdf_pages(file_path, start=0, end=None):
+    """Yield the text of each non-empty page in [start, end), one page at a time."""
+    pdfplumber = load("pdfplumber")  # imported on the first PDF, see extractors
     with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text.strip()
+        yield from _page_texts(pdf, start, end)
+
+def _extract_page_range(page_range):
+    file_path, start, end = page_range
+    return list(iter_pdf_pages(file_path, start, end))
+
+@timed("extract.pdf")
+def extract_text_from_pdf(file_path, workers=None):
+    """Extract text from a PDF file
+
+    With workers set, PDFs of PARALLEL_PAGES pages or more are split into page ranges and
+    extracted in a process pool; the interactive prompts leave it unset, bulk import and the
+    service already extract several files at once. Re-uploads of the same file are served by
+    the content store.
+    """
+    with load("pdfplumber").open(file_path) as pdf:
+        page_count = len(pdf.pages)
+        if not (workers and workers > 1 and page_count >= PARALLEL_PAGES):
+            return "\n".join(_page_texts(pdf)).strip()
+
+    step = -(-page_count // workers)
+    ranges = [(file_path, start, start + step) for start in range(0, page_count, step)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pages = [text for chunk in executor.map(_extract_page_range, ranges) for text in chunk]
+    return "\n".join(pages).strip()
 
 # Extract audio metadata
+def detect_audio_format(file_path):
+    """Identify the audio container from its first bytes; returns a registered format key or None."""
+    with open(file_path, "rb") as file:
+        return detect_header_format(file.read(12))
+
+def _load_audio_cache():
+    global _audio_cache
+    if _audio_cache is None:
+        try:
+            with open(AUDIO_CACHE_FILE, "r", encoding="utf-8") as file:
+                _audio_cache = json.load(file)
+        except (FileNotFoundError, ValueError):
+            _audio_cache = {}
+    return _audio_cache
+
+@atexit.register
+def save_audio_cache():
+    global _audio_cache_dirty
+    if not _audio_cache_dirty:
+        return
+    os.makedirs(os.path.dirname(AUDIO_CACHE_FILE), exist_ok=True)
+    with open(AUDIO_CACHE_FILE + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(_audio_cache, file)
+    os.replace(AUDIO_CACHE_FILE + ".tmp", AUDIO_CACHE_FILE)
+    _audio_cache_dirty = False
+
+@timed("extract.audio")
+def read_audio_metadata(file_path):
+    """Return the format and duration of an audio file, or None if the format is unsupported.
+
+    The format is detected from the file header rather than the extension. Results are
+    cached by (path, size, mtime), so an unchanged file is only parsed once.
+    """
+    global _audio_cache_dirty
+    stat = os.stat(file_path)
+    cache_key = os.path.abspath(file_path)
+    cached = _load_audio_cache().get(cache_key)
+    if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime_ns:
+        return {"format": cached["format"], "duration": cached["duration"]}
+
+    detected = detect_audio_format(file_path)
+    if detected is None:
+        return None
+    # Keep the familiar extension label (M4A, MP4, AAC...) when it agrees with the content
+    labels = audio_labels(detected)
+    ext = os.path.splitext(file_path)[1].replace(".", "").upper()
+    label = ext if ext in labels else labels[0]
+
+    duration = round(audio_duration(detected, file_path), 2)  # Duration in seconds (rounded)
+    _audio_cache[cache_key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "format": label, "duration": duration}
+    _audio_cache_dirty = True
+    return {"format": label, "duration": duration}
+
+def probe_audio(file_path):
+    """Return (metadata, error) for one audio file, without prompting."""
+    try:
+        metadata = read_audio_metadata(file_path)
+        if metadata is None:
+            return None, f"Unsupported audio format. Supported: {supported_audio()}"
+        return metadata, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def probe_audio_many(file_paths, workers=8):
+    """Probe many audio files on a thread pool; returns a (metadata, error) pair per path."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(probe_audio, file_paths))
+
 def extractMetadataAudio(file_path):
-    """Extract the format and duration of an audio file, allowing user to retry if file is missing."""
+    """Extract the format and duration of an audio file, allowing user to retry if file is missing.
+
+    Returns (metadata, SHA-256 of the file), or blank metadata and None when skipped.
+    """
     while True:
         if not file_path.strip():  # If blank, return empty values
-            return {"format": "", "duration": ""}
+            return {"format": "", "duration": ""}, None
 
         if os.path.exists(file_path):
-            ext = os.path.splitext(file_path)[1].lower()
             try:
-                if ext == ".mp3":
-                    audio = MP3(file_path)
-                elif ext == ".wav":
-                    audio = WAVE(file_path)
-                elif ext == ".flac":
-                    audio = FLAC(file_path)
-                elif ext in [".m4a", ".mp4", ".aac"]:
-                    audio = MP4(file_path)
-                else:
-                    print("Unsupported file format. Supported: MP3, WAV, FLAC, M4A, AAC")
+                metadata, digest = extract_once("audio_recordings", file_path, read_audio_metadata)
+                if metadata is None:
+                    print(f"Unsupported file format. Supported: {supported_audio()}")
                     file_path = input("Enter a valid audio file path (or press Enter to skip): ").strip()
                     continue
-
-                duration = round(audio.info.length, 2)  # Duration in seconds (rounded)
-                return {"format": ext.replace(".", "").upper(), "duration": duration}
+                return metadata, digest
 
             except Exception as e:
                 print(f"Error processing file: {e}")
 
         print("File not found. Please enter a valid file path.")
-        file_path = input("Enter a valid audio file path (or press Enter to skip): ").strip()
\ No newline at end of file
+        file_path = input("Enter a valid audio file path (or press Enter to skip): ").strip()